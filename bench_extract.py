@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark the lxml and BeautifulSoup extraction backends
+Times content and list extraction on a saved page and checks that both
+backends produce identical output. example.html is a gadir.free.fr page
+without the imamali.net markers, so by default its body is wrapped in an
+AKD-SiraBodyTx_ content area and a list page is built from its links.
+"""
+
+import argparse
+import re
+import sys
+import time
+
+import letters_scraper
+import scraper
+from fast_extract import extract_content_text, extract_list_items
+from profiling import add_profile_arguments, profiler_from_args
+
+
+def imamali_pages(html_content):
+    """
+    Return (content_page, list_page) in the imamali.net layout
+    """
+    if 'AKD-' in html_content:
+        return html_content, html_content
+    match = re.search(r'<body[^>]*>(.*?)(?:</body>|$)', html_content, re.IGNORECASE | re.DOTALL)
+    body = match.group(1) if match else html_content
+    content_page = (f'<html><head><meta charset="utf-8"></head><body>'
+                    f'<div class="AKD-SiraBodyTx_">{body}</div></body></html>')
+    items = ''.join(
+        f'<li class="AKD-Categ_List"><a class="AKD-HrefList" href="{href}">'
+        f'<span class="AKD-Li_Tx_">{index}. {title}</span></a></li>'
+        for index, (href, title) in enumerate(re.findall(r'<a href="([^"]+)"[^>]*>([^<]*)', html_content), 1))
+    list_page = f'<html><body><ul>{items}</ul>{body}</body></html>'
+    return content_page, list_page
+
+
+def best_time(function, repeat):
+    """Best of `repeat` runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the lxml and BeautifulSoup extraction backends")
+    parser.add_argument('html_file', nargs='?', default='example.html', help="Saved page (default: example.html)")
+    parser.add_argument('--repeat', type=int, default=20, help="Runs per measurement (default: 20)")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(args, 'bench_extract')
+
+    with open(args.html_file, 'r', encoding='utf-8', errors='replace') as f:
+        content_page, list_page = imamali_pages(f.read())
+
+    base_url = scraper.BASE_URL
+    cases = [
+        ("extract_sermon_content", lambda backend: scraper.extract_sermon_content(content_page, backend)),
+        ("extract_content", lambda backend: letters_scraper.extract_content(content_page, backend)),
+        ("extract_sermon_list", lambda backend: scraper.extract_sermon_list(list_page, backend)),
+        ("extract_list", lambda backend: letters_scraper.extract_list(list_page, backend)),
+    ]
+    fast_path = {
+        "extract_sermon_content": extract_content_text(content_page, scraper.CONTENT_CLASSES) is not None,
+        "extract_content": extract_content_text(content_page, letters_scraper.CONTENT_CLASSES) is not None,
+        "extract_sermon_list": extract_list_items(list_page, base_url) is not None,
+        "extract_list": extract_list_items(list_page, base_url, "Unknown Title") is not None,
+    }
+
+    identical = True
+    print(f"{'function':<24}{'bs4 ms':>10}{'lxml ms':>10}{'speedup':>10}  output")
+    for name, run in cases:
+        same = run('bs4') == run('lxml')
+        identical = identical and same
+        with profiler.stage(f'{name}.bs4'):
+            bs4_ms = best_time(lambda: run('bs4'), args.repeat)
+        with profiler.stage(f'{name}.lxml'):
+            lxml_ms = best_time(lambda: run('lxml'), args.repeat)
+        status = ('identical' if same else 'DIFFERENT') + ('' if fast_path[name] else ' (fell back to bs4)')
+        print(f"{name:<24}{bs4_ms:>10.2f}{lxml_ms:>10.2f}{bs4_ms / lxml_ms:>9.1f}x  {status}")
+    profiler.finish()
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Charset resolution for fetched pages
+Decides how to decode a response body from the HTTP header, the page's own
+<meta> declaration or what earlier pages from the same host used, and only
+falls back to full charset detection when none of those is available
+"""
+
+import codecs
+import re
+import threading
+from urllib.parse import urlparse
+
+# How much of the body is searched for a <meta> charset declaration
+META_SCAN_BYTES = 4096
+
+# Many servers send this in every Content-Type regardless of the page, so a
+# <meta> declaration takes precedence over it
+WEAK_HEADER_CHARSET = 'iso8859-1'
+
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+# Matches both <meta charset="..."> and <meta http-equiv="Content-Type" content="text/html; charset=...">
+_META_CHARSET = re.compile(rb'<meta\b[^>]*?charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+def _codec_name(label):
+    """
+    Canonical codec name for a charset label, or None if Python does not know it
+    """
+    if isinstance(label, bytes):
+        label = label.decode('ascii', errors='ignore')
+    try:
+        return codecs.lookup(label.strip()).name
+    except (LookupError, ValueError):
+        return None
+
+
+def header_charset(content_type):
+    """
+    Charset named in a Content-Type header, or None
+    """
+    match = _HEADER_CHARSET.search(content_type or '')
+    return _codec_name(match.group(1)) if match else None
+
+
+def meta_charset(body):
+    """
+    Charset declared by a <meta> tag in the first META_SCAN_BYTES of the body, or None
+    """
+    match = _META_CHARSET.search(body[:META_SCAN_BYTES])
+    return _codec_name(match.group(1)) if match else None
+
+
+class CharsetResolver:
+    """
+    Resolve and cache the charset of each host's pages.
+
+    The order is: the Content-Type header, a <meta> declaration near the
+    top of the page, the charset the host's previous pages were decoded
+    with, and finally requests' full-body detection (apparent_encoding),
+    which is the expensive step this avoids. A candidate is only used if
+    the whole body decodes with it; otherwise the next source is tried.
+    A header naming only ISO-8859-1 comes after detection: it is mostly a
+    server default, and as any bytes decode with it, it would otherwise
+    always win.
+    """
+
+    def __init__(self, fallback='windows-1256'):
+        self.fallback = fallback
+        self.learned = {}
+        self.sources = {'header': 0, 'meta': 0, 'learned': 0, 'detected': 0}
+        self._lock = threading.Lock()
+
+    def decode(self, response):
+        """
+        Decode a requests.Response body to text
+        """
+        body = response.content
+        host = urlparse(response.url).netloc
+        declared = header_charset(response.headers.get('Content-Type'))
+        candidates = [
+            ('header', lambda: declared),
+            ('meta', lambda: meta_charset(body)),
+            ('learned', lambda: self.learned.get(host)),
+        ]
+        if declared == WEAK_HEADER_CHARSET:
+            # Usually a server default rather than a statement about the page,
+            # and ISO-8859-1 decodes any bytes, so it would always be accepted
+            candidates.pop(0)
+        for source, candidate in candidates:
+            encoding = candidate()
+            if encoding is None:
+                continue
+            try:
+                text = body.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+            self._record(host, source, encoding)
+            return text
+
+        detected = _codec_name(response.apparent_encoding) if response.apparent_encoding else None
+        if detected is None and declared == WEAK_HEADER_CHARSET:
+            # Last resort, and not learned for the host's later pages
+            with self._lock:
+                self.sources['header'] += 1
+            return body.decode(declared)
+        encoding = detected or _codec_name(self.fallback) or self.fallback
+        self._record(host, 'detected', encoding)
+        return body.decode(encoding, errors='replace')
+
+    def _record(self, host, source, encoding):
+        with self._lock:
+            self.sources[source] += 1
+            self.learned[host] = encoding
+
+    def print_stats(self):
+        """Print where page charsets came from."""
+        total = sum(self.sources.values())
+        if not total:
+            return
+        print(f"  Charsets: {self.sources['header']} from headers, {self.sources['meta']} from <meta>, "
+              f"{self.sources['learned']} learned per host, {self.sources['detected']} needed detection")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Crash-safe checkpoint journal for long scraper runs
+Completed items are appended to a JSON-lines file as they finish, so an
+interrupted run can resume without fetching or parsing them again
+"""
+
+import json
+import os
+import threading
+
+# How often the journal is forced to disk:
+#   always - fsync after every record (safest, slowest)
+#   batch  - fsync every `batch_size` records and on close
+#   never  - leave it to the operating system
+FSYNC_POLICIES = ('always', 'batch', 'never')
+DEFAULT_FSYNC = 'batch'
+DEFAULT_BATCH_SIZE = 20
+
+
+class Journal:
+    """
+    Append-only journal of completed items, keyed by a string.
+
+    Each line is {"key": ..., "value": ...}. On open the existing journal is
+    replayed; a torn final line left by a crash is discarded. Later records
+    for the same key win.
+    """
+
+    def __init__(self, path, fsync=DEFAULT_FSYNC, batch_size=DEFAULT_BATCH_SIZE):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.path = path
+        self.fsync = fsync
+        self.batch_size = batch_size
+        self.entries = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        records, good_size = self._replay()
+        if records != len(self.entries) or (os.path.exists(path) and good_size != os.path.getsize(path)):
+            # Duplicate keys or a torn tail: rewrite the journal cleanly
+            self._write_compacted()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        records = 0
+        good_size = 0
+        if not os.path.exists(self.path):
+            return records, good_size
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    key, value = record['key'], record['value']
+                except (ValueError, KeyError, TypeError):
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                self.entries[key] = value
+                records += 1
+                good_size += len(line)
+        return records, good_size
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        return self.entries.get(key, default)
+
+    def record(self, key, value):
+        """
+        Append a completed item and make it durable according to the fsync policy
+        """
+        line = json.dumps({'key': key, 'value': value}, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.entries[key] = value
+            self._pending += 1
+            if self.fsync == 'always' or (self.fsync == 'batch' and self._pending >= self.batch_size):
+                os.fsync(self._file.fileno())
+                self._pending = 0
+
+    def compact(self):
+        """
+        Atomically rewrite the journal with one record per key
+        """
+        with self._lock:
+            self._file.close()
+            self._write_compacted()
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _write_compacted(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key, value in self.entries.items():
+                f.write(json.dumps({'key': key, 'value': value}, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            if self.fsync != 'never':
+                os.fsync(self._file.fileno())
+            self._file.close()
+
+    def discard(self):
+        """
+        Close and delete the journal once its run has completed and been saved
+        """
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def add_journal_arguments(parser, default_path):
+    """
+    Add the checkpoint options shared by every scraper's command line
+    """
+    parser.add_argument('--journal', default=default_path,
+                        help=f"Checkpoint journal used to resume an interrupted run (default: {default_path})")
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default=DEFAULT_FSYNC,
+                        help=f"When to force journal writes to disk (default: {DEFAULT_FSYNC})")
+    parser.add_argument('--fresh', action='store_true',
+                        help="Ignore any existing journal and scrape everything again")
+
+
+def open_journal(args):
+    """
+    Open the journal named by add_journal_arguments() options
+    """
+    if args.fresh and os.path.exists(args.journal):
+        os.remove(args.journal)
+    journal = Journal(args.journal, fsync=args.fsync)
+    if len(journal):
+        print(f"Resuming from {args.journal}: {len(journal)} items already done")
+    return journal
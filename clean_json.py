@@ -1,110 +1,185 @@
 #!/usr/bin/env python3
 """
 Clean JSON file by removing footnote references
-Removes patterns like [1], ([1]), [2], ([2]), etc. from both keys and values
+Removes patterns like [1], ([1]), [2], ([2]), etc. from both keys and values,
+using the rules in cleaning_rules.py
+Files are streamed member by member and cleaned in chunks on a process pool,
+so memory stays flat and the output is identical to loading the whole file
 """
 
+import argparse
 import json
-import re
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
-def clean_text(text):
-    """
-    Remove footnote references from text
-    Patterns: [1], ([1]), [2], ([2]), etc.
-    """
-    if not isinstance(text, str):
-        return text
-    
-    # Remove patterns like ([1]), ([2]), ([123]), etc.
-    text = re.sub(r'\(\[\d+\]\)', '', text)
-    
-    # Remove patterns like [1], [2], [123], etc.
-    text = re.sub(r'\[\d+\]', '', text)
-    
-    # Clean up extra spaces that might be left
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Remove leading/trailing whitespace
-    text = text.strip()
-    
-    return text
+from cleaning_rules import clean_text, clean_value
+from json_stream import JsonObjectWriter, NotAnObject, format_member, iter_object_members
+from metrics import add_metrics_arguments, get_metrics, write_run_report
+from profiling import Profiler, add_profile_arguments, profiler_from_args
+
+# Top-level members cleaned per pool task
+CHUNK_MEMBERS = 64
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Chunks queued on the pool at once; bounds memory like the scrapers' parse backlog
+MAX_PENDING_CHUNKS = 2 * DEFAULT_WORKERS
+
+# Files smaller than this are cleaned in this process; starting workers costs more
+MIN_POOL_BYTES = 1 << 20
 
 def clean_json_data(data):
     """
     Recursively clean all keys and values in the JSON data
     """
-    if isinstance(data, dict):
-        cleaned = {}
-        for key, value in data.items():
-            # Clean the key
-            cleaned_key = clean_text(key)
-            
-            # Clean the value (recursively if it's a dict or list)
-            if isinstance(value, dict):
-                cleaned_value = clean_json_data(value)
-            elif isinstance(value, list):
-                cleaned_value = [clean_text(item) if isinstance(item, str) else clean_json_data(item) for item in value]
-            elif isinstance(value, str):
-                cleaned_value = clean_text(value)
-            else:
-                cleaned_value = value
-            
-            cleaned[cleaned_key] = cleaned_value
-        
-        return cleaned
-    
-    elif isinstance(data, list):
-        return [clean_text(item) if isinstance(item, str) else clean_json_data(item) for item in data]
-    
-    elif isinstance(data, str):
-        return clean_text(data)
-    
-    else:
-        return data
+    return clean_value(data)
+
+def clean_members(members):
+    """
+    Clean a chunk of top-level (key, value) members
+
+    Returns:
+        List of (cleaned key, member text formatted for indent=2)
+    """
+    cleaned = []
+    for key, value in members:
+        key = clean_text(key)
+        cleaned.append((key, format_member(key, clean_json_data(value))))
+    return cleaned
+
+class _KeyCollision(Exception):
+    """Two top-level members clean to the same key; only the in-memory path merges them."""
 
-def clean_json_file(input_file, output_file):
+def clean_pool(workers=DEFAULT_WORKERS):
+    """
+    Process pool for cleaning chunks, or None for fewer than two workers,
+    where shipping chunks to a single process only adds cost
+    """
+    if workers < 2:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+def _map_in_order(func, items, pool=None, window=MAX_PENDING_CHUNKS):
+    """
+    Yield func(item) for each item, in order, with at most `window` items in flight on the pool
+    """
+    if pool is None:
+        for item in items:
+            yield func(item)
+        return
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def stream_clean_file(input_file, output_file, pool=None):
+    """
+    Clean a JSON object file member by member, writing the result as it goes
+
+    Returns:
+        Number of entries written
+
+    Raises:
+        NotAnObject or _KeyCollision when the file needs the in-memory path
+    """
+    tmp_path = output_file + '.tmp'
+    seen = set()
+    try:
+        with open(input_file, 'r', encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as out:
+            members = iter_object_members(src)
+            chunks = iter(lambda: list(islice(members, CHUNK_MEMBERS)), [])
+            writer = JsonObjectWriter(out)
+            for cleaned in _map_in_order(clean_members, chunks, pool):
+                for key, text in cleaned:
+                    if key in seen:
+                        raise _KeyCollision(key)
+                    seen.add(key)
+                    writer.write_member(text)
+            writer.close()
+        os.replace(tmp_path, output_file)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(seen)
+
+def clean_json_file(input_file, output_file, profiler=None, pool=None):
     """
     Read JSON file, clean it, and save to output file
+
+    The file is streamed through stream_clean_file(), using `pool` for files
+    of MIN_POOL_BYTES or more; a document that is not an object, or whose
+    keys merge when cleaned, is cleaned in memory instead.
     """
+    profiler = profiler or Profiler('clean_json')
     print(f"Reading from: {input_file}")
     
-    # Read the JSON file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    print(f"Original entries: {len(data)}")
-    
-    # Clean the data
     print("Cleaning footnote references...")
-    cleaned_data = clean_json_data(data)
+    size = os.path.getsize(input_file)
+    with profiler.stage('clean'), get_metrics().timer('clean') as sample:
+        sample.size = size
+        try:
+            count = stream_clean_file(input_file, output_file, pool if size >= MIN_POOL_BYTES else None)
+        except (NotAnObject, _KeyCollision):
+            # Clean the whole document in memory instead, within the same stage
+            count = None
+            with open(input_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            print(f"Original entries: {len(data)}")
+            cleaned_data = clean_json_data(data)
+    if count is not None:
+        print(f"Cleaned entries: {count}")
+        print(f"Saved cleaned data to: {output_file}")
+        print("Done!")
+        return
     
     print(f"Cleaned entries: {len(cleaned_data)}")
     
     # Save to output file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(cleaned_data, f, ensure_ascii=False, indent=2)
+    with profiler.stage('save'), get_metrics().timer('save') as sample:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(cleaned_data, f, ensure_ascii=False, indent=2)
+        sample.size = os.path.getsize(output_file)
     
     print(f"Saved cleaned data to: {output_file}")
     print("Done!")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Remove footnote references from a scraped JSON file")
+    parser.add_argument('input_file', nargs='?', default='assets/scraped_output.json',
+                        help="JSON file to clean (default: assets/scraped_output.json)")
+    parser.add_argument('output_file', nargs='?', default=None,
+                        help="Where to write the result (default: the input name with _cleaned)")
+    parser.add_argument('--batch', nargs='+', metavar='FILE',
+                        help="Clean these files instead, each to its _cleaned name, sharing one worker pool")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"Cleaning processes for large files; 0 or 1 cleans in this process (default: {DEFAULT_WORKERS})")
+    add_profile_arguments(parser)
+    add_metrics_arguments(parser, 'clean_json')
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    import sys
-    
-    # Check for command line arguments
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-        # Use provided output file or generate one
-        if len(sys.argv) > 2:
-            output_file = sys.argv[2]
-        else:
-            output_file = input_file.replace('.json', '_cleaned.json')
+    args = parse_args()
+    if args.batch:
+        jobs = [(path, path.replace('.json', '_cleaned.json')) for path in args.batch]
     else:
-        # Default behavior (hardcoded)
-        input_file = 'assets/scraped_output.json'
-        output_file = 'assets/scraped_output_cleaned.json'
-    
-    # Clean the JSON file
-    clean_json_file(input_file, output_file)
+        # Use provided output file or generate one
+        jobs = [(args.input_file, args.output_file or args.input_file.replace('.json', '_cleaned.json'))]
+    
+    # Clean the JSON files
+    profiler = profiler_from_args(args, 'clean_json')
+    pool = clean_pool(args.workers)
+    try:
+        for input_file, output_file in jobs:
+            clean_json_file(input_file, output_file, profiler, pool)
+    finally:
+        if pool:
+            pool.shutdown()
     
     # Show some examples of what was cleaned
     print("\n" + "="*50)
@@ -112,3 +187,6 @@ if __name__ == "__main__":
     print("  [1], [2], [123]")
     print("  ([1]), ([2]), ([123])")
     print("="*50)
+    
+    write_run_report(args)
+    profiler.finish()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Declarative text-cleaning rules for the Nahj al-Balagha outputs
+The rules are compiled into one combined pass per text, so the scrapers can
+write a cleaned output next to the raw one as each record is saved, and
+clean_json.py applies the same rules to existing files
+"""
+
+import json
+import os
+import re
+from typing import NamedTuple
+
+from metrics import get_metrics
+
+# What a rule does with its matches
+DELETE = 'delete'  # Remove the match
+GAP = 'gap'        # Replace a run of matches and whitespace by a single space
+
+
+class Rule(NamedTuple):
+    name: str
+    pattern: str
+    action: str
+
+
+# The normalisation applied to every key and text, in the order the
+# alternatives are tried. A split reference keeps its brackets on separate
+# lines, as in "(\n\n[1]\n\n)" in the letters output.
+DEFAULT_RULES = (
+    Rule('parenthesised footnote', r'\(\[\d+\]\)', DELETE),
+    Rule('split footnote', r'\(\s*\[\d+\]\s*\)', DELETE),
+    Rule('footnote', r'\[\d+\]', DELETE),
+    Rule('whitespace', r'\s+', GAP),
+)
+
+
+class RuleSet:
+    """
+    A list of rules compiled into one combined pass.
+
+    All DELETE rules form a single alternation, applied until nothing
+    matches (removing "([1])" from "[([1])2]" exposes "[2]"). All GAP rules
+    form a second alternation whose runs become one space, after which the
+    text is stripped; when whitespace is the only GAP rule this is done with
+    str.split(), which splits on exactly the characters \\s matches.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES):
+        self.rules = tuple(rules)
+        for rule in self.rules:
+            if rule.action not in (DELETE, GAP):
+                raise ValueError(f"Unknown action {rule.action!r} in rule {rule.name!r}")
+        deletes = [rule.pattern for rule in self.rules if rule.action == DELETE]
+        gaps = [rule.pattern for rule in self.rules if rule.action == GAP]
+        self._delete = re.compile('|'.join(f'(?:{pattern})' for pattern in deletes)) if deletes else None
+        self._gap = None
+        if gaps != [r'\s+']:
+            self._gap = re.compile('(?:' + '|'.join(f'(?:{pattern})' for pattern in gaps + [r'\s']) + ')+')
+
+    def clean_text(self, text):
+        """Apply the rules to one string; anything else is returned unchanged."""
+        if not isinstance(text, str):
+            return text
+        if self._delete is not None:
+            count = 1
+            while count:
+                text, count = self._delete.subn('', text)
+        if self._gap is None:
+            return ' '.join(text.split())
+        return self._gap.sub(' ', text).strip()
+
+    def clean_value(self, data):
+        """
+        Recursively clean all keys and strings in a JSON value
+        """
+        if isinstance(data, dict):
+            return {self.clean_text(key): self.clean_value(value) for key, value in data.items()}
+        if isinstance(data, list):
+            return [self.clean_value(item) for item in data]
+        return self.clean_text(data)
+
+    def clean_member(self, key, value):
+        """The cleaned (key, value) of one output record."""
+        return self.clean_text(key), self.clean_value(value)
+
+
+_default = RuleSet()
+
+
+def clean_text(text):
+    """Clean one string with the default rules."""
+    return _default.clean_text(text)
+
+
+def clean_value(data):
+    """Clean a JSON value with the default rules."""
+    return _default.clean_value(data)
+
+
+def clean_member(key, value):
+    """Clean one output record with the default rules."""
+    return _default.clean_member(key, value)
+
+
+def cleaned_path(path):
+    """Where the cleaned twin of an output file goes: name.json -> name_cleaned.json."""
+    return path.replace('.json', '_cleaned.json')
+
+
+def save_cleaned_json(data, path):
+    """
+    Write the cleaned twin of an output dictionary, cleaning it record by record
+    """
+    with get_metrics().timer('clean'):
+        # As with any dict, records whose keys clean alike keep the first position and the last value
+        cleaned = dict(clean_member(key, value) for key, value in data.items())
+    with get_metrics().timer('save') as sample:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(cleaned, f, ensure_ascii=False, indent=2)
+        sample.size = os.path.getsize(path)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Random-access corpus store for the Nahj al-Balagha JSON files
+Builds, for each corpus file, a directory of compressed shards and a small
+key -> (shard, offset, length) index, so one sermon can be read without
+loading or decoding the whole file. Every record is compressed on its own
+with a dictionary trained on the corpus (zstandard when installed, zlib
+with a preset dictionary otherwise); readers memory-map the shards
+"""
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+import threading
+import zlib
+
+from metrics import add_metrics_arguments, get_metrics, write_run_report
+from profiling import add_profile_arguments, profiler_from_args
+
+try:
+    import zstandard
+except ImportError:  # Optional; zlib's preset dictionaries are used instead
+    zstandard = None
+
+FORMAT_VERSION = 1
+
+DEFAULT_STORE_DIR = 'stores'
+
+# A new shard is started once the current one reaches this size
+DEFAULT_SHARD_BYTES = 1 << 20
+
+# Training samples are cut into pieces of this size, so even a file with a
+# few long records gives the zstd trainer enough samples
+SAMPLE_BYTES = 4096
+
+ZSTD_DICT_BYTES = 64 * 1024
+ZSTD_LEVEL = 19
+
+# zlib only looks back 32 KiB, so a longer preset dictionary is wasted
+ZLIB_DICT_BYTES = 32 * 1024
+ZLIB_LEVEL = 9
+
+CODECS = ('zstd', 'zlib')
+DEFAULT_CODEC = 'zstd' if zstandard is not None else 'zlib'
+
+# What a damaged record raises when it is read back
+READ_ERRORS = (zlib.error, ValueError, IndexError) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+INDEX_NAME = 'index.json'
+DICT_NAME = 'dict.bin'
+
+
+def encode_value(value):
+    """The bytes stored for one record"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _samples(payloads):
+    return [payload[start:start + SAMPLE_BYTES]
+            for payload in payloads for start in range(0, len(payload), SAMPLE_BYTES)]
+
+
+def train_dictionary(payloads, codec):
+    """
+    A compression dictionary for the records, or b'' when there is too little to train on
+    """
+    if codec == 'zstd':
+        size = min(ZSTD_DICT_BYTES, sum(map(len, payloads)) // 10)
+        try:
+            return zstandard.train_dictionary(size, _samples(payloads)).as_bytes()
+        except zstandard.ZstdError:
+            return b''
+    # zlib has no trainer: a preset dictionary of evenly spaced pieces of the
+    # records, up to the window size, still catches the phrases they share
+    samples = _samples(payloads)
+    if not samples:
+        return b''
+    piece = max(64, ZLIB_DICT_BYTES // len(samples))
+    step = max(1, len(samples) * piece // ZLIB_DICT_BYTES)
+    return b''.join(sample[:piece] for sample in samples[::step])[-ZLIB_DICT_BYTES:]
+
+
+class _Codec:
+    """Compress and decompress single records with one dictionary"""
+
+    def __init__(self, name, dictionary):
+        if name == 'zstd' and zstandard is None:
+            raise RuntimeError("This store is zstd-compressed; install the zstandard package to read it")
+        self.name = name
+        self.dictionary = dictionary
+        self._local = threading.local()
+        if name == 'zstd':
+            self._dict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+
+    def compress(self, payload):
+        if self.name == 'zstd':
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=self._dict).compress(payload)
+        compressor = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -15, zdict=self.dictionary or None)
+        return compressor.compress(payload) + compressor.flush()
+
+    def decompress(self, data):
+        if self.name == 'zstd':
+            # Decompressors keep state between calls, so each thread has its own
+            decompressor = getattr(self._local, 'decompressor', None)
+            if decompressor is None:
+                decompressor = self._local.decompressor = zstandard.ZstdDecompressor(dict_data=self._dict)
+            return decompressor.decompress(data)
+        decompressor = zlib.decompressobj(-15, zdict=self.dictionary) if self.dictionary else zlib.decompressobj(-15)
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+def store_path(source, store_dir=DEFAULT_STORE_DIR):
+    """Where the store of a corpus file goes: assets/name.json -> stores/name"""
+    return os.path.join(store_dir, os.path.splitext(os.path.basename(source))[0])
+
+
+def build_store(source, path, codec=DEFAULT_CODEC, shard_bytes=DEFAULT_SHARD_BYTES):
+    """
+    Build the store of one corpus JSON file
+
+    The store is written next to `path` and moved into place when complete.
+
+    Returns:
+        The store's index dictionary
+    """
+    with open(source, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{source} is not a JSON object")
+    payloads = [encode_value(value) for value in data.values()]
+    dictionary = train_dictionary(payloads, codec)
+    compressor = _Codec(codec, dictionary)
+
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    with open(os.path.join(tmp_path, DICT_NAME), 'wb') as f:
+        f.write(dictionary)
+
+    shards = []
+    entries = []
+    shard = None
+    try:
+        for key, payload in zip(data, payloads):
+            if shard is None or shard.tell() >= shard_bytes:
+                if shard is not None:
+                    shard.close()
+                shards.append(f"shard-{len(shards):03d}.bin")
+                shard = open(os.path.join(tmp_path, shards[-1]), 'wb')
+            record = compressor.compress(payload)
+            entries.append([key, len(shards) - 1, shard.tell(), len(record)])
+            shard.write(record)
+    finally:
+        if shard is not None:
+            shard.close()
+
+    index = {
+        'version': FORMAT_VERSION,
+        'source': os.path.basename(source),
+        'codec': codec,
+        'dictionary': DICT_NAME,
+        'shards': shards,
+        'raw_bytes': sum(map(len, payloads)),
+        'keys': entries,
+    }
+    with open(os.path.join(tmp_path, INDEX_NAME), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return index
+
+
+class CorpusStore:
+    """
+    Read-only, random-access view of a store built by build_store().
+
+    Only the index is loaded on open; shards are memory-mapped on first use
+    and get() decompresses just the one record asked for. Keys iterate in
+    the source file's order. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_NAME), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported store version {index.get('version')!r}")
+        self.source = index['source']
+        self.raw_bytes = index['raw_bytes']
+        with open(os.path.join(path, index['dictionary']), 'rb') as f:
+            self._codec = _Codec(index['codec'], f.read())
+        self._shard_names = index['shards']
+        self._shards = [None] * len(self._shard_names)
+        self._lock = threading.Lock()
+        self._index = {key: (shard, offset, length) for key, shard, offset, length in index['keys']}
+
+    @property
+    def codec(self):
+        return self._codec.name
+
+    def _shard(self, number):
+        shard = self._shards[number]
+        if shard is None:
+            with self._lock:
+                shard = self._shards[number]
+                if shard is None:
+                    with open(os.path.join(self.path, self._shard_names[number]), 'rb') as f:
+                        shard = self._shards[number] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return shard
+
+    def raw(self, key):
+        """The stored JSON text of one record, as UTF-8 bytes"""
+        shard, offset, length = self._index[key]
+        return self._codec.decompress(self._shard(shard)[offset:offset + length])
+
+    def __getitem__(self, key):
+        return json.loads(self.raw(key))
+
+    def get(self, key, default=None):
+        if key not in self._index:
+            return default
+        return self[key]
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def items(self):
+        for key in self._index:
+            yield key, self[key]
+
+    def compressed_bytes(self):
+        """Total size of the shards"""
+        return sum(os.path.getsize(os.path.join(self.path, name)) for name in self._shard_names)
+
+    def close(self):
+        with self._lock:
+            for shard in self._shards:
+                if shard is not None:
+                    shard.close()
+            self._shards = [None] * len(self._shard_names)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def verify_store(path, source):
+    """
+    Check a store against its source JSON: same keys, in the same order, with equal values
+
+    Returns:
+        List of problems found (empty when the store round-trips)
+    """
+    with open(source, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    problems = []
+    with CorpusStore(path) as store:
+        if list(store) != list(data):
+            missing = [key for key in data if key not in store]
+            extra = [key for key in store if key not in data]
+            problems.append(f"keys differ: {len(missing)} missing, {len(extra)} extra"
+                            if missing or extra else "keys are in a different order")
+        for key, value in data.items():
+            if key not in store:
+                continue
+            try:
+                stored = store[key]
+            except READ_ERRORS as e:
+                problems.append(f"{key}: cannot be read ({e})")
+                continue
+            if stored != value:
+                problems.append(f"{key}: value differs from the source")
+    return problems
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build random-access compressed stores of the corpus JSON files")
+    parser.add_argument('sources', nargs='+', metavar='FILE',
+                        help="Corpus JSON files, e.g. assets/scraped_output.json")
+    parser.add_argument('--output-dir', default=DEFAULT_STORE_DIR,
+                        help=f"Directory the stores are written to, one per file (default: {DEFAULT_STORE_DIR})")
+    parser.add_argument('--codec', choices=CODECS, default=DEFAULT_CODEC,
+                        help=f"Record compression (default: {DEFAULT_CODEC}; zstd needs the zstandard package)")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_BYTES, metavar='BYTES',
+                        help=f"Start a new shard after this many compressed bytes (default: {DEFAULT_SHARD_BYTES})")
+    parser.add_argument('--verify', action='store_true',
+                        help="Only check the existing stores against the files, without building")
+    add_profile_arguments(parser)
+    add_metrics_arguments(parser, 'corpus_store')
+    args = parser.parse_args()
+    if args.codec == 'zstd' and zstandard is None:
+        parser.error("--codec zstd needs the zstandard package")
+    # Stores are named after the file alone, so a/x.json and b/x.json would
+    # overwrite each other
+    sources = {}
+    for source in args.sources:
+        path = store_path(source, args.output_dir)
+        other = sources.setdefault(path, source)
+        if os.path.realpath(other) != os.path.realpath(source):
+            parser.error(f"{other} and {source} would both be stored in {path}; "
+                         f"build them with separate --output-dir runs")
+    args.sources = list(dict.fromkeys(sources.values()))
+    return args
+
+
+def main():
+    args = parse_args()
+    profiler = profiler_from_args(args, 'corpus_store')
+    failed = False
+    for source in args.sources:
+        path = store_path(source, args.output_dir)
+        if not args.verify:
+            with profiler.stage('build'), get_metrics().timer('save') as sample:
+                index = build_store(source, path, args.codec, args.shard_size)
+                with CorpusStore(path) as store:
+                    sample.size = store.compressed_bytes()
+            print(f"📦 {source} -> {path}: {len(index['keys'])} records in {len(index['shards'])} shards, "
+                  f"{index['raw_bytes'] / 1024:.0f} KiB -> {sample.size / 1024:.0f} KiB ({index['codec']})")
+        with profiler.stage('verify'):
+            problems = verify_store(path, source)
+        if problems:
+            failed = True
+            print(f"❌ {path} does not match {source}:")
+            for problem in problems[:20]:
+                print(f"   {problem}")
+        else:
+            print(f"✅ {path} round-trips {source}")
+    write_run_report(args)
+    profiler.finish()
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Refresh the whole corpus in one crawl
+Runs the jobs of scraper.py, letters_scraper.py and explanation_scraper.py
+through one CrawlScheduler, so imamali.net and gadir.free.fr are crawled at
+the same time and the refresh takes about as long as the slowest host.
+Writes the same three JSON files as running the scrapers one by one.
+"""
+
+import argparse
+import time
+from functools import partial
+from urllib.parse import urlparse
+
+import explanation_scraper
+import letters_scraper
+import scraper
+from crawl_scheduler import CrawlScheduler
+from fast_extract import add_backend_arguments, get_backend, set_backend
+from fetch_engine import (DEFAULT_CONCURRENCY, DEFAULT_MAX_RATE, DEFAULT_PARSE_WORKERS, DEFAULT_RATE,
+                          adaptive_limiter, parse_pool)
+from http_client import add_client_arguments, configure_from_args, get_client
+from metrics import add_metrics_arguments, get_metrics, timed_call, write_run_report
+from profiling import add_profile_arguments, profiler_from_args
+
+
+def fetch_and_parse(url, fetch, parse, pool=None):
+    """
+    Fetch a page on a scheduler thread and parse it, in the process pool if there is one
+    """
+    page = fetch(url)
+    if page is None:
+        return None
+    if pool is None:
+        result, seconds = timed_call(parse, page)
+    else:
+        result, seconds = pool.submit(timed_call, parse, page).result()
+    get_metrics().record('parse', seconds, len(page), urlparse(url).netloc)
+    return result
+
+
+class ListCrawl:
+    """
+    A list page and its detail pages, as scraped by scraper.py and letters_scraper.py
+    """
+
+    def __init__(self, label, start_url, get_page_content, extract_list, fetch_page, parse_page, pool=None):
+        self.label = label
+        self.start_url = start_url
+        self.get_page_content = get_page_content
+        self.extract_list = extract_list
+        self.fetch_page = fetch_page
+        self.parse_page = parse_page
+        self.pool = pool
+        self.items = None
+        self.contents = []
+        self.done = 0
+
+    def start(self, scheduler):
+        self.scheduler = scheduler
+        # The list page goes first: every other job of this crawl comes from it
+        scheduler.submit(self.start_url, self.get_page_content, self._on_list, priority=(0, 0))
+
+    def _on_list(self, html_content):
+        if not html_content:
+            print(f"[{self.label}] Failed to fetch the main page")
+            self.items = []
+            return
+        self.items = self.extract_list(html_content)
+        self.contents = [None] * len(self.items)
+        print(f"[{self.label}] Found {len(self.items)} entries")
+        job = partial(fetch_and_parse, fetch=self.fetch_page, parse=self.parse_page, pool=self.pool)
+        for index, item in enumerate(self.items):
+            self.scheduler.submit(item['url'], job, partial(self._on_item, index), priority=(1, index))
+
+    def _on_item(self, index, content):
+        self.contents[index] = content
+        self.done += 1
+        status = "" if content is not None else " (failed)"
+        rate = self.scheduler.rate_for(self.start_url)
+        print(f"[{self.label}] {self.done}/{len(self.items)}: {self.items[index]['title']}{status} [{rate:.1f} req/s]")
+
+    def results(self):
+        """The scraper's output dictionary, in list order."""
+        results = {}
+        for item, content in zip(self.items or [], self.contents):
+            if content is None:
+                print(f"  Failed to fetch {self.label} page: {item['title']}")
+                continue
+            results[item['title']] = {'text': content, 'notes': []}
+        return results
+
+
+class ExplanationCrawl:
+    """
+    Every page of every explanation book on gadir.free.fr
+
+    Pages may finish in any order; each book keeps a reorder buffer and feeds
+    its streaming extractor strictly in page order.
+    """
+
+    def __init__(self, books, pages, pool=None):
+        self.books = books
+        self.pages = pages
+        self.pool = pool
+        self.extractors = {book_num: explanation_scraper.ExplanationExtractor() for book_num in books}
+        self.buffers = {book_num: {} for book_num in books}
+        self.next_page = {book_num: 0 for book_num in books}
+        self.book_results = {}
+
+    def start(self, scheduler):
+        self.scheduler = scheduler
+        job = partial(fetch_and_parse, fetch=explanation_scraper.fetch_page_text,
+                      parse=explanation_scraper.parse_page, pool=self.pool)
+        for book_num in self.books:
+            for page_idx, page_num in enumerate(self.pages):
+                scheduler.submit(explanation_scraper.page_url(book_num, page_num), job,
+                                 partial(self._on_page, book_num, page_idx), priority=(book_num, page_num))
+
+    def _on_page(self, book_num, page_idx, elements):
+        status = "✅" if elements is not None else "❌"
+        rate = self.scheduler.rate_for(explanation_scraper.page_url(book_num, self.pages[page_idx]))
+        print(f"  📄 Book {book_num} page {self.pages[page_idx]}/{len(self.pages)} {status} [{rate:.1f} req/s]")
+        # A failed page is skipped, as in explanation_scraper.py
+        buffer = self.buffers[book_num]
+        buffer[page_idx] = elements or []
+        while self.next_page[book_num] in buffer:
+            self.extractors[book_num].feed(buffer.pop(self.next_page[book_num]))
+            self.next_page[book_num] += 1
+        if self.next_page[book_num] == len(self.pages):
+            self.book_results[book_num] = self.extractors[book_num].close()
+            print(f"\n✅ Book {book_num} complete: {len(self.book_results[book_num])} sermons extracted")
+
+    def results(self):
+        """All sermons, merged in book order."""
+        merger = explanation_scraper.BookMerger()
+        for book_num in self.books:
+            merger.add(book_num, self.book_results.get(book_num, {}))
+        merger.print_collisions()
+        return merger.results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Refresh sermons, letters and explanations in one crawl")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Maximum requests in flight per host (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument('--imamali-rate', type=float, default=DEFAULT_RATE,
+                        help=f"Starting requests per second to imamali.net (default: {DEFAULT_RATE})")
+    parser.add_argument('--imamali-max-rate', type=float, default=DEFAULT_MAX_RATE,
+                        help=f"Ceiling for the adaptive imamali.net rate (default: {DEFAULT_MAX_RATE})")
+    parser.add_argument('--gadir-rate', type=float, default=explanation_scraper.GADIR_RATE,
+                        help=f"Starting requests per second to gadir.free.fr (default: {explanation_scraper.GADIR_RATE})")
+    parser.add_argument('--gadir-max-rate', type=float, default=explanation_scraper.GADIR_MAX_RATE,
+                        help=f"Ceiling for the adaptive gadir.free.fr rate "
+                             f"(default: {explanation_scraper.GADIR_MAX_RATE})")
+    parser.add_argument('--parse-workers', type=int, default=DEFAULT_PARSE_WORKERS,
+                        help=f"Parser processes; 0 parses in the fetching threads (default: {DEFAULT_PARSE_WORKERS})")
+    add_client_arguments(parser)
+    add_backend_arguments(parser)
+    add_profile_arguments(parser)
+    add_metrics_arguments(parser, 'crawl_all')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    configure_from_args(args)
+    set_backend(args.parser)
+    profiler = profiler_from_args(args, 'crawl_all')
+
+    imamali = urlparse(scraper.START_URL).netloc
+    gadir = urlparse(explanation_scraper.page_url(1, 1)).netloc
+    limiter = adaptive_limiter(get_client(), DEFAULT_RATE, DEFAULT_MAX_RATE,
+                               rates={imamali: args.imamali_rate, gadir: args.gadir_rate},
+                               ceilings={imamali: args.imamali_max_rate, gadir: args.gadir_max_rate})
+    scheduler = CrawlScheduler(limiter, concurrency=args.concurrency)
+    pool = parse_pool(args.parse_workers)
+    try:
+        sermons = ListCrawl('sermon', scraper.START_URL, scraper.get_page_content, scraper.extract_sermon_list,
+                            scraper.fetch_sermon_page, partial(scraper.parse_sermon_page, backend=get_backend()),
+                            pool)
+        letters = ListCrawl('letter', letters_scraper.START_URL, letters_scraper.get_page_content,
+                            letters_scraper.extract_list, letters_scraper.fetch_item_page,
+                            partial(letters_scraper.parse_item_page, backend=get_backend()), pool)
+        explanations = ExplanationCrawl(list(range(1, 6)), list(range(1, 29)), pool)
+        for crawl in (sermons, letters, explanations):
+            crawl.start(scheduler)
+
+        started = time.monotonic()
+        with profiler.stage('crawl'):
+            scheduler.run()
+    finally:
+        if pool:
+            pool.shutdown()
+
+    outputs = (
+        (sermons.results(), 'assets/scraped_output.json', scraper.save_to_json),
+        (letters.results(), 'assets/letters_output.json', letters_scraper.save_to_json),
+        (explanations.results(), 'all_explanations.json', explanation_scraper.save_to_json),
+    )
+    with profiler.stage('save'):
+        for data, filename, save in outputs:
+            if data:
+                save(data, filename)
+            else:
+                print(f"No data was scraped for {filename}")
+
+    scheduler.print_stats(started)
+    get_client().print_stats()
+    write_run_report(args)
+    profiler.finish()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Multi-host crawl scheduler for the Nahj al-Balagha scrapers
+Jobs from every scraper wait in one priority queue per host and are
+dispatched whenever that host's politeness window is open, so hosts are
+crawled side by side instead of one after another
+"""
+
+import heapq
+import itertools
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from fetch_engine import DEFAULT_CONCURRENCY, DEFAULT_RATE, HostRateLimiter
+
+
+class HostQueue:
+    """
+    Pending jobs for one host, highest priority (lowest value) first, with
+    the host's own token bucket and concurrency cap
+    """
+
+    def __init__(self, host, bucket, concurrency):
+        self.host = host
+        self.bucket = bucket
+        self.concurrency = concurrency
+        self.jobs = []
+        self.in_flight = 0
+        self.done = 0
+
+
+class CrawlScheduler:
+    """
+    Dispatch fetch jobs across hosts.
+
+    submit() queues a job under its URL's host. run() starts a job as soon as
+    its host has both a free slot and a token, and calls the job's callback
+    on the scheduler's own thread when it finishes, so callbacks may submit
+    follow-up jobs (such as the detail pages found on a list page) and need
+    no locking. run() returns when every queue is empty and nothing is in
+    flight.
+    """
+
+    def __init__(self, limiter=None, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Args:
+            limiter: HostRateLimiter (or AdaptiveRateLimiter) providing each
+                host's token bucket; by default DEFAULT_RATE per host
+            concurrency: Most jobs in flight per host
+        """
+        self.limiter = limiter or HostRateLimiter(DEFAULT_RATE)
+        self.concurrency = concurrency
+        self.hosts = {}
+        self._order = itertools.count()
+        self._completed = queue.Queue()
+
+    def _host_queue(self, url):
+        host = urlparse(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = HostQueue(host, self.limiter.bucket_for(url), self.concurrency)
+        return self.hosts[host]
+
+    def submit(self, url, fetch, on_done, priority=0):
+        """
+        Queue a job
+
+        Args:
+            url: URL the job fetches; its host decides the queue
+            fetch: Blocking function taking the URL, run on a worker thread
+            on_done: Callback receiving fetch's result (or None if it raised)
+            priority: Sort key within the host's queue; lower runs first
+        """
+        host_queue = self._host_queue(url)
+        heapq.heappush(host_queue.jobs, (priority, next(self._order), url, fetch, on_done))
+
+    def rate_for(self, url):
+        """Current requests per second allowed to the URL's host."""
+        return self.limiter.bucket_for(url).rate
+
+    def pending(self):
+        return sum(len(host_queue.jobs) + host_queue.in_flight for host_queue in self.hosts.values())
+
+    def run(self):
+        """
+        Run until every queued job, including those submitted by callbacks, is done
+        """
+        workers = max(1, self.concurrency * max(1, len(self.hosts)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while self.pending():
+                wait = self._dispatch(executor)
+                # Sleep until a job finishes or the next politeness window opens
+                try:
+                    completion = self._completed.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                self._finish(*completion)
+                # Handle everything else that finished meanwhile before dispatching again
+                while True:
+                    try:
+                        completion = self._completed.get_nowait()
+                    except queue.Empty:
+                        break
+                    self._finish(*completion)
+
+    def _dispatch(self, executor):
+        """
+        Start every job whose host window is open
+
+        Returns:
+            Seconds until the next window opens, or None if only completions
+            can make progress
+        """
+        wait = None
+        for host_queue in self.hosts.values():
+            while host_queue.jobs and host_queue.in_flight < host_queue.concurrency:
+                delay = host_queue.bucket.try_acquire()
+                if delay:
+                    wait = delay if wait is None else min(wait, delay)
+                    break
+                _, _, url, fetch, on_done = heapq.heappop(host_queue.jobs)
+                host_queue.in_flight += 1
+                future = executor.submit(fetch, url)
+                future.add_done_callback(
+                    lambda future, host_queue=host_queue, on_done=on_done:
+                        self._completed.put((host_queue, on_done, future)))
+        return wait
+
+    def _finish(self, host_queue, on_done, future):
+        host_queue.in_flight -= 1
+        host_queue.done += 1
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Job failed on {host_queue.host}: {e}")
+            result = None
+        on_done(result)
+
+    def print_stats(self, started):
+        """Print how many jobs each host ran and the total wall time."""
+        elapsed = time.monotonic() - started
+        for host_queue in self.hosts.values():
+            print(f"{host_queue.host}: {host_queue.done} requests, {host_queue.bucket.rate:.1f} req/s at the end")
+        print(f"Crawl finished in {elapsed:.1f}s")
@@ -4,209 +4,544 @@ Scraper for Nahj al-Balagha explanations from gadir.free.fr
 Extracts sermon numbers and their explanations (sharh/tafsir)
 """
 
-import requests
 from bs4 import BeautifulSoup
+import argparse
 import json
+import os
 import re
-from typing import Dict, List
-import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
 
+from checkpoint import Journal, add_journal_arguments, open_journal
+from fetch_engine import DEFAULT_PARSE_WORKERS, HostRateLimiter, adaptive_limiter, parse_pool
+from http_client import add_client_arguments, configure_from_args, get_client
+from incremental import (IncrementalState, add_incremental_arguments, diff_outputs, is_gone, load_output,
+                         print_diff)
+from json_stream import NDJSONWriter, add_stream_arguments, finalize_ndjson
+from metrics import add_metrics_arguments, get_metrics, timed, timed_call, write_run_report
+from profiling import add_profile_arguments, profiler_from_args
 
-def fetch_page_content(url: str) -> BeautifulSoup:
+# Books scraped at the same time
+DEFAULT_BOOK_CONCURRENCY = 5
+
+# Politeness budget for gadir.free.fr, shared by all books: it starts at one
+# request per second, the pace of the old sleep between pages, and adapts up
+# to the ceiling while the server stays healthy
+GADIR_RATE = 1.0
+GADIR_MAX_RATE = 3.0
+
+# Streamed sermons are indexed book * stride + position in the book, so the
+# final JSON follows book order whatever order the books finish in
+BOOK_INDEX_STRIDE = 1_000_000
+
+
+def page_url(book_num: int, page_num: int) -> str:
+    """URL of one page of one book on gadir.free.fr."""
+    return f"http://gadir.free.fr/Ar/imamali/Nhj/Nefhatul_Velaye/7/book_39/NAFAHATVELG{book_num:02d}/{page_num:02d}.html"
+
+
+def fetch_page_text(url: str) -> str:
     """
-    Fetch and parse a single page.
+    Fetch and decode a single page.
     
     Args:
         url: URL of the page to fetch
         
     Returns:
-        BeautifulSoup object of the page, or None if error
+        The page's HTML, or None if error
     """
     try:
-        response = requests.get(url, timeout=30)
-        response.encoding = response.apparent_encoding or 'windows-1256'
-        response.raise_for_status()
-        return BeautifulSoup(response.text, 'html.parser')
+        client = get_client()
+        return client.decode(client.get(url, timeout=30))
     except Exception as e:
         print(f"❌ Error fetching {url}: {e}")
         return None
 
 
-def extract_sermons_from_combined_content(all_soups: List[BeautifulSoup]) -> Dict[str, str]:
+def fetch_page_content(url: str) -> BeautifulSoup:
     """
-    Extract all sermons from combined content of multiple pages.
-    This allows sermons that span multiple pages to be extracted completely.
+    Fetch and parse a single page.
     
     Args:
-        all_soups: List of BeautifulSoup objects from all pages in a book
+        url: URL of the page to fetch
         
     Returns:
-        Dictionary with sermon number as key and explanation text as value
+        BeautifulSoup object of the page, or None if error
     """
-    result = {}
+    text = fetch_page_text(url)
+    return BeautifulSoup(text, 'html.parser') if text is not None else None
+
+
+def page_elements(soup: BeautifulSoup) -> List[Tuple[str, List[str], str]]:
+    """
+    Flatten one page into the h1/h3/p elements the extractor reads.
     
-    # Combine all elements from all pages, skipping the book title h1 from each page
-    all_elements = []
-    for soup in all_soups:
-        if soup:
-            body = soup.find('body')
-            if body:
-                elements = body.find_all(['h1', 'h3', 'p'])
-                # Skip the first h1 ONLY if it's the book title (not a sermon)
-                first_h1_in_page = True
-                for element in elements:
-                    # Check if this is the first h1 in the page
-                    if element.name == 'h1' and first_h1_in_page:
-                        first_h1_in_page = False  # Mark that we've seen the first h1
-                        h1_text = element.get_text(strip=True)
-                        # Skip ONLY if this is the book title (not a sermon)
-                        if 'نفحات' in h1_text or 'الولاية' in h1_text or 'الخطبة' not in h1_text:
-                            continue  # Skip this book title
-                        # Otherwise, it's a sermon header, so add it
-                    all_elements.append(element)
-    
-    # Now process the combined elements
-    i = 0
-    while i < len(all_elements):
-        element = all_elements[i]
+    The book title (the first h1 of the page, unless it is a sermon header)
+    is left out. Only what the extractor needs is kept, so the page's tree
+    can be freed as soon as this returns.
+    
+    Args:
+        soup: BeautifulSoup object of one page
         
-        # Check if this is a sermon header
-        if element.name == 'h1':
-            h1_text = element.get_text(strip=True)
-            # Match patterns like: الخطبة 1, الخطبة(1) 21, الخطبة 65, etc.
-            # First try to match the last number (the actual sermon number after any footnote)
-            numbers = re.findall(r'\d+', h1_text)
-            
-            # Only process if this h1 is actually a sermon header (contains 'الخطبة')
-            if numbers and 'الخطبة' in h1_text:
-                # Take the last number as the sermon number (e.g., from "الخطبة(1) 21", take 21)
-                sermon_number = numbers[-1]
-                key = f"الخطبة{sermon_number}"
-                print(f"  ✅ Found: {key}")
-                
-                # Find the explanation section
-                explanation_parts = []
-                found_sharh_section = False
-                i += 1  # Move to next element
-                
-                # Collect all content until the next h1 (next sermon)
-                while i < len(all_elements):
-                    current = all_elements[i]
-                    
-                    # Stop if we hit another h1 (could be next sermon or another heading)
-                    if current.name == 'h1':
-                        break
-                    
-                    # Check if this is the "الشرح والتفسير" marker (in <p class="mohem">)
-                    if current.name == 'p' and 'mohem' in current.get('class', []):
-                        text = current.get_text(strip=True)
-                        if 'الشرح والتفسير' in text or 'الشرح' in text or 'التفسير' in text:
-                            found_sharh_section = True
-                            i += 1
-                            continue
-                    
-                    # Also check for <h3> markers like <h3>شرح الخطبة</h3> or <h3>الشرح والتفسير</h3>
-                    if current.name == 'h3':
-                        text = current.get_text(strip=True)
-                        if 'شرح الخطبة' in text or 'شرح' in text or 'الشرح والتفسير' in text or 'التفسير' in text:
-                            found_sharh_section = True
-                            i += 1
-                            continue
-                    
-                    # Collect paragraph text after sharh section starts
-                    # If multiple explanation sections are found, keep collecting all paragraphs
-                    if found_sharh_section and current.name == 'p':
-                        # Skip footnotes
-                        if 'foot1' not in current.get('class', []):
-                            text = current.get_text(strip=True)
-                            if text:
-                                explanation_parts.append(text)
-                    
-                    i += 1
-                
-                # Save the complete explanation
-                if explanation_parts:
-                    result[key] = '\n\n'.join(explanation_parts)
-                    print(f"    📝 Extracted {len(explanation_parts)} paragraphs (complete across all pages)")
-                else:
-                    print(f"    ⚠️  No explanation found for {key}")
+    Returns:
+        List of (tag name, classes, stripped text) tuples in document order
+    """
+    elements = []
+    body = soup.find('body') if soup else None
+    if not body:
+        return elements
+    # Skip the first h1 ONLY if it's the book title (not a sermon)
+    first_h1_in_page = True
+    for element in body.find_all(['h1', 'h3', 'p']):
+        text = element.get_text(strip=True)
+        # Check if this is the first h1 in the page
+        if element.name == 'h1' and first_h1_in_page:
+            first_h1_in_page = False  # Mark that we've seen the first h1
+            # Skip ONLY if this is the book title (not a sermon)
+            if 'نفحات' in text or 'الولاية' in text or 'الخطبة' not in text:
+                continue  # Skip this book title
+            # Otherwise, it's a sermon header, so add it
+        elements.append((element.name, element.get('class', []), text))
+    return elements
+
+
+def parse_page(page_text: str) -> List[Tuple[str, List[str], str]]:
+    """
+    Parse one fetched page into its extractor elements.
+    Runs in a parser process while the next pages are being fetched.
+    """
+    return page_elements(BeautifulSoup(page_text, 'html.parser'))
+
+
+class ExplanationExtractor:
+    """
+    Resumable state machine extracting sermons from a book, one page at a time.
+    
+    Pages are fed in order with feed(); a sermon whose explanation continues
+    on the next page stays open, so only its partial explanation is carried
+    across page boundaries. close() ends the last sermon and returns the
+    dictionary of sermon number key to explanation text.
+    """
+    
+    def __init__(self, on_sermon=None):
+        self.on_sermon = on_sermon    # Called with (key, text) as each sermon is completed
+        self.result = {}
+        self._completed = []          # (key, text) of the sermons completed since the last checkpoint
+        self._key = None              # Sermon currently being collected
+        self._parts = []              # Its explanation paragraphs so far
+        self._found_sharh_section = False
+    
+    @timed('extract')
+    def feed(self, elements: List[Tuple[str, List[str], str]]):
+        """Process the elements of the next page (see page_elements())."""
+        for name, classes, text in elements:
+            # Check if this is a sermon header
+            if name == 'h1':
+                # The previous sermon ends at the next h1 (next sermon or another heading)
+                self._end_sermon()
+                # Match patterns like: الخطبة 1, الخطبة(1) 21, الخطبة 65, etc.
+                # First try to match the last number (the actual sermon number after any footnote)
+                numbers = re.findall(r'\d+', text)
                 
-                # Don't increment i here, let the outer loop handle the next h1
+                # Only process if this h1 is actually a sermon header (contains 'الخطبة')
+                # Otherwise (e.g. a chapter title or section heading) it is skipped
+                if numbers and 'الخطبة' in text:
+                    # Take the last number as the sermon number (e.g., from "الخطبة(1) 21", take 21)
+                    self._key = f"الخطبة{numbers[-1]}"
+                    print(f"  ✅ Found: {self._key}")
                 continue
-            else:
-                # This h1 is not a sermon header (e.g., chapter title, section heading)
-                # Just skip it and continue to the next element
-                i += 1
+            
+            # Elements outside a sermon are skipped
+            if self._key is None:
                 continue
-        
-        i += 1
+            
+            # Check if this is the "الشرح والتفسير" marker (in <p class="mohem">)
+            if name == 'p' and 'mohem' in classes:
+                if 'الشرح والتفسير' in text or 'الشرح' in text or 'التفسير' in text:
+                    self._found_sharh_section = True
+                    continue
+            
+            # Also check for <h3> markers like <h3>شرح الخطبة</h3> or <h3>الشرح والتفسير</h3>
+            if name == 'h3':
+                if 'شرح الخطبة' in text or 'شرح' in text or 'الشرح والتفسير' in text or 'التفسير' in text:
+                    self._found_sharh_section = True
+                    continue
+            
+            # Collect paragraph text after sharh section starts
+            # If multiple explanation sections are found, keep collecting all paragraphs
+            if self._found_sharh_section and name == 'p':
+                # Skip footnotes
+                if 'foot1' not in classes and text:
+                    self._parts.append(text)
+    
+    def _end_sermon(self):
+        if self._key is None:
+            return
+        # Save the complete explanation
+        if self._parts:
+            self.result[self._key] = '\n\n'.join(self._parts)
+            self._completed.append((self._key, self.result[self._key]))
+            print(f"    📝 Extracted {len(self._parts)} paragraphs (complete across all pages)")
+            if self.on_sermon is not None:
+                self.on_sermon(self._key, self.result[self._key])
+        else:
+            print(f"    ⚠️  No explanation found for {self._key}")
+        self._key = None
+        self._parts = []
+        self._found_sharh_section = False
+    
+    def checkpoint(self) -> dict:
+        """
+        What the pages fed so far added: the sermons completed since the last
+        checkpoint, and the open sermon carried over to the next page.
+        """
+        state = {
+            'sermons': self._completed,
+            'key': self._key,
+            'parts': list(self._parts),
+            'sharh': self._found_sharh_section,
+        }
+        self._completed = []
+        return state
+    
+    def restore(self, state: dict):
+        """Replay a checkpoint() of an interrupted run, as if its pages had been fed again."""
+        for key, text in state['sermons']:
+            self.result[key] = text
+            if self.on_sermon is not None:
+                self.on_sermon(key, text)
+        self._key = state['key']
+        self._parts = list(state['parts'])
+        self._found_sharh_section = state['sharh']
+    
+    def close(self) -> Dict[str, str]:
+        """End the open sermon, if any, and return all extracted sermons."""
+        self._end_sermon()
+        return self.result
+
+
+def extract_sermons_from_combined_content(all_soups: List[BeautifulSoup]) -> Dict[str, str]:
+    """
+    Extract all sermons from combined content of multiple pages.
+    This allows sermons that span multiple pages to be extracted completely.
     
-    return result
+    Args:
+        all_soups: List of BeautifulSoup objects from all pages in a book
+        
+    Returns:
+        Dictionary with sermon number as key and explanation text as value
+    """
+    extractor = ExplanationExtractor()
+    for soup in all_soups:
+        extractor.feed(page_elements(soup))
+    return extractor.close()
 
 
 def save_to_json(data: Dict[str, str], output_file: str):
     """Save data to JSON file."""
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with get_metrics().timer('save') as sample:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        sample.size = os.path.getsize(output_file)
     
     print(f"\n✅ Saved {len(data)} sermons to {output_file}")
 
 
-def scrape_all_books_and_pages(books: List[int], pages: List[int]) -> Dict[str, str]:
+def page_journal_key(book_num: int, page_num: int) -> str:
+    """Journal key of one extracted page."""
+    return f"page:{book_num:02d}:{page_num:02d}"
+
+
+def scrape_book(book_num: int, pages: List[int], limiter: HostRateLimiter, pool=None,
+                on_sermon=None, journal: Journal = None, texts: Dict[int, str] = None) -> Dict[str, str]:
+    """
+    Fetch and extract one book, page by page.
+    
+    Pages are fed in order to a streaming extractor, so sermons that span pages
+    are extracted completely without keeping the book's pages in memory.
+    With a journal, each page is recorded as soon as it is extracted, with
+    the sermons it completed and the sermon it leaves open; a resumed run
+    restores the pages already done and fetches only the rest.
+    
+    Args:
+        book_num: Book number
+        pages: List of page numbers
+        limiter: Politeness budget shared by every book being scraped
+        pool: Optional process pool parsing pages while the next ones are fetched
+        on_sermon: Optional callback receiving (key, text) as each sermon is extracted
+        journal: Optional checkpoint journal of extracted pages
+        texts: Optional page number -> HTML of pages fetched already, which
+               are used instead of being requested again
+        
+    Returns:
+        Dictionary with sermon number as key and explanation text as value
+    """
+    extractor = ExplanationExtractor(on_sermon)
+    parsing = deque()  # (page, url, size, future) of fetched pages, in page order
+    
+    done = 0
+    while journal is not None and done < len(pages) and page_journal_key(book_num, pages[done]) in journal:
+        extractor.restore(journal.get(page_journal_key(book_num, pages[done])))
+        done += 1
+    if done:
+        print(f"  ⏭️  Book {book_num}: {done} pages restored from journal")
+    
+    def feed(page_num, url, size, parsed):
+        elements, seconds = parsed
+        get_metrics().record('parse', seconds, size, urlparse(url).netloc)
+        extractor.feed(elements)
+        if journal is not None:
+            journal.record(page_journal_key(book_num, page_num), extractor.checkpoint())
+    
+    for page_num in pages[done:]:
+        url = page_url(book_num, page_num)
+        text = texts.pop(page_num, None) if texts else None
+        if text is None:
+            # Be nice to the server: every book draws on the same budget
+            limiter.bucket_for(url).acquire()
+            text = fetch_page_text(url)
+        rate = f"[{limiter.bucket_for(url).rate:.1f} req/s]"
+        if text is None:
+            print(f"  📄 Book {book_num} page {page_num}/{len(pages)} ❌ {rate}")
+            continue
+        print(f"  📄 Book {book_num} page {page_num}/{len(pages)} ✅ {rate}")
+        if pool is None:
+            feed(page_num, url, len(text), timed_call(parse_page, text))
+            continue
+        parsing.append((page_num, url, len(text), pool.submit(timed_call, parse_page, text)))
+        # Backpressure: keep at most two pages of this book waiting for a parser
+        while len(parsing) > 2:
+            page_num, url, size, future = parsing.popleft()
+            feed(page_num, url, size, future.result())
+    
+    while parsing:
+        page_num, url, size, future = parsing.popleft()
+        feed(page_num, url, size, future.result())
+    return extractor.close()
+
+
+class BookMerger:
+    """
+    Merge per-book results, added in book order.
+    
+    As before, a key emitted by two books keeps its first position and takes
+    the later book's text, but every such collision is recorded and reported
+    instead of being silently overwritten. With an NDJSON writer, emit()
+    writes each sermon to the stream as soon as it is extracted, indexed so
+    that the final JSON still follows book order, instead of collecting it.
+    """
+    
+    def __init__(self, writer: NDJSONWriter = None):
+        self.writer = writer
+        self.results = {}
+        self.collisions = []  # (key, earlier book, later book)
+        self._owner = {}
+        self._emitted = {}    # Sermons streamed so far, per book
+        self._lock = threading.Lock()
+    
+    def emit(self, book_num: int, key: str, value: str):
+        """Stream one sermon of a book as it is extracted (a no-op without a writer)."""
+        if self.writer is None:
+            return
+        with self._lock:
+            sequence = self._emitted.get(book_num, 0)
+            self._emitted[book_num] = sequence + 1
+        self.writer.write(book_num * BOOK_INDEX_STRIDE + sequence, key, value)
+    
+    def add(self, book_num: int, book_results: Dict[str, str]):
+        """Add a finished book, in book order; its sermons are kept unless they were streamed."""
+        for key, value in book_results.items():
+            if key in self._owner and self._owner[key] != book_num:
+                self.collisions.append((key, self._owner[key], book_num))
+            self._owner[key] = book_num
+            if self.writer is None:
+                self.results[key] = value
+    
+    def print_collisions(self):
+        """Report keys produced by more than one book."""
+        if not self.collisions:
+            return
+        print(f"\n⚠️  {len(self.collisions)} sermon keys were produced by more than one book:")
+        for key, earlier, later in self.collisions:
+            print(f"  {key}: Book {earlier} overwritten by Book {later}")
+
+
+def scrape_all_books_and_pages(books: List[int], pages: List[int], journal: Journal = None,
+                               writer: NDJSONWriter = None,
+                               parse_workers: int = DEFAULT_PARSE_WORKERS,
+                               concurrency: int = DEFAULT_BOOK_CONCURRENCY,
+                               rate: float = GADIR_RATE, max_rate: float = GADIR_MAX_RATE) -> Dict[str, str]:
     """
     Scrape multiple books and pages.
-    This function fetches all pages of a book first, then extracts complete sermons
-    that may span across multiple pages.
+    Books are independent jobs run `concurrency` at a time, sharing one request
+    rate for gadir.free.fr that starts at `rate` and adapts to the server's
+    health, never above `max_rate`. Their results are merged in book order
+    whatever order they finish in.
     
     Args:
         books: List of book numbers (1-5)
         pages: List of page numbers (1-28)
+        journal: Optional checkpoint journal; each extracted page and each
+                 finished book is recorded, and what is already in it is
+                 neither fetched nor parsed again
+        writer: Optional NDJSON stream; each sermon is written to it as soon as
+                it is extracted, instead of being collected
+        parse_workers: Parser processes (0 parses in the book's own thread)
+        concurrency: Books scraped at the same time
+        rate: Starting requests per second to gadir.free.fr across all books
+        max_rate: Ceiling for the adaptive request rate
         
     Returns:
-        Combined dictionary of all sermons and explanations
+        Combined dictionary of all sermons and explanations (empty when streaming)
     """
-    all_results = {}
-    total_books = len(books)
-    total_pages = len(pages)
+    limiter = adaptive_limiter(get_client(), rate, max_rate)
+    merger = BookMerger(writer)
     
-    for book_idx, book_num in enumerate(books, 1):
-        book_str = f"{book_num:02d}"  # Format as 01, 02, 03, etc.
-        
-        print(f"\n{'='*70}")
-        print(f"📚 Processing Book {book_num} ({book_idx}/{total_books})")
-        print(f"{'='*70}")
-        
-        # Fetch all pages for this book first
-        print(f"\n📥 Fetching all {len(pages)} pages for Book {book_num}...")
-        all_soups = []
-        
-        for page_idx, page_num in enumerate(pages, 1):
-            page_str = f"{page_num:02d}"  # Format as 01, 02, 03, etc.
-            url = f"http://gadir.free.fr/Ar/imamali/Nhj/Nefhatul_Velaye/7/book_39/NAFAHATVELG{book_str}/{page_str}.html"
-            
-            print(f"  📄 Fetching page {page_num}/{total_pages}... ", end='', flush=True)
-            soup = fetch_page_content(url)
-            if soup:
-                all_soups.append(soup)
-                print("✅")
-            else:
-                print("❌")
+    def job(book_num):
+        book_results = scrape_book(book_num, pages, limiter, pool,
+                                   lambda key, value: merger.emit(book_num, key, value), journal)
+        if journal is not None:
+            journal.record(f"book:{book_num:02d}", book_results)
+        print(f"\n✅ Book {book_num} complete: {len(book_results)} sermons extracted")
+        return book_results
+    
+    print(f"\n📥 Fetching {len(books)} books ({len(pages)} pages each), {concurrency} at a time...")
+    pool = parse_pool(parse_workers)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            jobs = {}
+            for book_num in books:
+                journal_key = f"book:{book_num:02d}"
+                if journal and journal_key in journal:
+                    print(f"\n⏭️  Book {book_num} restored from journal: {len(journal.get(journal_key))} sermons")
+                else:
+                    jobs[book_num] = executor.submit(job, book_num)
             
-            # Be nice to the server
-            time.sleep(1)
+            # Deterministic merge: take each book's results in book order,
+            # whatever order the jobs finish in
+            for book_num in books:
+                if book_num in jobs:
+                    merger.add(book_num, jobs[book_num].result())
+                else:
+                    restored = journal.get(f"book:{book_num:02d}")
+                    for key, value in restored.items():
+                        merger.emit(book_num, key, value)
+                    merger.add(book_num, restored)
+    finally:
+        if pool:
+            pool.shutdown()
+    
+    print("\n⏱️  Request rate:")
+    limiter.print_stats()
+    merger.print_collisions()
+    return merger.results
+
+
+def scrape_books_incremental(books: List[int], pages: List[int], existing: Dict[str, str],
+                             state: IncrementalState, rate: float = GADIR_RATE,
+                             max_rate: float = GADIR_MAX_RATE) -> Dict[str, str]:
+    """
+    Re-extract only the books with at least one changed page.
+    
+    Every page is revalidated first; a book whose pages are all unchanged keeps
+    the keys it produced last time. Sermons can span pages, so a changed book
+    is re-extracted as a whole, from the page bodies the check already
+    fetched (only a page answered with a bare 304, when the response cache is
+    off, is requested again). A page that no longer exists (404, 410) is
+    dropped from the book, which changes it if the page existed last time. A
+    book with a page that could not be checked keeps its previous keys.
+    
+    Returns:
+        The patched dictionary of all sermons, in book order
+    """
+    merger = BookMerger()
+    limiter = adaptive_limiter(get_client(), rate, max_rate)
+    
+    for book_num in books:
+        book_str = f"{book_num:02d}"
+        print(f"\n📚 Checking Book {book_num}...")
         
-        # Now extract all sermons from the combined content
-        print(f"\n🔍 Extracting sermons from Book {book_num} (all {len(all_soups)} pages combined)...")
-        book_results = extract_sermons_from_combined_content(all_soups)
-        all_results.update(book_results)
+        urls = {page_num: page_url(book_num, page_num) for page_num in pages}
+        validators = {url: state.pages.get(url) for url in urls.values()}
+        texts = {}   # Bodies fetched by the check, for re-extracting the book
+        gone = set()
+        changed = failed = False
+        for page_num, url in urls.items():
+            limiter.bucket_for(url).acquire()
+            try:
+                response, page_changed = state.fetch(url, timeout=30)
+            except Exception as e:
+                if is_gone(e):
+                    print(f"  🗑️  Page {page_num} no longer exists")
+                    gone.add(page_num)
+                    # A page that was there last time takes its sermons with it
+                    changed = state.pages.pop(url, None) is not None or changed
+                    continue
+                print(f"❌ Error fetching {url}: {e}")
+                failed = True
+                continue
+            changed = changed or page_changed
+            if response is not None:
+                texts[page_num] = get_client().decode(response)
         
-        print(f"\n✅ Book {book_num} complete: {len(book_results)} sermons extracted")
+        previous_keys = state.groups.get(book_str)
+        kept = previous_keys is not None and all(key in existing for key in previous_keys)
+        if failed and kept:
+            # Re-extracting now would drop the sermons of the pages that failed;
+            # keep the last result and forget this run's validators for the
+            # book, so the next run checks all of its pages again
+            for url, validator in validators.items():
+                if validator is None:
+                    state.pages.pop(url, None)
+                else:
+                    state.pages[url] = validator
+            print(f"  ⚠️  Could not check every page, keeping {len(previous_keys)} sermons until the next run")
+            merger.add(book_num, {key: existing[key] for key in previous_keys})
+            continue
+        if not changed and kept:
+            print(f"  ⏭️  Unchanged, keeping {len(previous_keys)} sermons")
+            merger.add(book_num, {key: existing[key] for key in previous_keys})
+            continue
+        
+        print(f"  🔄 Changed, re-extracting Book {book_num}")
+        book_results = scrape_book(book_num, [page_num for page_num in pages if page_num not in gone],
+                                   limiter, texts=texts)
+        merger.add(book_num, book_results)
+        state.groups[book_str] = list(book_results)
     
-    return all_results
+    merger.print_collisions()
+    state.print_requests()
+    return merger.results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape Nahj al-Balagha explanations from gadir.free.fr")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_BOOK_CONCURRENCY,
+                        help=f"Books scraped at the same time (default: {DEFAULT_BOOK_CONCURRENCY})")
+    parser.add_argument('--rate', type=float, default=GADIR_RATE,
+                        help=f"Starting requests per second to gadir.free.fr, shared by all books "
+                             f"(default: {GADIR_RATE})")
+    parser.add_argument('--max-rate', type=float, default=GADIR_MAX_RATE,
+                        help=f"Ceiling for the adaptive request rate (default: {GADIR_MAX_RATE})")
+    parser.add_argument('--parse-workers', type=int, default=DEFAULT_PARSE_WORKERS,
+                        help=f"Parser processes; 0 parses in the book threads (default: {DEFAULT_PARSE_WORKERS})")
+    add_client_arguments(parser)
+    add_journal_arguments(parser, 'all_explanations.journal')
+    add_incremental_arguments(parser, 'all_explanations.state.json')
+    add_stream_arguments(parser, 'all_explanations.ndjson')
+    add_profile_arguments(parser)
+    add_metrics_arguments(parser, 'explanation_scraper')
+    return parser.parse_args()
 
 
 def main():
     """Main execution function."""
+    args = parse_args()
+    configure_from_args(args)
+    profiler = profiler_from_args(args, 'explanation_scraper')
     
     print("=" * 70)
     print("🕌 Nahj al-Balagha Explanation Scraper")
@@ -221,11 +556,51 @@ def main():
     books = list(range(1, 6))  # Books 1-5
     pages = list(range(1, 29))  # Pages 1-28
     
-    all_data = scrape_all_books_and_pages(books, pages)
+    if args.incremental:
+        # Re-extract only books whose pages changed and patch the existing output
+        existing = load_output('all_explanations.json')
+        state = IncrementalState(args.state)
+        with profiler.stage('scrape'):
+            all_data = scrape_books_incremental(books, pages, existing, state, rate=args.rate, max_rate=args.max_rate)
+        added, removed, changed = diff_outputs(existing, all_data)
+        print_diff(added, removed, changed)
+        if added or removed or changed:
+            with profiler.stage('save'):
+                save_to_json(all_data, 'all_explanations.json')
+        state.save()
+        get_client().print_stats()
+        write_run_report(args)
+        profiler.finish()
+        return
+    
+    if args.stream:
+        # Sermons go to the NDJSON stream as they are extracted; build the JSON from it
+        with open_journal(args) as journal, NDJSONWriter(args.stream) as writer, profiler.stage('scrape'):
+            scrape_all_books_and_pages(books, pages, journal=journal, writer=writer,
+                                       parse_workers=args.parse_workers,
+                                       concurrency=args.concurrency, rate=args.rate, max_rate=args.max_rate)
+        if writer.count:
+            with profiler.stage('save'):
+                total = finalize_ndjson(args.stream, 'all_explanations.json', compact=args.compact)
+            print(f"\n✅ Saved {total} sermons to all_explanations.json")
+            journal.discard()
+        else:
+            print("\n⚠️  No data was extracted!")
+        get_client().print_stats()
+        write_run_report(args)
+        profiler.finish()
+        return
+    
+    with open_journal(args) as journal, profiler.stage('scrape'):
+        all_data = scrape_all_books_and_pages(books, pages, journal=journal,
+                                              parse_workers=args.parse_workers,
+                                              concurrency=args.concurrency, rate=args.rate, max_rate=args.max_rate)
     
     if all_data:
-        # Save all results
-        save_to_json(all_data, 'all_explanations.json')
+        # Save all results; the run is complete so the journal is no longer needed
+        with profiler.stage('save'):
+            save_to_json(all_data, 'all_explanations.json')
+        journal.discard()
         
         # Print summary
         print("\n" + "=" * 70)
@@ -242,11 +617,15 @@ def main():
         print("=" * 70)
         for key, value in list(all_data.items())[:3]:
             print(f"\n� Key: {key}")
-            print(f"📝 Value preview (first 100 chars):")
+            print("📝 Value preview (first 100 chars):")
             print(value[:100] + "..." if len(value) > 100 else value)
     else:
         print("\n⚠️  No data was extracted!")
     
+    get_client().print_stats()
+    write_run_report(args)
+    profiler.finish()
+    
     print("\n" + "=" * 70)
     print("✅ Scraping complete!")
     print("=" * 70)
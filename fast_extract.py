@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Fast lxml extraction backend for the imamali.net scrapers
+Parses only the content / list subtree of a page with lxml and compiled
+XPath, producing exactly what the BeautifulSoup ('html.parser') code does.
+Pages with constructs the two parsers treat differently are reported as
+unsupported (None) so callers fall back to BeautifulSoup.
+"""
+
+import html
+import html.entities
+import re
+from urllib.parse import urljoin
+
+import lxml.html
+from lxml import etree
+
+BACKENDS = ('lxml', 'bs4')
+DEFAULT_BACKEND = 'lxml'
+
+_backend = DEFAULT_BACKEND
+
+
+def set_backend(name):
+    """Select the extraction backend used when a caller does not pass one."""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown extraction backend: {name}")
+    _backend = name
+
+
+def get_backend():
+    return _backend
+
+
+def add_backend_arguments(parser):
+    """
+    Add the --parser option shared by the imamali scrapers
+    """
+    parser.add_argument('--parser', choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help=f"HTML extraction backend (default: {DEFAULT_BACKEND}; "
+                             f"bs4 is the original BeautifulSoup path)")
+
+
+# Strings BeautifulSoup does not count as text inside a <div>: it gives them
+# their own string classes (Script, Stylesheet, TemplateString, Ruby*String)
+_NON_TEXT_TAGS = frozenset(('script', 'style', 'template', 'rt', 'rp'))
+
+# lxml rewrites carriage returns to newlines, html.parser keeps them; carry
+# them through the parse as a private-use character and restore afterwards
+_CR_PLACEHOLDER = '\ue000'
+
+# Constructs the two parsers decode differently: NUL, CDATA sections and the
+# placeholder itself. Character references are checked by _is_safe_reference()
+_UNSAFE = re.compile('\x00|<!\\[CDATA\\[|' + _CR_PLACEHOLDER)
+
+_REFERENCE = re.compile(r'&(?:#([0-9]+)(;?)|#[xX]([0-9a-fA-F]+)(;?)|([A-Za-z][A-Za-z0-9]*)(;?))')
+
+# Every name html.parser/BeautifulSoup may decode when the ';' is missing
+_ENTITY_PREFIXES = frozenset(name.rstrip(';') for name in html.entities.html5)
+
+
+def _is_safe_code_point(code_point):
+    # &#0; is U+FFFD in lxml but NUL in html.parser; surrogates and values
+    # past U+10FFFF are replaced differently too
+    return 0 < code_point <= 0x10FFFF and not 0xD800 <= code_point <= 0xDFFF
+
+
+def _is_safe_reference(match):
+    decimal, decimal_end, hexadecimal, hex_end, name, name_end = match.groups()
+    if decimal is not None:
+        return bool(decimal_end) and _is_safe_code_point(int(decimal))
+    if hexadecimal is not None:
+        return bool(hex_end) and _is_safe_code_point(int(hexadecimal, 16))
+    if name_end:
+        return name in html.entities.name2codepoint
+    return not any(name[:size] in _ENTITY_PREFIXES for size in range(1, len(name) + 1))
+
+
+def _is_safe(fragment):
+    """
+    True if lxml and html.parser decode every character of `fragment` alike
+    """
+    if _UNSAFE.search(fragment):
+        return False
+    return all(_is_safe_reference(match) for match in _REFERENCE.finditer(fragment))
+
+
+# Markup as html.parser tokenizes it: comments, declarations, processing
+# instructions, raw-text elements (their content is not markup), start tags
+# (attribute values may contain '>') and end tags
+_TOKEN = re.compile(r'''
+    <!--.*?-->
+  | <![^>]*>
+  | <\?[^>]*>
+  | <(?P<raw>script|style)\b(?:[^>"']|"[^"]*"|'[^']*')*>.*?</(?P=raw)\s*>
+  | <(?P<start>[a-zA-Z][^\t\n\r\f />\x00]*)(?P<attrs>(?:[^>"']|"[^"]*"|'[^']*')*)>
+  | </(?P<end>[a-zA-Z][^\t\n\r\f />\x00]*)[^>]*>
+''', re.IGNORECASE | re.DOTALL | re.VERBOSE)
+
+# Elements whose content html.parser or lxml does not read as markup
+_RAW_TEXT_TAGS = frozenset(('script', 'style', 'textarea', 'title', 'xmp', 'plaintext',
+                            'noscript', 'iframe', 'noembed', 'noframes'))
+
+# Elements BeautifulSoup closes as soon as they open
+_VOID_TAGS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem',
+    'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame',
+    'image', 'isindex', 'nextid', 'spacer',
+))
+
+_CLASS_ATTR = re.compile(r'''\bclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+_ID_ATTR = re.compile(r'''\bid\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+
+_LIST_ITEMS = etree.XPath("//li[contains(concat(' ', normalize-space(@class), ' '), ' AKD-Categ_List ')]")
+_LIST_LINK = etree.XPath("(.//a[contains(concat(' ', normalize-space(@class), ' '), ' AKD-HrefList ')])[1]")
+# Descendants whose subtree _raw_strings() may leave out
+_SKIPPED = etree.XPath(".//*[self::script or self::style or self::template or self::rt or self::rp"
+                       " or (self::div and starts-with(@id, 'ftn'))]")
+_ALL_TITLES = etree.XPath("//span[contains(concat(' ', normalize-space(@class), ' '), ' AKD-Li_Tx_ ')]"
+                          "[not(ancestor::span[contains(concat(' ', normalize-space(@class), ' '), ' AKD-Li_Tx_ ')])]")
+_LIST_TITLE = etree.XPath("(.//span[contains(concat(' ', normalize-space(@class), ' '), ' AKD-Li_Tx_ ')])[1]")
+
+
+def _inside(html_content, position, opener, closer):
+    last_open = max(html_content.rfind(opener, 0, position), html_content.rfind(opener.upper(), 0, position))
+    last_close = max(html_content.rfind(closer, 0, position), html_content.rfind(closer.upper(), 0, position))
+    return last_open > last_close
+
+
+def _find_open_tag(html_content, tag, class_name):
+    """
+    Offset of the first <tag> whose class list contains `class_name`
+
+    Returns:
+        The offset, or -1 if no such tag exists (the name may still occur
+        in stylesheets, scripts or comments)
+    """
+    position = html_content.find(class_name)
+    while position >= 0:
+        start = html_content.rfind('<', 0, position)
+        end = html_content.find('>', position)
+        tag_text = html_content[start:end + 1]
+        if (start >= 0 and end >= 0 and re.match(r'<%s\b' % tag, tag_text, re.IGNORECASE)
+                and not _inside(html_content, start, '<!--', '-->')
+                and not _inside(html_content, start, '<script', '</script')):
+            if _has_class(tag_text, class_name):
+                return start
+        position = html_content.find(class_name, position + len(class_name))
+    return -1
+
+
+def _has_class(attrs, class_name):
+    match = _CLASS_ATTR.search(attrs)
+    return bool(match) and class_name in (match.group(1) or match.group(2) or match.group(3) or '').split()
+
+
+def _is_text(text):
+    """True if raw character data holds anything besides whitespace."""
+    text = text.strip()
+    return bool(text) and ('&' not in text or bool(html.unescape(text).strip()))
+
+
+def _plain_rcdata(html_content, name, position):
+    """
+    True if a <title> or <textarea> opened at `position` holds plain text,
+    which lxml reads exactly as html.parser does
+    """
+    if name not in ('title', 'textarea'):
+        return False
+    match = re.compile(r'</%s\s*>' % name, re.IGNORECASE).search(html_content, position)
+    return bool(match) and '<' not in html_content[position:match.start()]
+
+
+def _count_strings(html_content, start, counted, skipped, whole_element):
+    """
+    Count the non-blank strings BeautifulSoup ('html.parser') would build
+    inside `counted` elements, walking the markup from `start`
+
+    BeautifulSoup never closes an element implicitly and starts a new string
+    at every tag, even a stray end tag; lxml closes and drops tags the HTML
+    way and joins the text around them. Both keep text in document order and
+    neither invents a split, so equal counts mean lxml's strings are exactly
+    BeautifulSoup's.
+
+    Args:
+        counted: (name, attrs) predicate for elements whose text is counted
+        skipped: (name, attrs) predicate for subtrees that are left out
+        whole_element: stop once the element opened at `start` is closed
+
+    Returns:
+        The count, or None for markup the walk does not model
+    """
+    stack = []  # (name, 'count' / 'skip' / None) per open element
+    count = 0
+    position = start
+    for match in _TOKEN.finditer(html_content, start):
+        state = stack[-1][1] if stack else None
+        if state == 'count':
+            text = html_content[position:match.start()]
+            if '<' in text:
+                return None
+            if _is_text(text):
+                count += 1
+        position = match.end()
+
+        name, attrs, end_name = match.group('start', 'attrs', 'end')
+        if name:
+            name = name.lower()
+            if name in _VOID_TAGS:
+                continue
+            if attrs.rstrip().endswith('/') or (state == 'count' and name in _RAW_TEXT_TAGS
+                                                and not _plain_rcdata(html_content, name, match.end())):
+                return None
+            if skipped(name, attrs):
+                stack.append((name, 'skip'))
+            elif state is None and counted(name, attrs):
+                stack.append((name, 'count'))
+            else:
+                stack.append((name, state))
+            continue
+
+        if end_name:
+            name = end_name.lower()
+            if name in _VOID_TAGS:
+                return None
+            for depth in range(len(stack) - 1, -1, -1):
+                if stack[depth][0] == name:
+                    del stack[depth:]
+                    break
+            else:
+                # A stray end tag, or one closing an element opened before
+                # `start`: only harmless outside everything being tracked
+                if any(state for _, state in stack):
+                    return None
+                del stack[:]
+            if whole_element and not stack:
+                return count
+        elif state == 'count' and not match.group('raw') and match.group(0)[:4] != '<!--':
+            # Declarations and processing instructions
+            return None
+
+    if stack and stack[-1][1] == 'count':
+        text = html_content[position:]
+        if '<' in text:
+            return None
+        if _is_text(text):
+            count += 1
+    return count
+
+
+# Start tags that make lxml close or move an open list item or link, where
+# BeautifulSoup nests them instead
+_ITEM_BREAKERS = frozenset(('li', 'ul', 'ol', 'dl', 'dd', 'dt', 'table', 'caption', 'colgroup', 'col',
+                            'tbody', 'thead', 'tfoot', 'tr', 'td', 'th', 'form', 'select', 'option',
+                            'optgroup', 'button', 'frameset', 'frame', 'body', 'html', 'head'))
+
+# Elements an item's </li> closes in lxml as it does in BeautifulSoup
+_CLOSED_BY_ITEM_END = frozenset(('p', 'a', 'span', 'b', 'i', 'u', 's', 'em', 'strong', 'small', 'big',
+                                 'font', 'sub', 'sup', 'code', 'tt', 'strike'))
+
+
+def _list_items_nest_cleanly(html_content, start):
+    """
+    True if every AKD-Categ_List <li> from `start` on is closed by its own
+    </li> and holds only properly nested markup, so lxml builds the items
+    exactly as BeautifulSoup does
+
+    BeautifulSoup never closes a <li> or <a> implicitly: an unclosed item
+    swallows the items after it and finds their links and titles as its
+    own, and an end tag closes everything opened since its element. lxml
+    closes the first item when the next one opens and ignores such end tags.
+    """
+    stack = []  # (name, inside an item) per open element
+    for match in _TOKEN.finditer(html_content, start):
+        name, attrs, end_name = match.group('start', 'attrs', 'end')
+        inside = bool(stack) and stack[-1][1]
+        if name:
+            name = name.lower()
+            if name in _VOID_TAGS:
+                continue
+            if inside and (name in _ITEM_BREAKERS or
+                           (name == 'a' and any(open_name == 'a' for open_name, _ in stack))):
+                return False
+            if name == 'li' and _has_class(attrs, 'AKD-Categ_List'):
+                stack.append((name, True))
+            else:
+                stack.append((name, inside))
+        elif end_name:
+            name = end_name.lower()
+            if inside:
+                # Inside an item only the innermost element may close, or
+                # the item itself along with what is still open in it
+                depth = len(stack) - 1
+                if name == 'li':
+                    while stack[depth][0] != 'li':
+                        # lxml ignores the </li> while a block is open in the item
+                        if stack[depth][0] not in _CLOSED_BY_ITEM_END:
+                            return False
+                        depth -= 1
+                elif stack[depth][0] != name:
+                    return False
+                del stack[depth:]
+                continue
+            for depth in range(len(stack) - 1, -1, -1):
+                if stack[depth][0] == name:
+                    del stack[depth:]
+                    break
+        elif inside and match.group('raw'):
+            return False
+    # An item still open at the end of the page
+    return not any(inside for _, inside in stack)
+
+
+def _parse_from(html_content, start):
+    """
+    Parse the page from `start` onwards (everything before it is skipped)
+
+    Returns:
+        The lxml root element, or None if lxml would not decode the fragment
+        exactly as html.parser does
+    """
+    fragment = html_content[start:]
+    if not _is_safe(fragment):
+        return None
+    return lxml.html.document_fromstring(fragment.replace('\r', _CR_PLACEHOLDER))
+
+
+def _raw_strings(element, skip):
+    """
+    Yield the text nodes under `element` in document order, like bs4's .strings
+    """
+    if element.text and element.tag not in _NON_TEXT_TAGS:
+        yield element.text
+    if element.tag in _NON_TEXT_TAGS:
+        return
+    for child in element:
+        if isinstance(child.tag, str) and not skip(child):
+            yield from _raw_strings(child, skip)
+        if child.tail:
+            yield child.tail
+
+
+def _stripped_strings(element, skip=lambda child: False):
+    if _SKIPPED(element):
+        texts = _raw_strings(element, skip)
+    else:
+        # Nothing to leave out: lxml's own walk is much faster
+        texts = element.itertext()
+    for text in texts:
+        text = text.replace(_CR_PLACEHOLDER, '\r').strip()
+        if text:
+            yield text
+
+
+def _is_footnote(element):
+    return element.tag == 'div' and (element.get('id') or '').startswith('ftn')
+
+
+def _is_footnote_tag(name, attrs):
+    match = _ID_ATTR.search(attrs) if name == 'div' else None
+    return bool(match) and (match.group(1) or match.group(2) or match.group(3) or '').startswith('ftn')
+
+
+def _is_non_text_tag(name, attrs):
+    return name in _NON_TEXT_TAGS
+
+
+def _is_title_tag(name, attrs):
+    return name == 'span' and _has_class(attrs, 'AKD-Li_Tx_')
+
+
+def extract_content_text(html_content, class_names):
+    """
+    Text of the first <div> carrying one of `class_names` (tried in order),
+    without footnote divs, joined with blank lines
+
+    Equivalent to the BeautifulSoup code in extract_sermon_content().
+
+    Returns:
+        The text ('' if no content area exists), or None if the page needs
+        the BeautifulSoup fallback
+    """
+    for class_name in class_names:
+        start = _find_open_tag(html_content, 'div', class_name)
+        if start < 0:
+            continue
+        root = _parse_from(html_content, start)
+        if root is None:
+            return None
+        strings = list(_stripped_strings(root.find('.//div'), _is_footnote))
+        expected = _count_strings(html_content, start, lambda name, attrs: True,
+                                  lambda name, attrs: _is_footnote_tag(name, attrs) or _is_non_text_tag(name, attrs),
+                                  whole_element=True)
+        if expected != len(strings):
+            return None
+        return '\n\n'.join(strings)
+    return ''
+
+
+def extract_list_items(html_content, base_url, default_title=None):
+    """
+    Titles and absolute URLs from the AKD-Categ_List items of a list page
+
+    Equivalent to extract_sermon_list() when `default_title` is None (items
+    without a title are skipped), and to the <li> branch of the letters
+    scraper's extract_list() otherwise.
+
+    Returns:
+        List of {'title', 'url'} dicts, or None if the page needs the
+        BeautifulSoup fallback (including pages without list items)
+    """
+    start = _find_open_tag(html_content, 'li', 'AKD-Categ_List')
+    if start < 0:
+        return None
+    if not _list_items_nest_cleanly(html_content, start):
+        return None
+    root = _parse_from(html_content, start)
+    if root is None:
+        return None
+    title_strings = sum(len(list(_stripped_strings(span))) for span in _ALL_TITLES(root))
+    if _count_strings(html_content, start, _is_title_tag, _is_non_text_tag, whole_element=False) != title_strings:
+        return None
+
+    items = []
+    for item in _LIST_ITEMS(root):
+        links = _LIST_LINK(item)
+        if not links:
+            continue
+        titles = _LIST_TITLE(item)
+        if titles:
+            title = ''.join(_stripped_strings(titles[0]))
+        elif default_title is not None:
+            title = default_title
+        else:
+            continue
+        href = links[0].get('href', '')
+        if href:
+            items.append({'title': title, 'url': urljoin(base_url, href)})
+    return items
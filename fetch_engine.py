@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Concurrent fetch engine for the Nahj al-Balagha scrapers
+Fetches many pages at once with a concurrency limit and a per-host
+token-bucket rate limit, returning results in the original list order.
+Parsing can be handed to a pool of worker processes so it never competes
+with the fetching threads for the GIL.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from metrics import get_metrics, timed_call
+
+# Default number of pages in flight at the same time
+DEFAULT_CONCURRENCY = 8
+
+# Default politeness budget: requests per second sent to a single host
+DEFAULT_RATE = 2.0
+
+# Default ceiling for adaptive rates: requests per second to a single host
+DEFAULT_MAX_RATE = 6.0
+
+# Default number of parser processes (0 parses in the fetching threads)
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 1
+
+# Responses telling a client to slow down: rate limiting and server errors
+BACKOFF_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting how often requests may start.
+
+    Tokens refill at `rate` per second up to `burst`. Each request takes
+    one token; when none are left the caller is told how long to wait,
+    and the token is reserved for it so waiters are served in order.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take one token and return the number of seconds to wait before using it
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def set_rate(self, rate):
+        """
+        Change the refill rate; tokens earned so far are kept
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.rate = float(rate)
+
+    def try_acquire(self):
+        """
+        Take a token if one is available now
+
+        Returns:
+            0 if a token was taken, otherwise the number of seconds until
+            one will be (nothing is taken or reserved)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """
+        Block the calling thread until a token is available
+        """
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """
+        Suspend the calling coroutine until a token is available
+        """
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class HostRateLimiter:
+    """
+    One token bucket per host, created on first use
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket_for(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[host] = bucket
+            return bucket
+
+
+def parse_pool(workers=DEFAULT_PARSE_WORKERS):
+    """
+    Process pool for parser workers, or None when `workers` is 0
+
+    Workers are spawned rather than forked, so they never inherit the
+    fetching threads or open connections; anything they need (such as the
+    extraction backend) must be passed to them explicitly.
+    """
+    if not workers:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+class AdaptiveBucket(TokenBucket):
+    """
+    Token bucket whose rate follows AIMD (additive increase, multiplicative
+    decrease) from the responses it is told about.
+
+    Each stretch of healthy responses about one second long raises the rate
+    by `increase`, up to `ceiling`. A 429 or 5xx, a timeout or connection
+    error, or a latency spike (more than `spike_factor` times the usual
+    latency, or above `latency_target` when one is set) halves it, down to
+    `floor`. After a decrease further bad responses are ignored for `hold`
+    seconds, since requests already in flight report the same congestion.
+    """
+
+    def __init__(self, rate, ceiling=DEFAULT_MAX_RATE, floor=0.2, increase=0.5, spike_factor=3.0,
+                 latency_target=None, hold=2.0):
+        super().__init__(min(rate, ceiling))
+        self.ceiling = float(ceiling)
+        self.floor = min(float(floor), self.rate)
+        self.increase = increase
+        self.spike_factor = spike_factor
+        self.latency_target = latency_target
+        self.hold = hold
+        self.latency = None  # Moving average of healthy response times
+        self.decreases = 0
+        self._healthy = 0
+        self._held_until = 0.0
+        self._observe_lock = threading.Lock()
+
+    def record(self, seconds, status):
+        """
+        Adjust the rate after one response (status None for a network error)
+        """
+        with self._observe_lock:
+            # Sub-second jitter is never treated as a spike
+            spike = (self.latency is not None and seconds > max(self.spike_factor * self.latency, 0.5)) or \
+                    (self.latency_target is not None and seconds > self.latency_target)
+            if status is None or status in BACKOFF_STATUSES or spike:
+                self._healthy = 0
+                now = time.monotonic()
+                if now >= self._held_until:
+                    self.set_rate(max(self.floor, self.rate / 2))
+                    self.decreases += 1
+                    self._held_until = now + self.hold
+                return
+            self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+            self._healthy += 1
+            if self._healthy >= max(1, self.rate) and self.rate < self.ceiling:
+                self.set_rate(min(self.ceiling, self.rate + self.increase))
+                self._healthy = 0
+
+
+class AdaptiveRateLimiter(HostRateLimiter):
+    """
+    One AdaptiveBucket per host, fed by the shared HttpClient's observations
+
+    Args:
+        rate: Starting requests per second for each host
+        ceiling: Most requests per second any host may reach
+        ceilings: Optional {host: ceiling} overrides
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, ceiling=DEFAULT_MAX_RATE, ceilings=None, rates=None):
+        super().__init__(rate)
+        self.ceiling = ceiling
+        self.ceilings = ceilings or {}
+        self.rates = rates or {}
+
+    def bucket_for(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = AdaptiveBucket(self.rates.get(host, self.rate), self.ceilings.get(host, self.ceiling))
+                self._buckets[host] = bucket
+            return bucket
+
+    def observe(self, url, seconds, status):
+        """HttpClient observer: feed one response to its host's bucket."""
+        self.bucket_for(url).record(seconds, status)
+
+    def rate_for(self, url):
+        """Current requests per second allowed to the URL's host."""
+        return self.bucket_for(url).rate
+
+    def print_stats(self):
+        """Print the rate each host settled at."""
+        for host, bucket in sorted(self._buckets.items()):
+            print(f"  {host}: {bucket.rate:.1f} req/s (ceiling {bucket.ceiling:g}, {bucket.decreases} slow-downs)")
+
+
+def adaptive_limiter(client, rate=DEFAULT_RATE, ceiling=DEFAULT_MAX_RATE, **kwargs):
+    """
+    Create an AdaptiveRateLimiter and subscribe it to `client`'s responses
+
+    A client feeds one adaptive limiter at a time: the limiter of an earlier
+    run on the same client is unsubscribed, so observers never stack up.
+    """
+    for observer in client.observers:
+        if isinstance(getattr(observer, '__self__', None), AdaptiveRateLimiter):
+            client.remove_observer(observer)
+    limiter = AdaptiveRateLimiter(rate, ceiling, **kwargs)
+    client.add_observer(limiter.observe)
+    return limiter
+
+
+async def fetch_all_async(urls, fetch, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                          limiter=None, on_result=None, parse=None, parse_workers=DEFAULT_PARSE_WORKERS,
+                          max_pending=None, store=None):
+    """
+    Fetch all URLs concurrently and return the results in the order of `urls`
+
+    Args:
+        urls: List of URLs to fetch
+        fetch: Blocking function taking a URL and returning its content (or None)
+        concurrency: Maximum number of fetches in flight
+        rate: Maximum requests per second per host (ignored if `limiter` is given)
+        limiter: Optional shared HostRateLimiter
+        on_result: Optional callback(index, url, result) called as each fetch completes
+        parse: Optional picklable function turning what `fetch` returned
+            (e.g. raw page bytes) into the result; it runs in a pool of
+            `parse_workers` processes, or in the fetching threads if that is 0
+        max_pending: Most pages fetched or being fetched but not yet parsed
+            (default: `concurrency` plus two per parser); fetching pauses
+            while the backlog is full, so memory stays flat
+        store: Optional function(index, url, result) run as each result
+            arrives; its return value is kept instead of the result
+
+    Returns:
+        List of results, one per URL, in the original order
+    """
+    limiter = limiter or HostRateLimiter(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    backlog = asyncio.Semaphore(max_pending or concurrency + 2 * max(parse_workers, 1))
+    results = [None] * len(urls)
+    loop = asyncio.get_running_loop()
+
+    pool = parse_pool(parse_workers) if parse else None
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            async def download(url):
+                async with semaphore:
+                    await limiter.bucket_for(url).acquire_async()
+                    return await loop.run_in_executor(executor, fetch, url)
+
+            async def worker(index, url):
+                if parse is None:
+                    result = await download(url)
+                else:
+                    async with backlog:
+                        page = await download(url)
+                        result = None
+                        if page is not None:
+                            result, seconds = await loop.run_in_executor(pool or executor, timed_call, parse, page)
+                            get_metrics().record('parse', seconds, len(page), urlparse(url).netloc)
+                if store:
+                    result = store(index, url, result)
+                results[index] = result
+                if on_result:
+                    on_result(index, url, result)
+
+            await asyncio.gather(*(worker(i, url) for i, url in enumerate(urls)))
+    finally:
+        if pool:
+            pool.shutdown()
+
+    return results
+
+
+def fetch_all(urls, fetch, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+              limiter=None, on_result=None, parse=None, parse_workers=DEFAULT_PARSE_WORKERS,
+              max_pending=None, store=None):
+    """
+    Synchronous wrapper around fetch_all_async() for the scraper scripts
+    """
+    return asyncio.run(fetch_all_async(urls, fetch, concurrency=concurrency, rate=rate,
+                                       limiter=limiter, on_result=on_result, parse=parse,
+                                       parse_workers=parse_workers, max_pending=max_pending,
+                                       store=store))
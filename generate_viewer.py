@@ -1,11 +1,81 @@
+#!/usr/bin/env python3
+"""
+Build view_explanations.html, a viewer that loads the explanations on demand
+The page itself holds no data: a small manifest script lists every sermon
+with a one-line preview, and the texts are split into chunk scripts that are
+loaded as their cards scroll into view or a search needs them, so the page
+renders at once however large the corpus is. Each sermon also gets a small
+static page, rendered in full at build time, for deep links
+"""
+
+import argparse
+import html
 import json
+import os
+import re
 
-# Read the JSON data
-with open('all_explanations.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+from profiling import add_profile_arguments, profiler_from_args
+from search_index import build_index, shard_file_name, shard_index
+from static_assets import COMPRESSED, AssetWriter, brotli, write_file
 
-# Create HTML with embedded data
-html_content = '''<!DOCTYPE html>
+# Approximate size of one text chunk
+CHUNK_BYTES = 128 * 1024
+
+PREVIEW_CHARS = 160
+
+
+def load_data(path):
+    """Read the explanations JSON."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def sermon_number(key):
+    """Sort key of a sermon, numbered as the page shows it."""
+    match = re.search(r'\d+', key)
+    return (0, int(match.group())) if match else (1, key)
+
+
+def preview(text):
+    """The first line of a text, shortened for the manifest."""
+    line = next((line.strip() for line in text.split('\n') if line.strip()), '')
+    return line if len(line) <= PREVIEW_CHARS else line[:PREVIEW_CHARS].rstrip() + '…'
+
+
+def build_chunks(data, chunk_bytes=CHUNK_BYTES):
+    """
+    Split the sermons, in page order, into chunks of about chunk_bytes of text
+
+    Returns:
+        (manifest dictionary, list of {key: text} chunks)
+    """
+    chunks = [{}]
+    size = 0
+    entries = []
+    for key in sorted(data, key=sermon_number):
+        text = data[key]
+        if chunks[-1] and size >= chunk_bytes:
+            chunks.append({})
+            size = 0
+        chunks[-1][key] = text
+        size += len(text.encode('utf-8'))
+        entries.append([key, preview(text), len(chunks) - 1])
+    if not chunks[-1]:
+        chunks.pop()
+    manifest = {
+        'chunks': [f"chunk-{index:03d}.js" for index in range(len(chunks))],
+        'sermons': entries,
+    }
+    return manifest, chunks
+
+
+def _script(call, value):
+    return f"{call}{json.dumps(value, ensure_ascii=False, separators=(',', ':'))});\n"
+
+
+def build_shell(data_dir, manifest_file='manifest.js'):
+    """Create the page, which loads its data from data_dir."""
+    return '''<!DOCTYPE html>
 <html lang="ar" dir="rtl">
 <head>
     <meta charset="UTF-8">
@@ -155,13 +225,17 @@ html_content = '''<!DOCTYPE html>
 
         .content {
             padding: 40px;
-            display: grid;
-            grid-template-columns: repeat(auto-fill, minmax(450px, 1fr));
-            gap: 30px;
             max-height: calc(100vh - 450px);
             overflow-y: auto;
         }
 
+        /* One row of cards; the page sets its columns from the same breakpoints */
+        .card-row {
+            display: grid;
+            gap: 30px;
+            margin-bottom: 30px;
+        }
+
         .sermon-card {
             background: linear-gradient(to bottom right, #ffffff, #f8f9fa);
             border: 3px solid #e9ecef;
@@ -266,6 +340,10 @@ html_content = '''<!DOCTYPE html>
             box-shadow: 0 5px 15px rgba(52, 152, 219, 0.4);
         }
 
+        .sermon-text.loading {
+            color: #95a5a6;
+        }
+
         .sermon-text.collapsed {
             max-height: 200px;
             overflow: hidden;
@@ -283,7 +361,6 @@ html_content = '''<!DOCTYPE html>
         }
 
         .no-results {
-            grid-column: 1 / -1;
             text-align: center;
             padding: 80px 20px;
             color: #6c757d;
@@ -326,19 +403,12 @@ html_content = '''<!DOCTYPE html>
             box-shadow: 0 2px 5px rgba(255, 215, 0, 0.3);
         }
 
-        @media (max-width: 1200px) {
-            .content {
-                grid-template-columns: repeat(auto-fill, minmax(350px, 1fr));
-            }
-        }
-
         @media (max-width: 768px) {
             header h1 {
                 font-size: 2em;
             }
 
             .content {
-                grid-template-columns: 1fr;
                 padding: 20px;
             }
 
@@ -382,6 +452,7 @@ html_content = '''<!DOCTYPE html>
                     type="text" 
                     id="searchInput" 
                     placeholder="🔍 ابحث في الشروح... (يمكنك البحث برقم الخطبة أو نص الشرح)"
+                    title="يطابق البحث بدايات الكلمات، ويتجاهل ما يتصل بأولها من و، ف، ب، ك، ل وأل التعريف"
                     autocomplete="off"
                 >
                 <button class="clear-btn" id="clearBtn">مسح البحث</button>
@@ -397,69 +468,248 @@ html_content = '''<!DOCTYPE html>
         </div>
     </div>
 
+    <script src="__DATA_DIR__/__MANIFEST__"></script>
     <script>
-        // Embedded data
-        const allData = ''' + json.dumps(data, ensure_ascii=False, indent=2) + ''';
-        
-        let displayedSermons = [];
+        // The manifest lists every sermon with a short preview and the chunk
+        // holding its text; chunks are loaded as their cards scroll into view.
+        // Searches run in a Web Worker (manifest.worker) over an inverted
+        // index whose shards it loads as queries need them
+        const DATA_DIR = '__DATA_DIR__';
+        const manifest = window.VIEWER_MANIFEST;
+        const sermons = manifest.sermons.map(([key, preview, chunk]) => ({ key, preview, chunk }));
+
+        const texts = {};
+        const scriptLoads = new Map();
+
+        // Called by each chunk script
+        window.viewerChunk = function (index, data) {
+            Object.assign(texts, data);
+        };
+
+        // Load a data script once; script tags also work when the page is opened from disk
+        function loadScript(file) {
+            if (!scriptLoads.has(file)) {
+                scriptLoads.set(file, new Promise((resolve, reject) => {
+                    const script = document.createElement('script');
+                    script.src = DATA_DIR + '/' + file;
+                    script.onload = resolve;
+                    script.onerror = () => {
+                        scriptLoads.delete(file);
+                        reject(new Error('Failed to load ' + script.src));
+                    };
+                    document.head.appendChild(script);
+                }));
+            }
+            return scriptLoads.get(file);
+        }
 
-        // Display all sermons
-        function displayAllSermons() {
-            const content = document.getElementById('content');
-            content.innerHTML = '';
-            
-            // Sort sermon numbers numerically
-            const sortedKeys = Object.keys(allData).sort((a, b) => {
-                const numA = parseInt(a.replace('الخطبة', ''));
-                const numB = parseInt(b.replace('الخطبة', ''));
-                return numA - numB;
+        function loadChunk(index) {
+            return loadScript(manifest.chunks[index]);
+        }
+
+        // Virtual list: only the rows of cards near the visible part of the
+        // list are in the DOM. Rows leaving it are recycled, with their cards,
+        // for the rows coming into it; rows that were never drawn count with
+        // the average height of the drawn ones
+        const content = document.getElementById('content');
+        const topSpacer = document.createElement('div');
+        const rowBox = document.createElement('div');
+        const bottomSpacer = document.createElement('div');
+        const noResults = document.createElement('div');
+        noResults.className = 'no-results';
+        noResults.style.display = 'none';
+        [topSpacer, rowBox, bottomSpacer, noResults].forEach(element => content.appendChild(element));
+
+        // Pixels drawn above and below the visible part of the list
+        const OVERSCAN = 800;
+        const ROW_GAP = 30;
+
+        const list = {
+            items: sermons.map((_, number) => number),  // Manifest order: sorted when the page was built
+            columns: 1,
+            heights: [],
+            rows: new Map(),
+            version: 0,  // Changes with each new list, so recycled cards are redrawn
+        };
+        const rowPool = [];
+        const cardPool = [];
+        const expanded = new Set();
+        let renderScheduled = false;
+
+        // Offsets of the words to highlight, by sermon number
+        let highlights = {};
+
+        function columnCount() {
+            // Same breakpoints as the card grid's CSS
+            if (window.innerWidth <= 768) return 1;
+            const minWidth = window.innerWidth <= 1200 ? 350 : 450;
+            const style = getComputedStyle(content);
+            const width = content.clientWidth - parseFloat(style.paddingLeft) - parseFloat(style.paddingRight);
+            return Math.max(1, Math.floor((width + ROW_GAP) / (minWidth + ROW_GAP)));
+        }
+
+        function scheduleRender() {
+            if (renderScheduled) return;
+            renderScheduled = true;
+            requestAnimationFrame(renderList);
+        }
+
+        // Show a new list of sermons from the top
+        function setItems(items) {
+            list.items = items;
+            list.version++;
+            list.heights = [];
+            content.scrollTop = 0;
+            renderList();
+        }
+
+        function renderList() {
+            renderScheduled = false;
+            const rowCount = Math.ceil(list.items.length / list.columns);
+            const measured = list.heights.filter(height => height !== undefined);
+            const estimate = measured.length ? measured.reduce((a, b) => a + b, 0) / measured.length : 450;
+            const viewTop = content.scrollTop - OVERSCAN;
+            const viewBottom = content.scrollTop + content.clientHeight + OVERSCAN;
+
+            let top = 0;
+            let first = -1;
+            let last = -1;
+            let firstTop = 0;
+            let drawnHeight = 0;
+            for (let row = 0; row < rowCount; row++) {
+                const height = list.heights[row] === undefined ? estimate : list.heights[row];
+                if (top + height >= viewTop && top <= viewBottom) {
+                    if (first < 0) {
+                        first = row;
+                        firstTop = top;
+                    }
+                    last = row;
+                    drawnHeight += height;
+                }
+                top += height;
+            }
+
+            list.rows.forEach((element, row) => {
+                if (row < first || row > last) {
+                    list.rows.delete(row);
+                    rowBox.removeChild(element);
+                    rowPool.push(element);
+                }
             });
+            let next = rowBox.firstChild;
+            for (let row = first; first >= 0 && row <= last; row++) {
+                let element = list.rows.get(row);
+                if (!element) {
+                    element = rowPool.pop() || createRow();
+                    list.rows.set(row, element);
+                }
+                if (element !== next) rowBox.insertBefore(element, next);
+                else next = next.nextSibling;
+                fillRow(element, row);
+            }
 
-            displayedSermons = sortedKeys;
+            topSpacer.style.height = firstTop + 'px';
+            bottomSpacer.style.height = Math.max(0, top - firstTop - drawnHeight) + 'px';
+            noResults.style.display = list.items.length ? 'none' : '';
 
-            sortedKeys.forEach((key, index) => {
-                const sermonCard = createSermonCard(key, allData[key], index);
-                content.appendChild(sermonCard);
+            let changed = false;
+            list.rows.forEach((element, row) => {
+                const height = element.offsetHeight + ROW_GAP;
+                if (list.heights[row] !== height) {
+                    list.heights[row] = height;
+                    changed = true;
+                }
             });
+            if (changed) scheduleRender();
         }
 
-        // Create a sermon card element
-        function createSermonCard(key, text, index) {
+        function createRow() {
+            const element = document.createElement('div');
+            element.className = 'card-row';
+            return element;
+        }
+
+        function fillRow(element, row) {
+            element.style.gridTemplateColumns = `repeat(${list.columns}, minmax(0, 1fr))`;
+            const start = row * list.columns;
+            const numbers = list.items.slice(start, start + list.columns);
+            while (element.children.length > numbers.length) {
+                cardPool.push(element.removeChild(element.lastChild));
+            }
+            while (element.children.length < numbers.length) {
+                element.appendChild(cardPool.pop() || createCard());
+            }
+            numbers.forEach((number, i) => fillCard(element.children[i], number));
+        }
+
+        function createCard() {
             const card = document.createElement('div');
             card.className = 'sermon-card';
-            card.dataset.sermonKey = key;
-            card.style.animationDelay = `${index * 0.05}s`;
+            return card;
+        }
+
+        // Draw a sermon into a (possibly recycled) card, unless it already shows it
+        function fillCard(card, number) {
+            const sermon = sermons[number];
+            const text = texts[sermon.key];
+            const state = `${number}|${text !== undefined}|${list.version}|${expanded.has(number)}`;
+            if (card.dataset.state === state) return;
+            card.dataset.state = state;
+            card.dataset.sermonKey = sermon.key;
+            if (text === undefined) {
+                card.innerHTML = cardBody(number, null);
+                loadChunk(sermon.chunk).then(scheduleRender, () => {
+                    // Try again the next time the card is drawn
+                    card.dataset.state = '';
+                });
+            } else {
+                card.innerHTML = cardBody(number, highlightText(text, highlights[number] || []));
+            }
+        }
+
+
+        // Display all sermons
+        function displayAllSermons() {
+            cancelSearch();
+            highlights = {};
+            setItems(sermons.map((_, number) => number));
+        }
 
+        // A card's content; without its text the card shows the preview
+        function cardBody(number, text) {
+            const key = sermons[number].key;
             const sermonNumber = key.replace('الخطبة', '');
-            
-            // Truncate text if too long
-            const isLong = text.length > 500;
-            const displayText = text;
-            
-            card.innerHTML = `
+            const header = `
                 <div class="sermon-header">
                     <div class="sermon-number">${key}</div>
                     <div class="sermon-title">الخطبة رقم ${sermonNumber}</div>
-                </div>
-                <div class="sermon-text ${isLong ? 'collapsed' : ''}" id="text-${sermonNumber}">${formatText(displayText)}</div>
-                ${isLong ? `<button class="toggle-btn" onclick="toggleText('${sermonNumber}')">عرض المزيد ▼</button>` : ''}
-            `;
+                </div>`;
 
-            return card;
+            if (text === null) {
+                return header + `<div class="sermon-text loading"><p>${sermons[number].preview}</p></div>`;
+            }
+
+            // Truncate text if too long
+            const isLong = text.length > 500;
+            const isOpen = expanded.has(number);
+            return header + `
+                <div class="sermon-text ${isLong && !isOpen ? 'collapsed' : ''}">${formatText(text)}</div>
+                ${isLong ? `<button class="toggle-btn" onclick="toggleText(${number}, this)">${isOpen ? 'عرض أقل ▲' : 'عرض المزيد ▼'}</button>` : ''}
+            `;
         }
 
         // Toggle text expansion
-        function toggleText(sermonNumber) {
-            const textElement = document.getElementById('text-' + sermonNumber);
-            const btn = event.target;
-            
-            if (textElement.classList.contains('collapsed')) {
-                textElement.classList.remove('collapsed');
-                btn.textContent = 'عرض أقل ▲';
+        function toggleText(number, button) {
+            const card = button.closest('.sermon-card');
+            if (expanded.has(number)) {
+                expanded.delete(number);
             } else {
-                textElement.classList.add('collapsed');
-                btn.textContent = 'عرض المزيد ▼';
-                textElement.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+                expanded.add(number);
+            }
+            fillCard(card, number);
+            renderList();
+            if (!expanded.has(number)) {
+                card.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
             }
         }
 
@@ -473,62 +723,112 @@ html_content = '''<!DOCTYPE html>
                 .join('');
         }
 
-        // Search functionality
+
+        // Token class of search_index.py, to find the end of a highlighted word
+        const TOKEN = /(?:[\\p{L}\\p{N}_]|[\\u0610-\\u061A\\u064B-\\u065F\\u0670\\u06D6-\\u06ED])+/gu;
+
+        // Search: typing is debounced, each query gets a new id that makes the
+        // engine drop any older one, and results arrive in batches in page order
+        const SEARCH_DELAY = 150;
+        let searchEngine = null;
+        let searchId = 0;
+        let shownSearch = 0;
+        let searchQuery = '';
+        let searchTimer = null;
+
+        function engineInit(base) {
+            return { type: 'init', index: manifest.index, keys: sermons.map(sermon => sermon.key), base };
+        }
+
+        // The same engine loaded into the page, where a worker cannot be started
+        // (browsers that refuse workers for pages opened from disk)
+        function useInlineSearch() {
+            searchEngine = loadScript(manifest.worker).then(() => {
+                const engine = createInlineSearch();
+                engine.onmessage = onSearchResults;
+                engine.postMessage(engineInit(DATA_DIR + '/'));
+                return engine;
+            });
+        }
+
+        function getSearchEngine() {
+            if (!searchEngine) {
+                try {
+                    const worker = new Worker(DATA_DIR + '/' + manifest.worker);
+                    worker.onmessage = onSearchResults;
+                    worker.onerror = () => {
+                        worker.terminate();
+                        useInlineSearch();
+                        if (searchQuery) sendSearch();
+                    };
+                    worker.postMessage(engineInit(''));
+                    searchEngine = Promise.resolve(worker);
+                } catch (e) {
+                    useInlineSearch();
+                }
+            }
+            return searchEngine;
+        }
+
+        function sendSearch() {
+            const message = { type: 'search', id: ++searchId, query: searchQuery };
+            getSearchEngine().then(engine => engine.postMessage(message));
+        }
+
+        function cancelSearch() {
+            clearTimeout(searchTimer);
+            searchQuery = '';
+            const message = { type: 'cancel', id: ++searchId };
+            if (searchEngine) searchEngine.then(engine => engine.postMessage(message));
+        }
+
         function performSearch(query) {
-            const content = document.getElementById('content');
-            
             if (!query.trim()) {
                 displayAllSermons();
                 updateStats();
                 return;
             }
-
-            content.innerHTML = '';
-            let foundCount = 0;
-            let index = 0;
-
-            Object.keys(allData).sort((a, b) => {
-                const numA = parseInt(a.replace('الخطبة', ''));
-                const numB = parseInt(b.replace('الخطبة', ''));
-                return numA - numB;
-            }).forEach(key => {
-                const text = allData[key];
-                const lowerQuery = query.toLowerCase();
-                const lowerText = text.toLowerCase();
-                const lowerKey = key.toLowerCase();
-
-                if (lowerText.includes(lowerQuery) || lowerKey.includes(lowerQuery)) {
-                    const highlightedText = highlightText(text, query);
-                    const card = createSermonCard(key, highlightedText, index);
-                    content.appendChild(card);
-                    foundCount++;
-                    index++;
-                }
-            });
-
-            if (foundCount === 0) {
-                content.innerHTML = '<div class="no-results">لم يتم العثور على نتائج للبحث: "' + query + '"</div>';
-            }
-
-            updateStats(foundCount, query);
+            searchQuery = query;
+            sendSearch();
         }
 
-        // Highlight search query in text
-        function highlightText(text, query) {
-            if (!query.trim()) return text;
-            
-            const regex = new RegExp('(' + escapeRegExp(query) + ')', 'gi');
-            return text.replace(regex, '<span class="highlight">$1</span>');
+        // A batch of results: {id, items: sermon numbers, highlights: {number: offsets}, done}
+        function onSearchResults(event) {
+            const reply = event.data;
+            if (reply.id !== searchId) return;
+            if (shownSearch !== reply.id) {
+                shownSearch = reply.id;
+                highlights = reply.highlights;
+                noResults.textContent = 'لم يتم العثور على نتائج للبحث: "' + searchQuery + '"';
+                setItems(reply.items);
+            } else {
+                Object.assign(highlights, reply.highlights);
+                list.items = list.items.concat(reply.items);
+                scheduleRender();
+            }
+            updateStats(list.items.length, searchQuery);
         }
 
-        // Escape special regex characters
-        function escapeRegExp(string) {
-            return string.replace(/[.*+?^${}()|[\\]\\\\]/g, '\\\\$&');
+        // Highlight the words starting at the given offsets
+        function highlightText(text, offsets) {
+            if (!offsets.length) return text;
+            const token = new RegExp(TOKEN.source, 'uy');
+            let html = '';
+            let last = 0;
+            [...new Set(offsets)].sort((a, b) => a - b).forEach(offset => {
+                if (offset < last) return;
+                token.lastIndex = offset;
+                const match = token.exec(text);
+                if (!match) return;
+                html += text.slice(last, offset) + '<span class="highlight">' + match[0] + '</span>';
+                last = offset + match[0].length;
+            });
+            return html + text.slice(last);
         }
 
         // Update statistics
         function updateStats(filteredCount = null, query = null) {
-            const totalSermons = Object.keys(allData).length;
+            const totalSermons = sermons.length;
             const statsText = document.getElementById('statsText');
 
             if (filteredCount !== null && query) {
@@ -540,7 +840,8 @@ html_content = '''<!DOCTYPE html>
 
         // Event listeners
         document.getElementById('searchInput').addEventListener('input', (e) => {
-            performSearch(e.target.value);
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => performSearch(e.target.value), SEARCH_DELAY);
         });
 
         document.getElementById('clearBtn').addEventListener('click', () => {
@@ -557,17 +858,484 @@ html_content = '''<!DOCTYPE html>
             }
         });
 
+        content.addEventListener('scroll', scheduleRender, { passive: true });
+        window.addEventListener('resize', () => {
+            const columns = columnCount();
+            if (columns !== list.columns) {
+                list.columns = columns;
+                list.heights = [];
+            }
+            scheduleRender();
+        });
+
         // Initialize on page load
+        list.columns = columnCount();
         displayAllSermons();
         updateStats();
     </script>
 </body>
 </html>
+'''.replace('__DATA_DIR__', data_dir).replace('__MANIFEST__', manifest_file)
+
+
+# The page's search engine, written next to the data scripts
+SEARCH_WORKER_JS = r'''// Search engine of the explanations viewer. It runs as a Web Worker, or in
+// the page through createInlineSearch() where a worker cannot be started.
+// Messages in: {type: 'init', index, keys, base}, {type: 'search', id, query}
+// and {type: 'cancel', id}; a message with a new id abandons the search in
+// progress. Messages out: {id, items, highlights, done}, the matching sermon
+// numbers in page order, a batch at a time
+(function (scope) {
+    // Same token class and normalisation as search_index.py, which
+    // follows ArabicUtils.normalize in the app
+    const TOKEN = /(?:[\p{L}\p{N}_]|[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED])+/gu;
+
+    // Results sent per message
+    const BATCH = 40;
+
+    let index = {};  // Shard key -> file
+    let keys = [];
+    let base = '';
+    let current = 0;
+    let post = null;
+    const shards = {};
+    const shardLoads = new Map();
+
+    // Called by each index shard script
+    scope.viewerIndexShard = function (key, shard) {
+        shards[key] = shard;
+    };
+
+    function normalize(text) {
+        return text
+            .replace(/[\u064B-\u065F]/g, '')  // Tashkeel
+            .replace(/[\u06D6-\u06ED]/g, '')  // Quranic marks
+            .replace(/[أإآ]/g, 'ا')
+            .replace(/ى/g, 'ي')
+            .replace(/ة/g, 'ه')
+            .toLowerCase();
+    }
+
+    function queryTerms(query) {
+        return (query.match(TOKEN) || []).map(normalize).filter(term => term.length > 0);
+    }
+
+    // Shards holding the terms that start with `term`
+    function shardsFor(term) {
+        return Object.keys(index).filter(key => key.startsWith(term) || term.startsWith(key));
+    }
+
+    // Load a shard once: importScripts in a worker, a script tag in the page
+    function loadShard(key) {
+        if (!shardLoads.has(key)) {
+            shardLoads.set(key, new Promise((resolve, reject) => {
+                if (typeof document === 'undefined') {
+                    importScripts(base + index[key]);
+                    resolve();
+                    return;
+                }
+                const script = document.createElement('script');
+                script.src = base + index[key];
+                script.onload = resolve;
+                script.onerror = () => reject(new Error('Failed to load ' + script.src));
+                document.head.appendChild(script);
+            }).catch(error => {
+                shardLoads.delete(key);
+                throw error;
+            }));
+        }
+        return shardLoads.get(key);
+    }
+
+    function lowerBound(terms, term) {
+        let low = 0;
+        let high = terms.length;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            if (terms[middle] < term) low = middle + 1;
+            else high = middle;
+        }
+        return low;
+    }
+
+    // Sermons containing a word that starts with `term`, with the offsets of those words
+    function lookup(term) {
+        const found = new Map();
+        shardsFor(term).forEach(key => {
+            const shard = shards[key];
+            if (!shard) return;
+            for (let i = lowerBound(shard.terms, term); i < shard.terms.length && shard.terms[i].startsWith(term); i++) {
+                // Postings: sermon, count, then the offsets as gaps
+                const postings = shard.postings[i];
+                let p = 0;
+                while (p < postings.length) {
+                    const sermon = postings[p];
+                    const count = postings[p + 1];
+                    p += 2;
+                    if (!found.has(sermon)) found.set(sermon, []);
+                    const offsets = found.get(sermon);
+                    let offset = 0;
+                    for (let n = 0; n < count; n++) {
+                        offset += postings[p++];
+                        offsets.push(offset);
+                    }
+                }
+            }
+        });
+        return found;
+    }
+
+    // Let waiting messages in, so a newer search or a cancel can take over
+    function pause() {
+        return new Promise(resolve => setTimeout(resolve, 0));
+    }
+
+    // Every query word must start a word of the sermon, or the word without
+    // its leading clitics as search_index.py indexes it (or the query must
+    // appear in its number)
+    async function search(id, query) {
+        const terms = queryTerms(query);
+        await Promise.all([...new Set(terms.flatMap(shardsFor))].map(key => loadShard(key).catch(() => null)));
+        if (id !== current) return;
+
+        let matches = null;
+        for (const term of terms) {
+            const found = lookup(term);
+            if (matches === null) {
+                matches = found;
+            } else {
+                const both = new Map();
+                matches.forEach((offsets, sermon) => {
+                    if (found.has(sermon)) both.set(sermon, offsets.concat(found.get(sermon)));
+                });
+                matches = both;
+            }
+            await pause();
+            if (id !== current) return;
+        }
+        matches = matches || new Map();
+
+        const normalizedQuery = normalize(query.trim());
+        let items = [];
+        let highlights = {};
+        for (let number = 0; number < keys.length; number++) {
+            const inText = matches.has(number);
+            if (!inText && !normalize(keys[number]).includes(normalizedQuery)) continue;
+            items.push(number);
+            highlights[number] = inText ? matches.get(number) : [];
+            if (items.length === BATCH) {
+                post({ id, items, highlights, done: false });
+                items = [];
+                highlights = {};
+                await pause();
+                if (id !== current) return;
+            }
+        }
+        post({ id, items, highlights, done: true });
+    }
+
+    function handle(message) {
+        if (message.type === 'init') {
+            index = message.index;
+            keys = message.keys;
+            base = message.base;
+            return;
+        }
+        current = message.id;
+        if (message.type === 'search') search(message.id, message.query);
+    }
+
+    if (typeof document === 'undefined') {
+        post = message => scope.postMessage(message);
+        scope.onmessage = event => handle(event.data);
+    } else {
+        // An object answering like a worker, for the page to fall back on
+        scope.createInlineSearch = function () {
+            const engine = {
+                onmessage: null,
+                postMessage(message) {
+                    setTimeout(() => handle(message), 0);
+                },
+                terminate() {
+                    current = -1;
+                },
+            };
+            post = message => engine.onmessage && engine.onmessage({ data: message });
+            return engine;
+        };
+    }
+})(self);
+'''
+
+
+def data_dir_for(output):
+    """Where the data scripts of a page go: view_explanations.html -> view_explanations_data"""
+    return os.path.splitext(output)[0] + '_data'
+
+
+def write_viewer(output, data, chunk_bytes=CHUNK_BYTES, compress=True):
+    """
+    Write the page, its manifest, its chunks, its search index and search worker
+
+    The data files are named by their content hash (see static_assets.py), so
+    they can be cached for good: a file only changes name when its content
+    changes, and an unchanged one is not written again. They are written
+    before the page, and files of an earlier build are removed, so the page
+    never refers to a missing or stale file. With compress, every file gets
+    .gz and .br siblings.
+
+    Returns:
+        The manifest
+    """
+    data_dir = data_dir_for(output)
+    assets = AssetWriter(data_dir, compress)
+    manifest, chunks = build_chunks(data, chunk_bytes)
+    for index, (name, chunk) in enumerate(zip(manifest['chunks'], chunks)):
+        manifest['chunks'][index] = assets.put(name, _script(f"viewerChunk({index},", chunk))
+    # Sermons are numbered in the index by their position in the manifest
+    shards = shard_index(build_index([data[key] for key, _, _ in manifest['sermons']]))
+    manifest['index'] = {}
+    for key, shard in shards.items():
+        call = f"viewerIndexShard({json.dumps(key, ensure_ascii=False)},"
+        manifest['index'][key] = assets.put(shard_file_name(key), _script(call, shard))
+    manifest['worker'] = assets.put('search-worker.js', SEARCH_WORKER_JS)
+    manifest_file = assets.put('manifest.js', _script("window.VIEWER_MANIFEST = (", manifest))
+    assets.finish()
+    # The page keeps its name, so it must be served without long caching
+    write_file(output, build_shell(os.path.basename(data_dir), manifest_file), compress)
+    print(f"♻️  {assets.written} of {len(assets.files)} data files written, the rest unchanged")
+    return manifest
+
+
+# One static page per sermon, readable without loading any data script
+STATIC_PAGE = '''<!DOCTYPE html>
+<html lang="ar" dir="rtl">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>__TITLE__</title>__LINKS__
+    <style>
+        * {
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }
+
+        body {
+            font-family: 'Amiri', 'Traditional Arabic', 'Arabic Typesetting', 'Scheherazade', serif;
+            background: #16213e;
+            padding: 20px;
+            line-height: 2;
+        }
+
+        main {
+            max-width: 900px;
+            margin: 0 auto;
+            background: white;
+            border-radius: 24px;
+            padding: 40px;
+        }
+
+        h1 {
+            color: #0f3460;
+            font-size: 1.8em;
+            margin-bottom: 20px;
+            padding-bottom: 15px;
+            border-bottom: 4px solid #0f3460;
+        }
+
+        .sermon-text {
+            font-size: 1.2em;
+            line-height: 2.4;
+            color: #2c3e50;
+            text-align: justify;
+        }
+
+        .sermon-text p {
+            margin-bottom: 18px;
+            text-indent: 30px;
+        }
+
+        .pager {
+            display: flex;
+            justify-content: space-between;
+            gap: 20px;
+            margin: 20px 0;
+            font-family: 'Cairo', sans-serif;
+        }
+
+        a {
+            color: #0f3460;
+            font-weight: bold;
+            text-decoration: none;
+        }
+
+        a:hover {
+            text-decoration: underline;
+        }
+
+        .sermon-list {
+            list-style: none;
+        }
+
+        .sermon-list li {
+            padding: 12px 0;
+            border-bottom: 1px solid #e9ecef;
+        }
+
+        .sermon-list p {
+            color: #6c757d;
+        }
+    </style>
+</head>
+<body>
+    <main>
+__BODY__
+    </main>
+</body>
+</html>
 '''
 
-# Write the HTML file
-with open('view_explanations.html', 'w', encoding='utf-8') as f:
-    f.write(html_content)
 
-print("✅ HTML file generated successfully with embedded data!")
-print(f"📊 Total sermons: {len(data)}")
+def pages_dir_for(output):
+    """Where the static pages of a viewer go: view_explanations.html -> view_explanations_pages"""
+    return os.path.splitext(output)[0] + '_pages'
+
+
+def page_names(keys):
+    """
+    File name of each sermon's static page: الخطبة12 -> sermon-12.html
+
+    Returns:
+        Dictionary of key -> file name
+    """
+    names = {}
+    for key in keys:
+        match = re.search(r'\d+', key)
+        base = f"sermon-{int(match.group())}" if match else 'sermon-' + re.sub(r'[^\w-]+', '-', key)
+        name = f"{base}.html"
+        suffix = 2
+        while name in names.values():
+            name = f"{base}-{suffix}.html"
+            suffix += 1
+        names[key] = name
+    return names
+
+
+def format_text(text):
+    """A text's paragraphs as HTML, split as the page's formatText() does."""
+    paragraphs = (para.strip() for para in text.split('\n\n'))
+    return ''.join(f"<p>{html.escape(para, quote=False)}</p>" for para in paragraphs if para)
+
+
+def render_page(title, body, links=''):
+    """A static page from its title, <main> content and <link> tags."""
+    return (STATIC_PAGE.replace('__TITLE__', html.escape(title))
+            .replace('__LINKS__', links)
+            .replace('__BODY__', body))
+
+
+def _link(href, text, rel=None):
+    rel = f' rel="{rel}"' if rel else ''
+    return f'<a href="{html.escape(href)}"{rel}>{html.escape(text)}</a>'
+
+
+def write_pages(output, data, compress=True):
+    """
+    Write a static page for every sermon, with links to the previous and
+    next ones, and an index page listing them all
+
+    The pages are rendered in full at build time, so a deep link shows the
+    sermon at once; only the viewer they link to loads data. Pages of
+    sermons no longer in the data are removed.
+
+    Returns:
+        The pages directory
+    """
+    pages_dir = pages_dir_for(output)
+    os.makedirs(pages_dir, exist_ok=True)
+    viewer = os.path.relpath(output, pages_dir).replace(os.sep, '/')
+    keys = sorted(data, key=sermon_number)
+    names = page_names(keys)
+    written = {'index.html'}
+
+    for position, key in enumerate(keys):
+        number = key.replace('الخطبة', '')
+        title = f"الخطبة رقم {number}"
+        previous = keys[position - 1] if position > 0 else None
+        following = keys[position + 1] if position + 1 < len(keys) else None
+        links = ''.join(f'\n    <link rel="{rel}" href="{html.escape(names[other])}">'
+                        for rel, other in (('prev', previous), ('next', following)) if other)
+        pager = '\n'.join([
+            '        <nav class="pager">',
+            '            ' + (_link(names[previous], f"→ {previous}", 'prev') if previous else '<span></span>'),
+            '            ' + _link('index.html', "فهرس الخطب"),
+            '            ' + (_link(names[following], f"{following} ←", 'next') if following else '<span></span>'),
+            '        </nav>',
+        ])
+        body = '\n'.join([
+            pager,
+            f"        <h1>{html.escape(title)}</h1>",
+            f'        <div class="sermon-text">{format_text(data[key])}</div>',
+            pager,
+        ])
+        write_file(os.path.join(pages_dir, names[key]),
+                   render_page(f"{title} - شروح نهج البلاغة", body, links), compress)
+        written.add(names[key])
+
+    items = '\n'.join(f"            <li>{_link(names[key], key)}<p>{html.escape(preview(data[key]))}</p></li>"
+                      for key in keys)
+    body = '\n'.join([
+        '        <h1>شروح نهج البلاغة</h1>',
+        f'        <nav class="pager">{_link(viewer, "البحث في الشروح")}</nav>',
+        '        <ul class="sermon-list">',
+        items,
+        '        </ul>',
+    ])
+    write_file(os.path.join(pages_dir, 'index.html'), render_page("شروح نهج البلاغة - فهرس الخطب", body), compress)
+
+    keep = set(written)
+    if compress:
+        keep.update(name + suffix for name in written for suffix in COMPRESSED)
+    for name in os.listdir(pages_dir):
+        if name not in keep and os.path.isfile(os.path.join(pages_dir, name)):
+            os.remove(os.path.join(pages_dir, name))
+    return pages_dir
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate the explanations viewer HTML")
+    parser.add_argument('--input', default='all_explanations.json',
+                        help="Explanations JSON (default: all_explanations.json)")
+    parser.add_argument('--output', default='view_explanations.html',
+                        help="Page to write; its data goes in NAME_data next to it (default: view_explanations.html)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_BYTES, metavar='BYTES',
+                        help=f"Approximate text bytes per chunk (default: {CHUNK_BYTES})")
+    parser.add_argument('--no-compress', dest='compress', action='store_false',
+                        help="Do not write the .gz and .br siblings of the page and its data")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    profiler = profiler_from_args(args, 'generate_viewer')
+    
+    with profiler.stage('load'):
+        data = load_data(args.input)
+    if args.compress and brotli is None:
+        print("⚠️  brotli is not installed; writing .gz files only")
+    with profiler.stage('write'):
+        manifest = write_viewer(args.output, data, args.chunk_size, args.compress)
+    
+    with profiler.stage('pages'):
+        pages_dir = write_pages(args.output, data, args.compress)
+    
+    print(f"✅ {args.output} generated, loading its data from {data_dir_for(args.output)}/")
+    print(f"📄 {len(data)} static sermon pages in {pages_dir}/, listed in {os.path.join(pages_dir, 'index.html')}")
+    print(f"📊 Total sermons: {len(data)} in {len(manifest['chunks'])} chunks")
+    profiler.finish()
+
+
+if __name__ == '__main__':
+    main()
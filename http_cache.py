@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Persistent HTTP response cache for the Nahj al-Balagha scrapers
+Bodies are stored zlib-compressed, keyed by URL, together with the
+validators (ETag / Last-Modified) needed to revalidate them
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_CACHE_DIR = '.http_cache'
+
+# Response headers kept alongside the cached body
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class CacheMiss(requests.RequestException):
+    """Raised in offline mode when a URL has no cached response."""
+
+
+class ResponseCache:
+    """
+    On-disk response cache.
+
+    Each URL maps to two files named after the SHA-256 of the URL: a small
+    JSON file with the stored headers and a zlib-compressed body. Each is
+    written atomically, and the JSON file holds the digest of the body it
+    belongs to, so an entry whose files come from different runs (one was
+    replaced before a crash, the other not) is treated as a miss and never
+    torn. The counters are updated from the fetching threads through count().
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self.revalidated = 0
+        self.stored = 0
+        self._lock = threading.Lock()
+
+    def count(self, counter):
+        """Add one to the hits, revalidated or stored counter"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _paths(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        folder = os.path.join(self.directory, digest[:2])
+        return folder, os.path.join(folder, digest + '.json'), os.path.join(folder, digest + '.body')
+
+    def load(self, url):
+        """
+        Return the cached requests.Response for a URL, or None
+        """
+        _, meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                stored = f.read()
+            if meta.get('body_sha256') != hashlib.sha256(stored).hexdigest():
+                # Half of an interrupted store(), or an entry from before digests were kept
+                return None
+            body = zlib.decompress(stored)
+        except (OSError, ValueError, zlib.error):
+            return None
+        return build_response(url, meta['headers'], body)
+
+    def store(self, url, response):
+        """
+        Store a successful response body with its validators
+        """
+        folder, meta_path, body_path = self._paths(url)
+        os.makedirs(folder, exist_ok=True)
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        body = zlib.compress(response.content, 6)
+        meta = {'url': url, 'headers': headers, 'fetched_at': time.time(),
+                'body_sha256': hashlib.sha256(body).hexdigest()}
+        _write_atomic(body_path, body)
+        _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+        self.count('stored')
+
+
+def conditional_headers(cached):
+    """
+    Build If-None-Match / If-Modified-Since headers from a cached response
+    """
+    headers = {}
+    if 'ETag' in cached.headers:
+        headers['If-None-Match'] = cached.headers['ETag']
+    if 'Last-Modified' in cached.headers:
+        headers['If-Modified-Since'] = cached.headers['Last-Modified']
+    return headers
+
+
+def build_response(url, headers, body):
+    """
+    Wrap a cached body in a requests.Response so callers cannot tell the difference
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = body
+    response.from_cache = True
+    return response
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the Nahj al-Balagha scrapers
+Keeps one pooled keep-alive session per process, negotiates compressed
+transfers and retries transient failures with exponential backoff
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+from charset import CharsetResolver
+from http_cache import DEFAULT_CACHE_DIR, CacheMiss, ResponseCache, conditional_headers
+from metrics import get_metrics
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Responses worth retrying: rate limiting and server-side errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_TIMEOUT = 15
+DEFAULT_POOL_SIZE = 16
+
+
+class HttpClient:
+    """
+    Pooled, retrying HTTP client shared by all scrapers.
+
+    One requests.Session keeps a connection pool per host, so consecutive
+    requests to imamali.net or gadir.free.fr reuse open connections.
+    urllib3 advertises every content coding it can decode (gzip and deflate,
+    plus br when the brotli package is installed).
+
+    With a ResponseCache, cached pages are revalidated with conditional
+    requests and a 304 reuses the stored body; in offline mode only the
+    cache is consulted.
+
+    Every get() is recorded as a 'fetch' measurement of the URL's host in
+    the process-wide Metrics.
+
+    decode() turns a response into text through a CharsetResolver, which
+    remembers each host's charset instead of running detection on every page.
+
+    Observers added with add_observer() see every network attempt as
+    (url, seconds, status), with status None for timeouts and connection
+    errors; adaptive rate limiters use them to pace each host.
+    """
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, timeout=DEFAULT_TIMEOUT,
+                 pool_size=DEFAULT_POOL_SIZE, user_agent=USER_AGENT,
+                 cache=None, offline=False):
+        self.cache = cache
+        self.offline = offline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.retried = 0
+        self._counter_lock = threading.Lock()
+        self.observers = []
+        self.charsets = CharsetResolver()
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': user_agent,
+            'Accept-Encoding': ACCEPT_ENCODING,
+        })
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, timeout=None, headers=None):
+        """
+        GET a URL through the cache, retrying timeouts, connection errors,
+        429 and 5xx responses
+
+        Returns:
+            The successful requests.Response; `from_cache` is True when the
+            body came from the cache (offline hit or 304 revalidation)
+
+        Raises:
+            requests.RequestException once all retries are used up
+            CacheMiss in offline mode when the URL is not cached
+        """
+        with get_metrics().timer('fetch', urlparse(url).netloc) as sample:
+            response = self._get(url, timeout, headers)
+            sample.size = len(response.content)
+        return response
+
+    def _get(self, url, timeout=None, headers=None):
+        cached = self.cache.load(url) if self.cache else None
+        if self.offline:
+            if cached is None:
+                raise CacheMiss(f"Not in cache (offline mode): {url}")
+            self.cache.count('hits')
+            return cached
+
+        if cached is not None:
+            headers = {**conditional_headers(cached), **(headers or {})}
+
+        response = self._get_with_retries(url, timeout, headers)
+        if cached is not None and response.status_code == 304:
+            self.cache.count('revalidated')
+            return cached
+
+        response.from_cache = False
+        if self.cache and response.status_code == 200:
+            self.cache.store(url, response)
+        return response
+
+    def decode(self, response):
+        """
+        Text of a response, decoded with the charset resolved for its host
+        """
+        return self.charsets.decode(response)
+
+    def add_observer(self, observer):
+        """
+        Call observer(url, seconds, status) after every network attempt
+        """
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        """
+        Stop calling an observer added with add_observer()
+        """
+        # Rebuilt rather than edited, so attempts in flight keep iterating the old list
+        self.observers = [o for o in self.observers if o != observer]
+
+    def _observe(self, url, started, status):
+        elapsed = time.monotonic() - started
+        for observer in self.observers:
+            observer(url, elapsed, status)
+
+    def _get_with_retries(self, url, timeout=None, headers=None):
+        timeout = timeout or self.timeout
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                response = self.session.get(url, timeout=timeout, headers=headers)
+            except (requests.Timeout, requests.ConnectionError):
+                self._observe(url, started, None)
+                if attempt >= self.retries:
+                    raise
+                self._sleep_before_retry(attempt)
+            else:
+                self._observe(url, started, response.status_code)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    response.raise_for_status()
+                    return response
+                self._sleep_before_retry(attempt, response)
+            attempt += 1
+
+    def _sleep_before_retry(self, attempt, response=None):
+        with self._counter_lock:
+            self.retried += 1
+        delay = None
+        if response is not None:
+            delay = parse_retry_after(response.headers.get('Retry-After'))
+        if delay is None:
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        time.sleep(min(delay, self.max_backoff))
+
+    def connection_stats(self):
+        """
+        Count opened and reused connections per host
+
+        Returns:
+            Dictionary of host -> {'requests', 'opened', 'reused'}
+        """
+        stats = {}
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                host = stats.setdefault(pool.host, {'requests': 0, 'opened': 0, 'reused': 0})
+                host['requests'] += pool.num_requests
+                host['opened'] += pool.num_connections
+        for host in stats.values():
+            host['reused'] = max(0, host['requests'] - host['opened'])
+        return stats
+
+    def print_stats(self):
+        """Print connection reuse figures for the run."""
+        stats = self.connection_stats()
+        print("\nConnections:")
+        for host, counts in sorted(stats.items()):
+            print(f"  {host}: {counts['requests']} requests, "
+                  f"{counts['opened']} opened, {counts['reused']} reused")
+        if self.retried:
+            print(f"  Retries: {self.retried}")
+        if self.cache:
+            print(f"  Cache: {self.cache.revalidated} revalidated (304), "
+                  f"{self.cache.hits} offline hits, {self.cache.stored} stored")
+        self.charsets.print_stats()
+
+
+def parse_retry_after(value):
+    """
+    Convert a Retry-After header (seconds or HTTP date) to seconds, or None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the process-wide HttpClient, creating it on first use
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient(cache=ResponseCache(DEFAULT_CACHE_DIR))
+        return _client
+
+
+def configure_client(**kwargs):
+    """
+    Replace the process-wide HttpClient with one built from `kwargs`
+    """
+    global _client
+    with _client_lock:
+        _client = HttpClient(**kwargs)
+        return _client
+
+
+def add_client_arguments(parser):
+    """
+    Add the cache options shared by every scraper's command line
+    """
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"Directory of the HTTP response cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Always download pages, without reading or writing the cache")
+    parser.add_argument('--offline', action='store_true',
+                        help="Serve pages only from the cache, never touching the network")
+
+
+def configure_from_args(args):
+    """
+    Configure the process-wide HttpClient from add_client_arguments() options
+    """
+    if args.offline and args.no_cache:
+        raise SystemExit("--offline needs the cache; drop --no-cache")
+    cache = None if args.no_cache else ResponseCache(args.cache_dir)
+    return configure_client(cache=cache, offline=args.offline)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Incremental re-scrape support for the Nahj al-Balagha scrapers
+Remembers a content hash and the HTTP validators of every list entry and
+detail page, so a refresh only re-extracts what actually changed and
+patches just those keys in the existing output
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from http_client import get_client
+
+# Statuses saying a page no longer exists, rather than that fetching it failed
+GONE_STATUSES = frozenset((404, 410))
+
+
+def content_hash(*parts):
+    """
+    SHA-256 hex digest of strings or bytes
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class IncrementalState:
+    """
+    Per-page validators and hashes from the previous run.
+
+    `pages` maps a URL to {'meta', 'etag', 'last_modified', 'body'}, where
+    `meta` hashes the list-page entry that led to the URL and `body` hashes
+    the page itself. `groups` maps a group (an explanation book) to the
+    output keys it produced.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        self.groups = {}
+        self.requests = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.pages = state.get('pages', {})
+            self.groups = state.get('groups', {})
+
+    def fetch(self, url, meta='', force=False, timeout=None):
+        """
+        Fetch a page, conditionally when it may be unchanged since the last run
+
+        The request is conditional when the list metadata is unchanged, and a
+        200 whose body hashes the same as last time also counts as unchanged.
+        A page the response cache revalidated (or served offline) is counted
+        as not modified, like a 304.
+
+        Returns:
+            (response, changed); the response is None for a 304 that the
+            client had no cached body for
+
+        Raises:
+            requests.RequestException if the fetch failed
+        """
+        previous = self.pages.get(url)
+        headers = {}
+        if previous and previous['meta'] == meta and not force:
+            if previous.get('etag'):
+                headers['If-None-Match'] = previous['etag']
+            if previous.get('last_modified'):
+                headers['If-Modified-Since'] = previous['last_modified']
+
+        response = get_client().get(url, timeout=timeout, headers=headers or None)
+        not_modified = response.status_code == 304 or getattr(response, 'from_cache', False)
+        with self._lock:
+            self.requests += 1
+            self.not_modified += not_modified
+        if response.status_code == 304:
+            return None, False
+
+        body = content_hash(response.content)
+        changed = force or not previous or previous['meta'] != meta or previous['body'] != body
+        self.pages[url] = {
+            'meta': meta,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'body': body,
+        }
+        return response, changed
+
+    def fetch_if_changed(self, url, meta='', force=False, timeout=None):
+        """
+        Fetch a page unless it is unchanged since the last run (see fetch())
+
+        Returns:
+            The requests.Response when the page changed, otherwise None
+
+        Raises:
+            requests.RequestException if the fetch failed
+        """
+        response, changed = self.fetch(url, meta, force, timeout)
+        return response if changed else None
+
+    def save(self):
+        """Atomically write the state next to the output it describes."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'pages': self.pages, 'groups': self.groups}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def print_requests(self):
+        print(f"Requests: {self.requests} ({self.not_modified} not modified)")
+
+
+def is_gone(error):
+    """True if a fetch failed because the page no longer exists (404, 410)"""
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code in GONE_STATUSES
+
+
+def load_output(path):
+    """
+    Load the previous output JSON, or an empty dict on the first run
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def diff_outputs(old, new):
+    """
+    Compare two output dictionaries
+
+    Returns:
+        Tuple of (added, removed, changed) key lists
+    """
+    added = [key for key in new if key not in old]
+    removed = [key for key in old if key not in new]
+    changed = [key for key in new if key in old and old[key] != new[key]]
+    return added, removed, changed
+
+
+def print_diff(added, removed, changed):
+    """Print a summary of the keys touched by an incremental run."""
+    print(f"\nIncremental update: {len(added)} added, {len(removed)} removed, {len(changed)} changed")
+    for label, keys in (('+', added), ('-', removed), ('~', changed)):
+        for key in keys:
+            print(f"  {label} {key}")
+
+
+def add_incremental_arguments(parser, state_path):
+    """
+    Add the incremental-mode options shared by every scraper's command line
+    """
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only re-scrape entries that changed since the last run and patch the output")
+    parser.add_argument('--state', default=state_path,
+                        help=f"Incremental state file (default: {state_path})")
+
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Streaming JSON helpers for the Nahj al-Balagha data pipeline
+NDJSON record streams written while a scrape runs, incremental writers
+that produce exactly what json.dump(..., indent=2) would, and a reader
+that walks a top-level object one member at a time
+"""
+
+import json
+import os
+import re
+import threading
+from contextlib import ExitStack
+
+from metrics import get_metrics
+
+
+def format_member(key, value, indent=2):
+    """
+    Text of one `"key": value` member of a top-level object, as json.dump writes it
+    """
+    if indent is None:
+        return json.dumps(key, ensure_ascii=False) + ':' + json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    pad = ' ' * indent
+    text = json.dumps(value, ensure_ascii=False, indent=indent)
+    return pad + json.dumps(key, ensure_ascii=False) + ': ' + text.replace('\n', '\n' + pad)
+
+
+class JsonObjectWriter:
+    """
+    Write a top-level JSON object one member at a time.
+
+    With indent=2 the file is byte-for-byte what json.dump(data, f,
+    ensure_ascii=False, indent=2) produces; with indent=None it is the
+    compact form. Keys must be unique.
+    """
+
+    def __init__(self, f, indent=2):
+        self.f = f
+        self.indent = indent
+        self.count = 0
+
+    def write(self, key, value):
+        self.write_member(format_member(key, value, self.indent))
+
+    def write_member(self, text):
+        """Write a member already formatted by format_member() with this writer's indent."""
+        if self.count:
+            self.f.write(',\n' if self.indent is not None else ',')
+        else:
+            self.f.write('{\n' if self.indent is not None else '{')
+        self.f.write(text)
+        self.count += 1
+
+    def close(self):
+        if not self.count:
+            self.f.write('{}')
+        else:
+            self.f.write('\n}' if self.indent is not None else '}')
+
+
+class NDJSONWriter:
+    """
+    Append one JSON line per record as soon as it is produced.
+
+    Each line is {"index": ..., "key": ..., "value": ...}; `index` is the
+    record's position in the final output, so records may be written in
+    any order (e.g. as concurrent fetches complete).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def write(self, index, key, value):
+        line = json.dumps({'index': index, 'key': key, 'value': value}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            self.count += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_ndjson(path):
+    """
+    Yield (index, key, value) records from an NDJSON stream
+
+    A torn final line (the writer is still running or crashed) is ignored.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            record = json.loads(line)
+            yield record['index'], record['key'], record['value']
+
+
+def finalize_ndjson(ndjson_path, json_path, compact=False, twin_path=None, twin_key=None, twin_value=None):
+    """
+    Turn an NDJSON stream into the usual {key: value} JSON file
+
+    Only line offsets are held in memory; values are read back one at a time.
+    As with a dict, a repeated key keeps the position of its lowest index and
+    the value of its highest.
+
+    With `twin_path`, a second file mapping twin_key(key) to twin_value(value)
+    (e.g. the cleaned output) is written in the same pass; keys that twin_key
+    merges follow the same dict rule.
+
+    Returns:
+        Number of keys written
+    """
+    first_index = {}
+    last_index = {}
+    last_offset = {}
+    with open(ndjson_path, 'rb') as f:
+        offset = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            record = json.loads(line)
+            key, index = record['key'], record['index']
+            if key not in first_index or index < first_index[key]:
+                first_index[key] = index
+            if key not in last_index or index >= last_index[key]:
+                last_index[key] = index
+                last_offset[key] = offset
+            offset += len(line)
+
+        def value_at(key):
+            f.seek(last_offset[key])
+            return json.loads(f.readline())['value']
+
+        keys = sorted(first_index, key=first_index.get)
+        indent = None if compact else 2
+        paths = [json_path]
+        if twin_path:
+            paths.append(twin_path)
+            # Like a dict: a twin key keeps its first position and takes the
+            # value of the last raw key that maps to it
+            sources = {}
+            for key in keys:
+                sources[twin_key(key)] = key
+
+        with get_metrics().timer('save') as sample, ExitStack() as stack:
+            writers = [JsonObjectWriter(stack.enter_context(open(path + '.tmp', 'w', encoding='utf-8')), indent)
+                       for path in paths]
+            written = set()
+            for key in keys:
+                value = value_at(key)
+                writers[0].write(key, value)
+                if twin_path:
+                    new_key = twin_key(key)
+                    if new_key not in written:
+                        written.add(new_key)
+                        source = sources[new_key]
+                        writers[1].write(new_key, twin_value(value if source == key else value_at(source)))
+            for writer in writers:
+                writer.close()
+            stack.close()
+            for path in paths:
+                os.replace(path + '.tmp', path)
+            sample.size = sum(os.path.getsize(path) for path in paths)
+    return len(first_index)
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Characters read from the file at a time by iter_object_members()
+READ_SIZE = 1 << 16
+
+
+class NotAnObject(ValueError):
+    """The JSON document's top-level value is not an object."""
+
+
+def iter_object_members(f, read_size=READ_SIZE):
+    """
+    Yield the (key, value) members of a top-level JSON object from a text file
+
+    Only the member being decoded is held in memory. Repeated keys are
+    yielded each time they occur, unlike json.load, which keeps the last.
+
+    Raises:
+        NotAnObject if the document is not an object
+        json.JSONDecodeError if it is malformed
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        # Read at least as much as is buffered, so a long value is re-decoded O(log n) times
+        data = f.read(max(read_size, len(buffer) - pos))
+        buffer = buffer[pos:] + data
+        pos = 0
+        eof = not data
+
+    def next_char():
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                raise json.JSONDecodeError("Unexpected end of document", buffer, pos)
+            read_more()
+
+    def decode():
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # A number at the very end of the buffer may continue in the next read
+                if end < len(buffer) or eof:
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            read_more()
+
+    def expect(char):
+        nonlocal pos
+        if next_char() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", buffer, pos)
+        pos += 1
+
+    if next_char() != '{':
+        raise NotAnObject("The top-level JSON value is not an object")
+    pos += 1
+    if next_char() == '}':
+        return
+    while True:
+        next_char()
+        key = decode()
+        if not isinstance(key, str):
+            raise json.JSONDecodeError("Expecting property name", buffer, pos)
+        expect(':')
+        next_char()
+        yield key, decode()
+        if next_char() == '}':
+            return
+        expect(',')
+
+
+def add_stream_arguments(parser, default_path):
+    """
+    Add the streaming-output options shared by every scraper's command line
+    """
+    parser.add_argument('--stream', nargs='?', const=default_path, default=None, metavar='PATH',
+                        help=f"Write each record to an NDJSON stream as soon as it is extracted "
+                             f"(default path: {default_path}) and build the JSON from it at the end")
+    parser.add_argument('--compact', action='store_true',
+                        help="With --stream, write the final JSON without indentation")
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Batched key transforms for the Nahj al-Balagha JSON files
+An ordered list of operations (delete, shift, rename, blank, merge) is
+composed into one mapping from the file's keys to the new ones, checked
+for collisions, and applied in a single streaming pass with an atomic
+write, so several renumbering fixes cost one rewrite and a failed plan
+leaves the file untouched
+"""
+
+import argparse
+import os
+import re
+from typing import NamedTuple
+
+from json_stream import JsonObjectWriter, iter_object_members
+from metrics import add_metrics_arguments, get_metrics, write_run_report
+from profiling import Profiler, add_profile_arguments, profiler_from_args
+
+# The number of a key is its first run of digits: "الخطبة55", "19", "الخطبة 3: ..."
+_NUMBER = re.compile(r'\d+')
+
+
+def key_number(key):
+    """The number in a key, or None"""
+    match = _NUMBER.search(key)
+    return int(match.group()) if match else None
+
+
+def renumber(key, number):
+    """The key with its number replaced"""
+    return _NUMBER.sub(str(number), key, count=1)
+
+
+def _matches(selector, key):
+    """An int selects keys by number, a string selects one exact key."""
+    if isinstance(selector, int):
+        return key_number(key) == selector
+    return key == selector
+
+
+def _select(entries, selectors):
+    return [key for key in entries if any(_matches(selector, key) for selector in selectors)]
+
+
+def _resolve(entries, selector):
+    """The one key a selector names, or None"""
+    keys = _select(entries, [selector])
+    if len(keys) > 1:
+        raise ValueError(f"{selector!r} matches several keys: {', '.join(keys)}")
+    return keys[0] if keys else None
+
+
+# A plan maps each new key, in output order, to an expression over the
+# original values: ('key', original), ('blank', expr) or ('merge', [expr, ...])
+
+class Delete(NamedTuple):
+    """Drop the selected keys"""
+    selectors: tuple
+
+    def apply(self, entries):
+        dropped = set(_select(entries, self.selectors))
+        return {key: expr for key, expr in entries.items() if key not in dropped}
+
+    def __str__(self):
+        return f"delete {_describe(self.selectors)}"
+
+
+class Shift(NamedTuple):
+    """Add `by` to the number of every key numbered start..end (end=None: no upper bound)"""
+    start: int
+    end: object
+    by: int
+
+    def apply(self, entries):
+        shifted = {}
+        for key, expr in entries.items():
+            number = key_number(key)
+            if number is not None and number >= self.start and (self.end is None or number <= self.end):
+                key = renumber(key, number + self.by)
+            _insert(shifted, key, expr, self)
+        return shifted
+
+    def __str__(self):
+        end = '' if self.end is None else f"-{self.end}"
+        return f"shift {self.start}{end} by {self.by:+d}"
+
+
+class Rename(NamedTuple):
+    """Give one key a new name, keeping its position"""
+    old: object
+    new: str
+
+    def apply(self, entries):
+        old = _resolve(entries, self.old)
+        if old is None:
+            return entries
+        renamed = {}
+        for key, expr in entries.items():
+            _insert(renamed, self.new if key == old else key, expr, self)
+        return renamed
+
+    def __str__(self):
+        return f"rename {self.old} to {self.new}"
+
+
+class Blank(NamedTuple):
+    """Keep the selected keys but empty their values"""
+    selectors: tuple
+
+    def apply(self, entries):
+        blanked = set(_select(entries, self.selectors))
+        return {key: ('blank', expr) if key in blanked else expr for key, expr in entries.items()}
+
+    def __str__(self):
+        return f"blank {_describe(self.selectors)}"
+
+
+class Merge(NamedTuple):
+    """
+    Append the values of the other keys to the first one's, in file order;
+    the first key keeps its name and position and the others are dropped
+    """
+    selectors: tuple
+
+    def apply(self, entries):
+        keys = [_resolve(entries, selector) for selector in self.selectors]
+        if keys[0] is None:
+            raise ValueError(f"{self}: {self.selectors[0]!r} not found")
+        parts = [key for key in entries if key in set(keys)]
+        if len(parts) < 2:
+            return entries
+        merged = ('merge', [entries[key] for key in parts])
+        return {key: merged if key == keys[0] else expr
+                for key, expr in entries.items() if key == keys[0] or key not in parts}
+
+    def __str__(self):
+        return f"merge {_describe(self.selectors)}"
+
+
+def _describe(selectors):
+    return ', '.join(str(selector) for selector in selectors)
+
+
+def _insert(entries, key, expr, operation):
+    if key in entries:
+        raise ValueError(f"{operation}: two keys would become {key!r}; use a merge to combine them")
+    entries[key] = expr
+
+
+def plan(keys, operations):
+    """
+    Compose the operations over a file's keys, in order
+
+    Returns:
+        Dictionary of new key -> expression, in output order
+
+    Raises:
+        ValueError if an operation would give two entries the same key
+    """
+    entries = {key: ('key', key) for key in keys}
+    for operation in operations:
+        entries = operation.apply(entries)
+    return entries
+
+
+def sources(expr):
+    """The original keys an expression reads"""
+    if expr[0] == 'key':
+        return [expr[1]]
+    if expr[0] == 'blank':
+        return sources(expr[1])
+    return [key for part in expr[1] for key in sources(part)]
+
+
+def empty_like(value):
+    """An empty value of the same JSON type ({} for anything that is not a string or list)"""
+    return type(value)() if isinstance(value, (str, list)) else {}
+
+
+def merge_values(values):
+    """
+    Combine values of the same type: texts are joined by a blank line,
+    lists are concatenated and objects are merged key by key
+    """
+    kinds = {type(value) for value in values}
+    if len(kinds) > 1:
+        raise ValueError(f"Cannot merge values of different types: {', '.join(kind.__name__ for kind in kinds)}")
+    first = values[0]
+    if isinstance(first, str):
+        return '\n\n'.join(value for value in values if value)
+    if isinstance(first, list):
+        return [item for value in values for item in value]
+    if isinstance(first, dict):
+        fields = {}
+        for value in values:
+            for field, item in value.items():
+                fields.setdefault(field, []).append(item)
+        return {field: merge_values(items) if len(items) > 1 else items[0] for field, items in fields.items()}
+    return values[-1]
+
+
+def evaluate(expr, values):
+    """The new value an expression describes, given the original values"""
+    if expr[0] == 'key':
+        return values[expr[1]]
+    if expr[0] == 'blank':
+        return empty_like(evaluate(expr[1], values))
+    return merge_values([evaluate(part, values) for part in expr[1]])
+
+
+def describe_plan(keys, entries):
+    """
+    One line per original key that the plan changes
+    """
+    fates = {}
+    for new_key, expr in entries.items():
+        merged = expr[0] == 'merge' or (expr[0] == 'blank' and expr[1][0] == 'merge')
+        for key in sources(expr):
+            fates[key] = (new_key, merged, _blanks(expr, key))
+    lines = []
+    for key in keys:
+        if key not in fates:
+            lines.append(f"❌ Removing: {key}")
+            continue
+        new_key, merged, blanked = fates[key]
+        if merged and new_key != key:
+            lines.append(f"🔗 Merging: {key} into {new_key}")
+        elif new_key != key:
+            lines.append(f"✏️  Renamed: {key} → {new_key}")
+        if blanked:
+            lines.append(f"⬜ Blanking: {new_key}")
+    return lines
+
+
+def _blanks(expr, key):
+    """Whether a blank in the expression empties the original key's value"""
+    if expr[0] == 'key':
+        return False
+    if expr[0] == 'blank':
+        return key in sources(expr[1])
+    return any(_blanks(part, key) for part in expr[1])
+
+
+def scan_keys(path):
+    """
+    The file's keys in json.load order, and the position of each key's last occurrence
+    """
+    last = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for position, (key, _) in enumerate(iter_object_members(f)):
+            last[key] = position
+    return list(last), last
+
+
+def transform_file(path, operations, output=None, dry_run=False, profiler=None):
+    """
+    Apply the operations to a JSON object file
+
+    The keys are read first and the whole plan is checked before anything
+    is written; the new file is then streamed member by member to a
+    temporary file and moved over `output` (default: `path`). Only entries
+    waiting for a later part of a merge are held in memory.
+
+    Returns:
+        (number of keys before, number after)
+    """
+    profiler = profiler or Profiler('key_transform')
+    output = output or path
+    with profiler.stage('load'):
+        keys, last = scan_keys(path)
+    entries = plan(keys, operations)
+    for line in describe_plan(keys, entries):
+        print(line)
+    if dry_run:
+        return len(keys), len(entries)
+
+    order = list(entries.items())
+    owner = {}
+    remaining = []
+    for index, (_, expr) in enumerate(order):
+        parts = sources(expr)
+        remaining.append(len(parts))
+        for key in parts:
+            owner[key] = index
+
+    tmp_path = output + '.tmp'
+    try:
+        with profiler.stage('save'), get_metrics().timer('save') as sample:
+            with open(path, 'r', encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as out:
+                writer = JsonObjectWriter(out)
+                values = {}
+                head = 0
+                for position, (key, value) in enumerate(iter_object_members(src)):
+                    # json.load keeps the last of repeated keys; deleted keys have no owner
+                    if last[key] != position or key not in owner:
+                        continue
+                    values[key] = value
+                    remaining[owner[key]] -= 1
+                    while head < len(order) and not remaining[head]:
+                        new_key, expr = order[head]
+                        writer.write(new_key, evaluate(expr, values))
+                        for part in sources(expr):
+                            del values[part]
+                        head += 1
+                writer.close()
+            os.replace(tmp_path, output)
+            sample.size = os.path.getsize(output)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(keys), len(entries)
+
+
+def _selectors(text):
+    """Parse "19,35,40-45,الخطبة7" into selectors; a range is expanded into numbers"""
+    selectors = []
+    for item in text.split(','):
+        item = item.strip()
+        if re.fullmatch(r'\d+-\d+', item):
+            start, end = map(int, item.split('-'))
+            selectors.extend(range(start, end + 1))
+        else:
+            selectors.append(int(item) if item.isdigit() else item)
+    return tuple(selectors)
+
+
+def _shift(text):
+    """Parse "START[-END]:BY", e.g. "55:-1" or "130-149:+1" """
+    match = re.fullmatch(r'(\d+)(?:-(\d+))?:([+-]?\d+)', text.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected START[-END]:BY, got {text!r}")
+    start, end, by = match.groups()
+    return Shift(int(start), int(end) if end else None, int(by))
+
+
+def _rename(text):
+    """Parse "OLD=NEW" """
+    old, sep, new = text.partition('=')
+    if not sep or not old or not new:
+        raise argparse.ArgumentTypeError(f"expected OLD=NEW, got {text!r}")
+    return Rename(int(old) if old.isdigit() else old, new)
+
+
+def add_transform_arguments(parser, default_input):
+    """
+    Add the input and run options shared by the transform scripts
+    """
+    parser.add_argument('input_file', nargs='?', default=default_input,
+                        help=f"JSON file to transform (default: {default_input})")
+    parser.add_argument('--output', default=None,
+                        help="Write the result here instead of replacing the input")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Print the key mapping without writing anything")
+    add_profile_arguments(parser)
+
+
+def run_transform(args, operations, name):
+    """
+    Apply operations with the add_transform_arguments() options and report the run
+    """
+    profiler = profiler_from_args(args, name)
+    try:
+        before, after = transform_file(args.input_file, operations, args.output, args.dry_run, profiler)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}; {args.input_file} was not changed")
+    if args.dry_run:
+        print(f"\n🔍 Dry run, nothing written: {before} keys would become {after}")
+    else:
+        print(f"\n✅ Done! Total keys: {after}")
+        print(f"📊 Original count: {before}")
+        print(f"📊 New count: {after}")
+    write_run_report(args)
+    profiler.finish()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Apply delete, shift, rename, blank and merge operations to a JSON file's keys in one pass. "
+                    "Operations run in the order given, each on the keys the previous ones produced.")
+    parser.add_argument('--delete', dest='operations', action='append', type=lambda text: Delete(_selectors(text)),
+                        metavar='KEYS', help="Drop keys, e.g. 54 or 19,35,40-45")
+    parser.add_argument('--shift', dest='operations', action='append', type=_shift,
+                        metavar='START[-END]:BY', help="Renumber keys from START (to END), e.g. 55:-1")
+    parser.add_argument('--rename', dest='operations', action='append', type=_rename,
+                        metavar='OLD=NEW', help="Rename one key")
+    parser.add_argument('--blank', dest='operations', action='append', type=lambda text: Blank(_selectors(text)),
+                        metavar='KEYS', help="Empty the values of keys, e.g. 19,35")
+    parser.add_argument('--merge', dest='operations', action='append', type=lambda text: Merge(_selectors(text)),
+                        metavar='KEY,KEY...', help="Append the later keys' values to the first key's, e.g. 54,55")
+    add_transform_arguments(parser, 'all_explanations.json')
+    add_metrics_arguments(parser, 'key_transform')
+    args = parser.parse_args()
+    if not args.operations:
+        parser.error("no operations given")
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    print("Operations:")
+    for operation in args.operations:
+        print(f"  {operation}")
+    print()
+    run_transform(args, args.operations, 'key_transform')
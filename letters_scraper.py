@@ -5,37 +5,36 @@ Extracts titles and content to generate a JSON file.
 Target URL: https://www.imamali.net/?id=13452
 """
 
-import requests
 from bs4 import BeautifulSoup
-import json
-import time
 from urllib.parse import urljoin
 
+import list_scraper
+from fast_extract import extract_content_text, extract_list_items, get_backend
+from metrics import timed
+
 # Base URL for the website
 BASE_URL = "https://www.imamali.net/"
 START_URL = "https://www.imamali.net/?id=13452"
 
+# Content area classes, in the order they are tried
+CONTENT_CLASSES = ('AKD-SiraBodyTx_', 'AKD-TextContent')
+
 def get_page_content(url):
     """
-    Fetch page content with proper headers
+    Fetch page content through the shared pooled, retrying client
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-    }
-    
-    try:
-        response = requests.get(url, headers=headers, timeout=15)
-        response.encoding = 'utf-8'  # Ensure proper encoding for Arabic text
-        response.raise_for_status()
-        return response.text
-    except requests.RequestException as e:
-        print(f"Error fetching {url}: {e}")
-        return None
+    return list_scraper.get_page_content(url, timeout=15)
 
-def extract_list(html_content):
+@timed('extract')
+def extract_list(html_content, backend=None):
     """
     Extract list of items with their titles and links
     """
+    if (backend or get_backend()) == 'lxml':
+        items = extract_list_items(html_content, BASE_URL, default_title="Unknown Title")
+        if items is not None:
+            return items
+    
     soup = BeautifulSoup(html_content, 'html.parser')
     items = []
     
@@ -72,10 +71,16 @@ def extract_list(html_content):
 
     return items
 
-def extract_content(html_content):
+@timed('extract')
+def extract_content(html_content, backend=None):
     """
     Extract the main content/text from a detail page
     """
+    if (backend or get_backend()) == 'lxml':
+        text = extract_content_text(html_content, CONTENT_CLASSES)
+        if text is not None:
+            return text
+    
     soup = BeautifulSoup(html_content, 'html.parser')
     
     # Find the main content area
@@ -100,48 +105,26 @@ def extract_content(html_content):
         
     return ""
 
-def scrape_items(start_url):
-    print(f"Starting scraper for: {start_url}")
-    
-    html_content = get_page_content(start_url)
-    if not html_content:
-        print("Failed to fetch the main page")
-        return {}
-    
-    items = extract_list(html_content)
-    print(f"Found {len(items)} items")
-    
-    results = {}
-    
-    for i, item in enumerate(items, 1):
-        print(f"Scraping item {i}/{len(items)}: {item['title']}")
-        
-        item_html = get_page_content(item['url'])
-        if not item_html:
-            print(f"  Failed to fetch item page")
-            continue
-        
-        content = extract_content(item_html)
-        
-        # Structure matches the previous scraper output format
-        results[item['title']] = {
-            'text': content,
-            'notes': []
-        }
-        
-        time.sleep(1) # Be polite
-    
-    return results
+def fetch_item_page(url):
+    """
+    Fetch the raw bytes of one detail page (None if the fetch failed)
+    """
+    return list_scraper.fetch_page(url, timeout=15)
 
-def save_to_json(data, filename='letters_output.json'):
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"\nData saved to {filename}")
-    print(f"Total items scraped: {len(data)}")
+def parse_item_page(page, backend=None):
+    """
+    Decode a fetched detail page and extract its content
+    Runs in a parser process, so the backend is passed in explicitly.
+    """
+    return extract_content(page.decode('utf-8', errors='replace'), backend)
+
+# Scraping, saving and the command line are shared with the other list scraper
+SCRAPER = list_scraper.ListScraper('letters_scraper', START_URL, extract_list, parse_item_page,
+                                   'assets/letters_output.json', noun='item', timeout=15)
+
+scrape_items = SCRAPER.scrape
+scrape_items_incremental = SCRAPER.scrape_incremental
+save_to_json = SCRAPER.save_to_json
 
 if __name__ == "__main__":
-    data = scrape_items(START_URL)
-    if data:
-        save_to_json(data, 'assets/letters_output.json')
-    else:
-        print("No data was scraped")
+    SCRAPER.main(SCRAPER.parse_args("Scrape Nahj al-Balagha letters from imamali.net"))
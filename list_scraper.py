@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Shared driver of the imamali.net list scrapers
+scraper.py (sermons) and letters_scraper.py (letters/sayings) scrape a list
+page and its detail pages the same way; each describes its site with a
+ListScraper and keeps only its own extraction code.
+"""
+
+import argparse
+import json
+import os
+from functools import partial
+
+import requests
+
+from cleaning_rules import clean_text, clean_value, cleaned_path, save_cleaned_json
+from checkpoint import add_journal_arguments, open_journal
+from fast_extract import add_backend_arguments, get_backend, set_backend
+from fetch_engine import (DEFAULT_CONCURRENCY, DEFAULT_MAX_RATE, DEFAULT_PARSE_WORKERS, DEFAULT_RATE,
+                          adaptive_limiter, fetch_all)
+from http_client import add_client_arguments, configure_from_args, get_client
+from incremental import (IncrementalState, add_incremental_arguments, content_hash,
+                         diff_outputs, load_output, print_diff)
+from json_stream import NDJSONWriter, add_stream_arguments, finalize_ndjson
+from metrics import add_metrics_arguments, get_metrics, write_run_report
+from profiling import add_profile_arguments, profiler_from_args
+
+
+def get_page_content(url, timeout=10):
+    """
+    Fetch page content through the shared pooled, retrying client
+    """
+    try:
+        response = get_client().get(url, timeout=timeout)
+        response.encoding = 'utf-8'  # Ensure proper encoding for Arabic text
+        return response.text
+    except requests.RequestException as e:
+        print(f"Error fetching {url}: {e}")
+        return None
+
+
+def fetch_page(url, timeout=10):
+    """
+    Fetch the raw bytes of one detail page (None if the fetch failed)
+    """
+    try:
+        return get_client().get(url, timeout=timeout).content
+    except requests.RequestException as e:
+        print(f"Error fetching {url}: {e}")
+        return None
+
+
+class ListScraper:
+    """
+    A list page of imamali.net and its detail pages
+
+    `extract_list` turns the list page into [{'title', 'url'}] and
+    `parse_page(page, backend)` turns the bytes of a detail page into its
+    text; it must be a module-level function, since it runs in the parser
+    processes. Results are written to `output` (e.g. assets/scraped_output.json),
+    and the journal, state and stream files default to its siblings.
+    """
+
+    def __init__(self, name, start_url, extract_list, parse_page, output, noun='item', timeout=10):
+        self.name = name
+        self.start_url = start_url
+        self.extract_list = extract_list
+        self.parse_page = parse_page
+        self.output = output
+        self.noun = noun
+        self.timeout = timeout
+
+    @property
+    def plural(self):
+        return self.noun + 's'
+
+    def get_page_content(self, url):
+        return get_page_content(url, self.timeout)
+
+    def fetch_page(self, url):
+        return fetch_page(url, self.timeout)
+
+    def scrape(self, start_url, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, journal=None,
+               writer=None, parse_workers=DEFAULT_PARSE_WORKERS, max_rate=DEFAULT_MAX_RATE):
+        """
+        Scrape every entry of the list page, in list order
+        Detail pages are fetched concurrently (starting at `rate` requests per
+        second to the host, adapting to its health up to `max_rate`) and
+        parsed by `parse_workers` processes while the next pages download.
+        With a journal, every extracted entry is checkpointed as it completes
+        and entries already in the journal are not fetched again.
+        With an NDJSONWriter, entries are written as they are extracted and an
+        empty dictionary is returned.
+        """
+        print(f"Starting scraper for: {start_url}")
+
+        html_content = self.get_page_content(start_url)
+        if not html_content:
+            print("Failed to fetch the main page")
+            return {}
+
+        items = self.extract_list(html_content)
+        print(f"Found {len(items)} {self.plural}")
+
+        # Skip entries completed by a previous, interrupted run
+        pending = [item for item in items if not (journal and item['url'] in journal)]
+        if len(pending) < len(items):
+            print(f"Skipping {len(items) - len(pending)} {self.plural} already in the journal")
+
+        positions = {item['url']: index for index, item in enumerate(items)}
+        def store(pending_index, url, content):
+            if content is None:
+                return None
+            if journal is not None:
+                journal.record(url, content)
+            if writer is None:
+                return content
+            # Streamed straight to the output instead of being kept in memory
+            index = positions[url]
+            writer.write(index, items[index]['title'], {'text': content, 'notes': []})
+            return True
+
+        # Starts at `rate` and adapts to the server's health, never above `max_rate`
+        limiter = adaptive_limiter(get_client(), rate, max_rate)
+
+        done = 0
+        def report(index, url, content):
+            nonlocal done
+            done += 1
+            status = "" if content is not None else " (failed)"
+            print(f"Scraped {self.noun} {done}/{len(pending)}: {pending[index]['title']}{status} "
+                  f"[{limiter.rate_for(url):.1f} req/s]")
+
+        contents = fetch_all([item['url'] for item in pending], self.fetch_page,
+                             concurrency=concurrency, limiter=limiter, on_result=report,
+                             parse=partial(self.parse_page, backend=get_backend()),
+                             parse_workers=parse_workers, store=store)
+        scraped = dict(zip((item['url'] for item in pending), contents))
+
+        # Assemble the results in list order
+        results = {}
+        for index, item in enumerate(items):
+            if item['url'] in scraped:
+                content = scraped[item['url']]
+            else:
+                content = journal.get(item['url']) if journal else None
+            if content is None:
+                print(f"  Failed to fetch {self.noun} page: {item['title']}")
+                continue
+            if writer is not None:
+                # Entries restored from the journal still need to reach the stream
+                if content is not True:
+                    writer.write(index, item['title'], {'text': content, 'notes': []})
+                continue
+
+            results[item['title']] = {
+                'text': content,
+                'notes': []
+            }
+
+        return results
+
+    def scrape_incremental(self, start_url, existing, state, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                           parse_workers=DEFAULT_PARSE_WORKERS, max_rate=DEFAULT_MAX_RATE):
+        """
+        Re-scrape only the entries that changed since the last run
+        An entry is re-extracted when its list entry (title/URL) changed or its
+        page no longer revalidates; every other entry keeps its existing value.
+        Returns the patched dictionary, in list order.
+        """
+        print(f"Starting incremental scrape for: {start_url}")
+
+        html_content = self.get_page_content(start_url)
+        if not html_content:
+            print("Failed to fetch the main page")
+            return existing
+
+        items = self.extract_list(html_content)
+        print(f"Found {len(items)} {self.plural}")
+
+        meta = {item['url']: content_hash(item['title'], item['url']) for item in items}
+        missing = {item['url'] for item in items if item['title'] not in existing}
+        failed = set()
+        limiter = adaptive_limiter(get_client(), rate, max_rate)
+
+        def fetch_if_changed(url):
+            try:
+                response = state.fetch_if_changed(url, meta[url], force=url in missing, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"Error fetching {url}: {e}")
+                failed.add(url)
+                return None
+            if response is None:
+                return None
+            return response.content
+
+        contents = fetch_all([item['url'] for item in items], fetch_if_changed,
+                             concurrency=concurrency, limiter=limiter,
+                             parse=partial(self.parse_page, backend=get_backend()),
+                             parse_workers=parse_workers)
+
+        # Patch only the changed entries; keep everything else as it was
+        results = {}
+        for item, content in zip(items, contents):
+            if content is not None:
+                results[item['title']] = {'text': content, 'notes': []}
+            elif item['title'] in existing:
+                results[item['title']] = existing[item['title']]
+            elif item['url'] in failed:
+                print(f"  Failed to fetch {self.noun} page: {item['title']}")
+
+        state.print_requests()
+        return results
+
+    def save_to_json(self, data, filename=None, clean=True):
+        """
+        Save scraped data to JSON file with proper UTF-8 encoding, and its
+        cleaned twin (footnote references removed) from the same records
+        """
+        filename = filename or self.output
+        with get_metrics().timer('save') as sample:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            sample.size = os.path.getsize(filename)
+
+        print(f"\nData saved to {filename}")
+        if clean:
+            save_cleaned_json(data, cleaned_path(filename))
+            print(f"Cleaned data saved to {cleaned_path(filename)}")
+        print(f"Total {self.plural} scraped: {len(data)}")
+
+    def parse_args(self, description):
+        parser = argparse.ArgumentParser(description=description)
+        parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                            help=f"Maximum pages fetched at once (default: {DEFAULT_CONCURRENCY})")
+        parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                            help=f"Starting requests per second to the host (default: {DEFAULT_RATE})")
+        parser.add_argument('--max-rate', type=float, default=DEFAULT_MAX_RATE,
+                            help=f"Ceiling for the adaptive request rate (default: {DEFAULT_MAX_RATE})")
+        parser.add_argument('--parse-workers', type=int, default=DEFAULT_PARSE_WORKERS,
+                            help=f"Parser processes; 0 parses in the fetching threads (default: {DEFAULT_PARSE_WORKERS})")
+        base = os.path.splitext(self.output)[0]
+        add_client_arguments(parser)
+        add_journal_arguments(parser, base + '.journal')
+        add_incremental_arguments(parser, base + '.state.json')
+        add_stream_arguments(parser, base + '.ndjson')
+        add_backend_arguments(parser)
+        add_profile_arguments(parser)
+        add_metrics_arguments(parser, self.name)
+        return parser.parse_args()
+
+    def main(self, args):
+        """
+        Run the scraper as its script does: incremental, streamed or in one pass
+        """
+        configure_from_args(args)
+        set_backend(args.parser)
+        profiler = profiler_from_args(args, self.name)
+        options = dict(concurrency=args.concurrency, rate=args.rate, max_rate=args.max_rate,
+                       parse_workers=args.parse_workers)
+
+        if args.incremental:
+            # Refetch only what changed and patch the existing output
+            existing = load_output(self.output)
+            state = IncrementalState(args.state)
+            with profiler.stage('scrape'):
+                data = self.scrape_incremental(self.start_url, existing, state, **options)
+            added, removed, changed = diff_outputs(existing, data)
+            print_diff(added, removed, changed)
+            if added or removed or changed:
+                with profiler.stage('save'):
+                    self.save_to_json(data)
+            state.save()
+        elif args.stream:
+            # Emit each entry as soon as it is extracted, then build the JSON from the stream
+            with open_journal(args) as journal, NDJSONWriter(args.stream) as writer, profiler.stage('scrape'):
+                self.scrape(self.start_url, journal=journal, writer=writer, **options)
+            if writer.count:
+                with profiler.stage('save'):
+                    total = finalize_ndjson(args.stream, self.output, compact=args.compact,
+                                            twin_path=cleaned_path(self.output),
+                                            twin_key=clean_text, twin_value=clean_value)
+                print(f"\nData saved to {self.output}")
+                print(f"Cleaned data saved to {cleaned_path(self.output)}")
+                print(f"Total {self.plural} scraped: {total}")
+                journal.discard()
+            else:
+                print("No data was scraped")
+        else:
+            # Scrape every entry, checkpointing each one as it completes
+            with open_journal(args) as journal, profiler.stage('scrape'):
+                data = self.scrape(self.start_url, journal=journal, **options)
+
+            # The run is complete so the journal is no longer needed
+            if data:
+                with profiler.stage('save'):
+                    self.save_to_json(data)
+                journal.discard()
+            else:
+                print("No data was scraped")
+
+        get_client().print_stats()
+        write_run_report(args)
+        profiler.finish()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Run metrics for the Nahj al-Balagha pipeline
+Records how many items, bytes and seconds each stage (fetch, parse,
+extract, clean, save) took, overall and per host, and writes a JSON run
+report and a Prometheus text-format file at the end of a run
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+DEFAULT_REPORT_DIR = 'reports'
+
+
+def percentile(sorted_values, q):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 1))
+    return sorted_values[int(rank) - 1]
+
+
+def timed_call(func, *args):
+    """
+    Run func(*args) and return (result, seconds)
+
+    Module-level so it can be sent to a worker process, where the caller's
+    Metrics are out of reach; the caller records the returned time.
+    """
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+class StageStats:
+    """
+    Counts, bytes, errors and latency samples of one stage on one host
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.errors = 0
+        self.latencies = []
+
+    def add(self, seconds, size, error):
+        self.count += 1
+        self.bytes += size
+        self.errors += int(error)
+        self.latencies.append(seconds)
+
+    def merge(self, other):
+        self.count += other.count
+        self.bytes += other.bytes
+        self.errors += other.errors
+        self.latencies.extend(other.latencies)
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        summary = {
+            'count': self.count,
+            'bytes': self.bytes,
+            'errors': self.errors,
+            'seconds': round(sum(latencies), 6),
+        }
+        for q in QUANTILES:
+            summary[f'p{round(q * 100)}'] = round(percentile(latencies, q), 6)
+        return summary
+
+
+class Sample:
+    """Handle yielded by Metrics.timer(); set `size` or `error` before the block ends."""
+
+    def __init__(self):
+        self.size = 0
+        self.error = False
+
+
+class Metrics:
+    """
+    Thread-safe collector of per-stage, per-host measurements for one run
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._started = time.monotonic()
+        self.stages = {}  # (stage, host or None) -> StageStats
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, size=0, host=None, error=False):
+        """Add one measurement of `stage`."""
+        with self._lock:
+            stats = self.stages.get((stage, host))
+            if stats is None:
+                stats = self.stages[stage, host] = StageStats()
+            stats.add(seconds, size, error)
+
+    @contextmanager
+    def timer(self, stage, host=None):
+        """
+        Time the body of a with-block as one measurement of `stage`
+
+        An exception escaping the block is counted as an error and re-raised.
+        """
+        sample = Sample()
+        started = time.perf_counter()
+        try:
+            yield sample
+        except BaseException:
+            sample.error = True
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - started, sample.size, host, sample.error)
+
+    def report(self, name):
+        """
+        The run report as a JSON-serialisable dictionary
+        """
+        with self._lock:
+            items = sorted(self.stages.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+        stages = {}
+        for (stage, host), stats in items:
+            entry = stages.setdefault(stage, {'total': StageStats(), 'hosts': {}})
+            entry['total'].merge(stats)
+            if host is not None:
+                entry['hosts'][host] = stats.summary()
+        return {
+            'script': name,
+            'started': datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            'duration_seconds': round(time.monotonic() - self._started, 3),
+            'stages': {
+                stage: {**entry['total'].summary(), 'hosts': entry['hosts']}
+                for stage, entry in stages.items()
+            },
+        }
+
+    def prometheus(self, name):
+        """
+        The run's measurements in Prometheus text exposition format
+        """
+        with self._lock:
+            items = sorted(self.stages.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+        lines = [
+            '# HELP nahj_run_duration_seconds Wall time of the run.',
+            '# TYPE nahj_run_duration_seconds gauge',
+            f'nahj_run_duration_seconds{{script="{name}"}} {time.monotonic() - self._started:.3f}',
+            '# HELP nahj_stage_seconds Time spent per item in each pipeline stage.',
+            '# TYPE nahj_stage_seconds summary',
+        ]
+        counters = []
+        for (stage, host), stats in items:
+            labels = f'script="{name}",stage="{stage}"'
+            if host is not None:
+                labels += f',host="{host}"'
+            latencies = sorted(stats.latencies)
+            for q in QUANTILES:
+                lines.append(f'nahj_stage_seconds{{{labels},quantile="{q}"}} {percentile(latencies, q):.6f}')
+            lines.append(f'nahj_stage_seconds_sum{{{labels}}} {sum(latencies):.6f}')
+            lines.append(f'nahj_stage_seconds_count{{{labels}}} {stats.count}')
+            counters.append((labels, stats))
+        lines += ['# HELP nahj_stage_bytes_total Bytes handled by each pipeline stage.',
+                  '# TYPE nahj_stage_bytes_total counter']
+        lines += [f'nahj_stage_bytes_total{{{labels}}} {stats.bytes}' for labels, stats in counters]
+        lines += ['# HELP nahj_stage_errors_total Failed items in each pipeline stage.',
+                  '# TYPE nahj_stage_errors_total counter']
+        lines += [f'nahj_stage_errors_total{{{labels}}} {stats.errors}' for labels, stats in counters]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, prefix, name=None):
+        """
+        Write PREFIX.json and PREFIX.prom
+
+        Returns:
+            The paths written
+        """
+        name = name or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        json_path, prom_path = prefix + '.json', prefix + '.prom'
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(name), f, ensure_ascii=False, indent=2)
+        with open(prom_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus(name))
+        return json_path, prom_path
+
+    def print_summary(self):
+        """Print one line per stage: count, bytes and latency percentiles."""
+        stages = self.report('')['stages']
+        if not stages:
+            return
+        print("\nStages:")
+        for stage, summary in stages.items():
+            print(f"  {stage}: {summary['count']} items, {summary['bytes'] / 1024:.0f} KiB, "
+                  f"{summary['seconds']:.2f}s total, p50 {summary['p50'] * 1000:.0f} ms, "
+                  f"p95 {summary['p95'] * 1000:.0f} ms, p99 {summary['p99'] * 1000:.0f} ms")
+
+
+_metrics = Metrics()
+
+
+def timed(stage):
+    """
+    Decorator recording each call as one measurement of `stage`, sized by
+    the length of its first argument (the page or text being processed)
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _metrics.timer(stage) as sample:
+                if args and isinstance(args[0], (str, bytes)):
+                    sample.size = len(args[0])
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def get_metrics():
+    """
+    Return the process-wide Metrics
+    """
+    return _metrics
+
+
+def add_metrics_arguments(parser, name):
+    """
+    Add the run-report options shared by every entry point's command line
+    """
+    default_prefix = os.path.join(DEFAULT_REPORT_DIR, name)
+    parser.add_argument('--metrics', default=default_prefix, metavar='PREFIX',
+                        help=f"Write the run report to PREFIX.json and Prometheus metrics to PREFIX.prom "
+                             f"(default: {default_prefix})")
+    parser.add_argument('--no-metrics', action='store_true',
+                        help="Do not write a run report")
+
+
+def write_run_report(args):
+    """
+    Print the stage summary and write the report chosen by add_metrics_arguments() options
+    """
+    metrics = get_metrics()
+    metrics.print_summary()
+    if args.no_metrics:
+        return
+    json_path, prom_path = metrics.write(args.metrics)
+    print(f"Run report: {json_path}, {prom_path}")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Optional CPU and memory profiling for the Nahj al-Balagha scripts
+With --profile, each stage of a run is profiled with cProfile (including
+threads started during the stage) and traced with tracemalloc; without it
+every stage() is a no-op context manager and no tracing is started
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+DEFAULT_PROFILE_DIR = 'profiles'
+
+# From Python 3.12 cProfile is built on sys.monitoring: one profiler sees
+# every thread, and a second one cannot be enabled while it runs
+PROFILES_ALL_THREADS = sys.version_info >= (3, 12)
+DEFAULT_TOP = 25
+
+
+def peak_rss_kib():
+    """
+    Peak resident set size of this process and of its finished children
+    (e.g. parser workers), in KiB, or None where the platform cannot tell
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1024 if sys.platform == 'darwin' else 1
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+    return own, children
+
+
+class Profiler:
+    """
+    Per-stage cProfile statistics and tracemalloc snapshots for one run.
+
+    Each `with profiler.stage(name):` block writes NAME.STAGE.pstats (open it
+    with `python -m pstats` or snakeviz) and adds the stage's traced peak and
+    top allocation sites to NAME.memory.txt. Threads started during a stage
+    are profiled until it ends (on Python 3.12+, every thread is). Worker
+    processes are not profiled; run with --parse-workers 0 to include parsing.
+    """
+
+    def __init__(self, name, directory=None, top=DEFAULT_TOP):
+        self.name = name
+        self.directory = directory
+        self.top = top
+        self.enabled = directory is not None
+        self._report = []
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+            tracemalloc.start()
+
+    def stage(self, stage):
+        """
+        Context manager profiling one stage, or a no-op when profiling is off
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self._profile(stage)
+
+    @contextmanager
+    def _profile(self, stage):
+        profiles = [cProfile.Profile()]
+        stopped = threading.Event()
+        local = threading.local()
+
+        def profile_thread(frame, event, arg):
+            # Runs once in each thread started during the stage, then hands over to cProfile
+            local.profile = cProfile.Profile()
+            profiles.append(local.profile)
+            local.profile.enable()
+
+        def stop_thread(frame, event, arg):
+            # A thread's profiler can only be removed from that thread: pool
+            # threads that outlive the stage do it at their next call after it
+            if stopped.is_set():
+                sys.settrace(None)
+                if getattr(local, 'profile', None) is not None:
+                    local.profile.disable()
+                    local.profile = None
+
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        if not PROFILES_ALL_THREADS:
+            threading.setprofile(profile_thread)
+            threading.settrace(stop_thread)
+        profiles[0].enable()
+        try:
+            yield
+        finally:
+            profiles[0].disable()
+            if not PROFILES_ALL_THREADS:
+                threading.setprofile(None)
+                threading.settrace(None)
+                stopped.set()
+            elapsed = time.perf_counter() - started
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+                tracemalloc.Filter(False, __file__),
+            ))
+
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                try:
+                    stats.add(profile)
+                except TypeError:  # A thread that never made a call
+                    pass
+            path = os.path.join(self.directory, f"{self.name}.{stage}.pstats")
+            stats.dump_stats(path)
+
+            lines = [f"== {stage}: {elapsed:.2f}s, {len(profiles) - 1} threads profiled, "
+                     f"traced peak {peak / 2**20:.1f} MiB, still allocated {current / 2**20:.1f} MiB",
+                     f"Top {self.top} allocation sites still alive at the end of the stage:"]
+            for statistic in snapshot.statistics('lineno')[:self.top]:
+                lines.append(f"  {statistic.size / 1024:10.1f} KiB {statistic.count:8d} blocks  "
+                             f"{statistic.traceback[0]}")
+            self._report.append('\n'.join(lines))
+            print(f"🔬 Profiled {stage}: {elapsed:.2f}s, traced peak {peak / 2**20:.1f} MiB -> {path}")
+
+    def finish(self):
+        """
+        Write the memory report and print peak RSS; a no-op when profiling is off
+        """
+        if not self.enabled:
+            return
+        rss = peak_rss_kib()
+        if rss is not None:
+            summary = f"Peak RSS: {rss[0] / 1024:.1f} MiB (worker processes: {rss[1] / 1024:.1f} MiB)"
+        else:
+            summary = "Peak RSS: not available on this platform"
+        path = os.path.join(self.directory, f"{self.name}.memory.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(self._report + [summary]) + '\n')
+        tracemalloc.stop()
+        print(f"🔬 {summary}; memory report -> {path}")
+
+
+def add_profile_arguments(parser):
+    """
+    Add the profiling options shared by every entry point's command line
+    """
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_PROFILE_DIR, default=None, metavar='DIR',
+                        help=f"Write per-stage cProfile stats, tracemalloc top allocations and peak RSS "
+                             f"to DIR (default: {DEFAULT_PROFILE_DIR})")
+    parser.add_argument('--profile-top', type=int, default=DEFAULT_TOP, metavar='N',
+                        help=f"Allocation sites listed per stage with --profile (default: {DEFAULT_TOP})")
+
+
+def profiler_from_args(args, name):
+    """
+    Profiler configured by add_profile_arguments() options (disabled without --profile)
+    """
+    return Profiler(name, args.profile, args.profile_top)
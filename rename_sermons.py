@@ -1,35 +1,25 @@
-import json
+#!/usr/bin/env python3
+"""
+Remove explanation 54 and move 55 onwards down by one
+"""
 
-# Read the JSON data
-with open('all_explanations.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+import argparse
 
-# Create new dictionary with renamed keys
-new_data = {}
+from key_transform import Delete, Shift, add_transform_arguments, run_transform
+from metrics import add_metrics_arguments
 
-for key, value in data.items():
-    # Extract the sermon number
-    sermon_num = int(key.replace('الخطبة', ''))
-    
-    # If sermon number is 54, skip it (remove it)
-    if sermon_num == 54:
-        print(f"❌ Removing: {key}")
-        continue
-    
-    # If sermon number is 55 or higher, decrement by 1
-    if sermon_num >= 55:
-        new_sermon_num = sermon_num - 1
-        new_key = f"الخطبة{new_sermon_num}"
-        new_data[new_key] = value
-        print(f"✏️  Renamed: {key} → {new_key}")
-    else:
-        # Keep sermons 1-53 as is
-        new_data[key] = value
+OPERATIONS = [
+    Delete((54,)),      # Remove sermon 54
+    Shift(55, None, -1),  # Sermons 55 and higher are decremented by 1
+]
 
-# Save the updated data
-with open('all_explanations.json', 'w', encoding='utf-8') as f:
-    json.dump(new_data, f, ensure_ascii=False, indent=2)
 
-print(f"\n✅ Done! Total sermons: {len(new_data)}")
-print(f"📊 Original count: {len(data)}")
-print(f"📊 New count: {len(new_data)}")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Remove explanation 54 and renumber the ones after it")
+    add_transform_arguments(parser, 'all_explanations.json')
+    add_metrics_arguments(parser, 'rename_sermons')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    run_transform(parse_args(), OPERATIONS, 'rename_sermons')
@@ -4,37 +4,36 @@ Web scraper for Nahj al-Balagha from imamali.net
 Extracts sermon titles and content to generate a JSON file
 """
 
-import requests
 from bs4 import BeautifulSoup
-import json
-import time
 from urllib.parse import urljoin
 
+import list_scraper
+from fast_extract import extract_content_text, extract_list_items, get_backend
+from metrics import timed
+
 # Base URL for the website
 BASE_URL = "https://www.imamali.net/"
 START_URL = "https://www.imamali.net/?id=13446"
 
+# Content area classes, in the order they are tried
+CONTENT_CLASSES = ('AKD-SiraBodyTx_', 'AKD-TextContent')
+
 def get_page_content(url):
     """
-    Fetch page content with proper headers
+    Fetch page content through the shared pooled, retrying client
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.encoding = 'utf-8'  # Ensure proper encoding for Arabic text
-        response.raise_for_status()
-        return response.text
-    except requests.RequestException as e:
-        print(f"Error fetching {url}: {e}")
-        return None
+    return list_scraper.get_page_content(url, timeout=10)
 
-def extract_sermon_list(html_content):
+@timed('extract')
+def extract_sermon_list(html_content, backend=None):
     """
     Extract list of sermons with their titles and links
     """
+    if (backend or get_backend()) == 'lxml':
+        sermons = extract_list_items(html_content, BASE_URL)
+        if sermons is not None:
+            return sermons
+    
     soup = BeautifulSoup(html_content, 'html.parser')
     sermons = []
     
@@ -66,10 +65,18 @@ def extract_sermon_list(html_content):
     
     return sermons
 
-def extract_sermon_content(html_content):
+@timed('extract')
+def extract_sermon_content(html_content, backend=None):
     """
     Extract the main content/text from a sermon page
+    The lxml backend parses only the content subtree; pages it cannot
+    handle identically fall through to BeautifulSoup
     """
+    if (backend or get_backend()) == 'lxml':
+        text = extract_content_text(html_content, CONTENT_CLASSES)
+        if text is not None:
+            return text
+    
     soup = BeautifulSoup(html_content, 'html.parser')
     
     # Find the main content area with the correct class
@@ -98,65 +105,26 @@ def extract_sermon_content(html_content):
     # This prevents getting unwanted content from the page
     return ""
 
-def scrape_sermons(start_url):
+def fetch_sermon_page(url):
     """
-    Main scraping function
+    Fetch the raw bytes of one sermon page (None if the fetch failed)
     """
-    print(f"Starting scraper for: {start_url}")
-    
-    # Get the main page with sermon list
-    html_content = get_page_content(start_url)
-    if not html_content:
-        print("Failed to fetch the main page")
-        return {}
-    
-    # Extract sermon list
-    sermons = extract_sermon_list(html_content)
-    print(f"Found {len(sermons)} sermons")
-    
-    # Dictionary to store results
-    results = {}
-    
-    # Scrape each sermon
-    for i, sermon in enumerate(sermons, 1):
-        print(f"Scraping sermon {i}/{len(sermons)}: {sermon['title']}")
-        
-        # Fetch sermon page
-        sermon_html = get_page_content(sermon['url'])
-        if not sermon_html:
-            print(f"  Failed to fetch sermon page")
-            continue
-        
-        # Extract content
-        content = extract_sermon_content(sermon_html)
-        
-        # Store in results
-        results[sermon['title']] = {
-            'text': content,
-            'notes': []
-        }
-        
-        # Be polite to the server - add a small delay
-        time.sleep(1)
-    
-    return results
+    return list_scraper.fetch_page(url, timeout=10)
 
-def save_to_json(data, filename='output.json'):
+def parse_sermon_page(page, backend=None):
     """
-    Save scraped data to JSON file with proper UTF-8 encoding
+    Decode a fetched sermon page and extract its content
+    Runs in a parser process, so the backend is passed in explicitly.
     """
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    
-    print(f"\nData saved to {filename}")
-    print(f"Total sermons scraped: {len(data)}")
+    return extract_sermon_content(page.decode('utf-8', errors='replace'), backend)
+
+# Scraping, saving and the command line are shared with the other list scraper
+SCRAPER = list_scraper.ListScraper('scraper', START_URL, extract_sermon_list, parse_sermon_page,
+                                   'assets/scraped_output.json', noun='sermon', timeout=10)
+
+scrape_sermons = SCRAPER.scrape
+scrape_sermons_incremental = SCRAPER.scrape_incremental
+save_to_json = SCRAPER.save_to_json
 
 if __name__ == "__main__":
-    # Scrape the sermons
-    sermon_data = scrape_sermons(START_URL)
-    
-    # Save to JSON file
-    if sermon_data:
-        save_to_json(sermon_data, 'assets/scraped_output.json')
-    else:
-        print("No data was scraped")
+    SCRAPER.main(SCRAPER.parse_args("Scrape Nahj al-Balagha sermons from imamali.net"))
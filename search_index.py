@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Inverted index of the explanations for the viewer's search
+Texts are split into tokens, normalised with the same rules as
+ArabicUtils.normalize in the app (tashkeel removed, alef, yeh and teh
+marbuta forms unified) and lower-cased; each term's postings list the
+sermons it occurs in with the UTF-16 offsets of every occurrence, so the
+page can highlight matches without searching the text again. A word with
+leading clitics (و, ف, ب, ك, ل and the article ال) is also indexed without
+them, so `كتاب` finds `والكتاب` and `للكتاب` as well as `كتابه`
+"""
+
+import re
+
+# Same ranges as ArabicUtils.normalize (lib/utils/arabic_utils.dart)
+_TASHKEEL = re.compile(r'[\u064B-\u065F\u06D6-\u06ED]')
+_ALEF = re.compile('[أإآ]')
+
+# A token is a run of letters, digits and underscores with the Arabic marks
+# inside it. The page tokenises queries and finds token ends with the same
+# class: /(?:[\p{L}\p{N}_]|[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED])+/u
+TOKEN = re.compile(r'(?:\w|[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED])+')
+
+# Leading clitics a word is also indexed without: a conjunction, then a
+# preposition and/or the article (ل + ال is written لل)
+PROCLITICS = sorted({conjunction + rest
+                     for conjunction in ('', 'و', 'ف')
+                     for rest in ('', 'ال', 'بال', 'كال', 'لل', 'ب', 'ك', 'ل')} - {''})
+
+_CLITIC_LETTERS = frozenset(prefix[0] for prefix in PROCLITICS)
+
+# Shortest word left once its clitics are stripped
+MIN_STEM = 2
+
+# Approximate largest shard of postings; a query only loads the shards of
+# the terms it can match
+SHARD_BYTES = 64 * 1024
+
+
+def normalize(text):
+    """
+    Normalise Arabic text as ArabicUtils.normalize does, and lower-case it
+    """
+    text = _TASHKEEL.sub('', text)
+    text = _ALEF.sub('ا', text)
+    return text.replace('ى', 'ي').replace('ة', 'ه').lower()
+
+
+def stems(term):
+    """
+    The forms of a normalised term without its possible leading clitics
+
+    Every prefix that could be a clitic is stripped in turn, since the text
+    alone does not tell a clitic from a word's own first letter; each form
+    is still a substring of the word, so no more words match than a plain
+    substring search would find.
+    """
+    if term[0] not in _CLITIC_LETTERS:
+        return []
+    return [term[len(prefix):] for prefix in PROCLITICS
+            if term.startswith(prefix) and len(term) - len(prefix) >= MIN_STEM]
+
+
+def tokenize(text):
+    """
+    Yield (normalised term, UTF-16 offset) for each token of a text
+
+    Offsets are in the UTF-16 code units JavaScript strings use; they only
+    differ from string positions after a character outside the Basic
+    Multilingual Plane, which takes two units.
+    """
+    wide = bool(text) and max(text) >= '\U00010000'
+    offset = last = 0
+    for match in TOKEN.finditer(text):
+        position = match.start()
+        if wide:
+            offset += position - last + sum(1 for char in text[last:position] if char >= '\U00010000')
+            last = position
+        else:
+            offset = position
+        term = normalize(match.group())
+        if term:
+            yield term, offset
+
+
+def build_index(texts):
+    """
+    Build the postings of a list of texts, numbered by their position in the list
+    Each word is indexed as it is and as each of its stems()
+
+    Returns:
+        Dictionary of term -> [(document number, [UTF-16 offsets]), ...]
+    """
+    index = {}
+    for document, text in enumerate(texts):
+        occurrences = {}
+        for term, offset in tokenize(text):
+            # The stripped forms point at the whole word, for the highlight
+            for form in [term] + stems(term):
+                occurrences.setdefault(form, []).append(offset)
+        for term, offsets in occurrences.items():
+            index.setdefault(term, []).append((document, offsets))
+    return index
+
+
+def encode_postings(postings):
+    """
+    Flatten one term's postings for the page: document, count, then the
+    offsets as gaps from the previous one, for each document in turn
+    """
+    flat = []
+    for document, offsets in postings:
+        flat += [document, len(offsets)]
+        previous = 0
+        for offset in offsets:
+            flat.append(offset - previous)
+            previous = offset
+    return flat
+
+
+def shard_index(index, max_bytes=SHARD_BYTES):
+    """
+    Split an index into shards keyed by term prefix
+
+    Terms are grouped by their first letter; a group larger than about
+    max_bytes is split again by the next letter, and so on, so the common
+    "ال" words do not all land in one shard. A term no longer than its
+    group's prefix stays in a shard keyed by the term itself. The shards a
+    prefix query needs are those whose key starts with the query term or
+    is a prefix of it.
+
+    Returns:
+        Dictionary of shard key -> {'terms': sorted terms, 'postings': encoded postings of each term}
+    """
+    encoded = {term: encode_postings(postings) for term, postings in index.items()}
+    shards = {}
+
+    def split(terms, length):
+        groups = {}
+        for term in terms:
+            groups.setdefault(term[:length], []).append(term)
+        for key, group in groups.items():
+            longer = [term for term in group if len(term) > length]
+            # About four bytes per number once written out
+            if longer and sum(len(encoded[term]) for term in group) * 4 > max_bytes:
+                if key in group:
+                    shards[key] = [key]
+                split(longer, length + 1)
+            else:
+                shards[key] = group
+
+    split(sorted(index), 1)
+    return {key: {'terms': terms, 'postings': [encoded[term] for term in terms]}
+            for key, terms in sorted(shards.items())}
+
+
+def shard_file_name(key):
+    """File name of a shard: its key's code points in hex"""
+    return 'index-' + '-'.join(f'{ord(char):04x}' for char in key) + '.js'
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Content-hashed, precompressed files for a static host
+Build outputs are written as NAME.HASH.EXT, so the host can serve them with
+a long-lived immutable Cache-Control and a file only changes name when its
+content does, and each gets .gz and .br siblings compressed at the highest
+level for hosts that serve precompressed files. Run on a directory (e.g.
+Flutter's build/web) it adds the compressed siblings without renaming
+anything, since the files there refer to each other by name
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+
+from profiling import add_profile_arguments, profiler_from_args
+
+try:
+    import brotli
+except ImportError:  # Optional; only the .gz siblings are written without it
+    brotli = None
+
+HASH_CHARS = 10
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# Files worth compressing; images and woff2 fonts are compressed already
+COMPRESSIBLE = ('.html', '.js', '.mjs', '.css', '.json', '.map', '.svg', '.txt', '.xml',
+                '.wasm', '.ttf', '.otf')
+COMPRESSED = ('.gz', '.br')
+
+ASSET_MANIFEST = 'assets.json'
+
+
+def content_hash(content):
+    """Short hex digest of a file's bytes"""
+    return hashlib.sha256(content).hexdigest()[:HASH_CHARS]
+
+
+def hashed_name(name, content):
+    """chunk-000.js -> chunk-000.HASH.js"""
+    base, ext = os.path.splitext(name)
+    return f"{base}.{content_hash(content)}{ext}"
+
+
+def _write_bytes(path, content):
+    # Written aside and moved into place, so a host never serves half a file
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def sibling_paths(path):
+    """The compressed siblings written next to a file"""
+    return [path + '.gz'] + ([path + '.br'] if brotli is not None else [])
+
+
+def write_compressed(path, content=None):
+    """
+    Write the .gz and, when the brotli package is installed, .br siblings of a file
+    """
+    if content is None:
+        with open(path, 'rb') as f:
+            content = f.read()
+    # mtime=0 keeps the .gz identical from one build to the next
+    _write_bytes(path + '.gz', gzip.compress(content, GZIP_LEVEL, mtime=0))
+    if brotli is not None:
+        _write_bytes(path + '.br', brotli.compress(content, quality=BROTLI_QUALITY))
+
+
+def write_file(path, content, compress=True):
+    """Write a file, as text or bytes, with its compressed siblings"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    _write_bytes(path, content)
+    if compress:
+        write_compressed(path, content)
+        return
+    # Siblings of an earlier version would be served in place of the new file
+    for suffix in COMPRESSED:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+class AssetWriter:
+    """
+    Hashed files of one build directory, which the build owns.
+
+    put() writes a file under its hashed name and returns that name; a file
+    already there has the same content, so it is kept as it is and only
+    the files that changed are written and compressed again. finish()
+    writes assets.json, mapping each logical name to its hashed file, and
+    removes what earlier builds left that this one did not put.
+    """
+
+    def __init__(self, directory, compress=True):
+        self.directory = directory
+        self.compress = compress
+        self.files = {}
+        self.written = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, name, content):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        hashed = hashed_name(name, content)
+        path = os.path.join(self.directory, hashed)
+        outputs = [path] + (sibling_paths(path) if self.compress else [])
+        if not all(os.path.exists(output) for output in outputs):
+            write_file(path, content, self.compress)
+            self.written += 1
+        self.files[name] = hashed
+        return hashed
+
+    def finish(self):
+        """
+        Write the asset manifest and remove stale files
+
+        Returns:
+            The manifest dictionary
+        """
+        write_file(os.path.join(self.directory, ASSET_MANIFEST),
+                   json.dumps(self.files, ensure_ascii=False, indent=2, sort_keys=True), compress=False)
+        keep = {ASSET_MANIFEST}
+        for hashed in self.files.values():
+            keep.add(hashed)
+            if self.compress:
+                keep.update(os.path.basename(sibling) for sibling in sibling_paths(hashed))
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name not in keep and os.path.isfile(path):
+                os.remove(path)
+        return self.files
+
+
+def precompress_directory(directory):
+    """
+    Add compressed siblings to every compressible file under a directory,
+    skipping those whose siblings are newer than the file
+
+    Returns:
+        (files compressed, files already up to date)
+    """
+    compressed = current = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(root, name)
+            modified = os.path.getmtime(path)
+            if all(os.path.exists(sibling) and os.path.getmtime(sibling) >= modified
+                   for sibling in sibling_paths(path)):
+                current += 1
+                continue
+            write_compressed(path)
+            compressed += 1
+    return compressed, current
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Write .gz and .br siblings of the files of a static build, e.g. build/web")
+    parser.add_argument('directories', nargs='+', metavar='DIR', help="Build directories to precompress")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    profiler = profiler_from_args(args, 'static_assets')
+    if brotli is None:
+        print("⚠️  brotli is not installed; writing .gz files only")
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            print(f"❌ {directory} is not a directory")
+            raise SystemExit(1)
+    with profiler.stage('compress'):
+        for directory in args.directories:
+            compressed, current = precompress_directory(directory)
+            print(f"🗜️  {directory}: {compressed} files compressed, {current} already up to date")
+    profiler.finish()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+from charset import CharsetResolver, header_charset, meta_charset
+
+ARABIC = 'نهج البلاغة'
+
+
+def response(body, content_type='text/html', url='http://gadir.free.fr/page.htm', apparent=None):
+    return SimpleNamespace(content=body, url=url, headers={'Content-Type': content_type},
+                           apparent_encoding=apparent)
+
+
+def test_header_and_meta_parsing():
+    assert header_charset('text/html; charset="UTF-8"') == 'utf-8'
+    assert header_charset('text/html') is None
+    assert header_charset('text/html; charset=bogus') is None
+    assert meta_charset(b'<meta http-equiv="Content-Type" content="text/html; charset=windows-1256">') == 'cp1256'
+    assert meta_charset(b'<meta charset=utf-8>') == 'utf-8'
+
+
+def test_header_charset_is_used():
+    resolver = CharsetResolver()
+    assert resolver.decode(response(ARABIC.encode('utf-8'), 'text/html; charset=utf-8')) == ARABIC
+    assert resolver.sources['header'] == 1
+
+
+def test_header_that_does_not_decode_falls_through_to_meta():
+    body = b'<meta charset="windows-1256">' + ARABIC.encode('cp1256')
+    resolver = CharsetResolver()
+    assert resolver.decode(response(body, 'text/html; charset=utf-8')).endswith(ARABIC)
+    assert resolver.sources['meta'] == 1
+
+
+def test_meta_wins_over_latin1_header():
+    body = b'<meta charset="windows-1256">' + ARABIC.encode('cp1256')
+    resolver = CharsetResolver()
+    assert resolver.decode(response(body, 'text/html; charset=ISO-8859-1')).endswith(ARABIC)
+    assert resolver.learned['gadir.free.fr'] == 'cp1256'
+
+
+def test_latin1_header_comes_after_detection():
+    # No <meta>: Latin-1 would decode these bytes, but detection must be preferred
+    resolver = CharsetResolver()
+    text = resolver.decode(response(ARABIC.encode('cp1256'), 'text/html; charset=ISO-8859-1', apparent='windows-1256'))
+    assert text == ARABIC
+    assert resolver.sources == {'header': 0, 'meta': 0, 'learned': 0, 'detected': 1}
+    assert resolver.learned['gadir.free.fr'] == 'cp1256'
+
+
+def test_learned_charset_is_used_before_a_latin1_header():
+    resolver = CharsetResolver()
+    resolver.decode(response(b'<meta charset="windows-1256">' + ARABIC.encode('cp1256')))
+    text = resolver.decode(response(ARABIC.encode('cp1256'), 'text/html; charset=ISO-8859-1'))
+    assert text == ARABIC
+    assert resolver.sources['learned'] == 1
+
+
+def test_latin1_header_is_the_last_resort_and_not_learned():
+    resolver = CharsetResolver()
+    assert resolver.decode(response('café'.encode('latin-1'), 'text/html; charset=ISO-8859-1')) == 'café'
+    assert resolver.sources['header'] == 1
+    assert 'gadir.free.fr' not in resolver.learned
+
+
+def test_fallback_without_any_source():
+    resolver = CharsetResolver()
+    assert resolver.decode(response(ARABIC.encode('cp1256'))) == ARABIC
+    assert resolver.sources['detected'] == 1
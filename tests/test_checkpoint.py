@@ -0,0 +1,80 @@
+import json
+
+from checkpoint import Journal
+from explanation_scraper import ExplanationExtractor
+
+
+def test_records_survive_reopening(tmp_path):
+    path = str(tmp_path / 'run.journal')
+    with Journal(path, fsync='always') as journal:
+        journal.record('book:01', {'الخطبة1': 'نص'})
+        journal.record('book:02', {})
+    with Journal(path) as journal:
+        assert len(journal) == 2
+        assert journal.get('book:01') == {'الخطبة1': 'نص'}
+        assert 'book:02' in journal
+
+
+def test_torn_tail_is_discarded_and_rewritten(tmp_path):
+    path = tmp_path / 'run.journal'
+    path.write_text(json.dumps({'key': 'a', 'value': 1}) + '\n' + '{"key": "b", "val', encoding='utf-8')
+    with Journal(str(path)) as journal:
+        assert list(journal.entries) == ['a']
+        journal.record('c', 3)
+    assert [json.loads(line)['key'] for line in path.read_text(encoding='utf-8').splitlines()] == ['a', 'c']
+
+
+def test_unterminated_last_record_is_not_trusted(tmp_path):
+    path = tmp_path / 'run.journal'
+    path.write_text(json.dumps({'key': 'a', 'value': 1}) + '\n' + json.dumps({'key': 'b', 'value': 2}),
+                    encoding='utf-8')
+    with Journal(str(path)) as journal:
+        assert 'b' not in journal
+
+
+def test_later_records_win_and_duplicates_are_compacted(tmp_path):
+    path = tmp_path / 'run.journal'
+    with Journal(str(path)) as journal:
+        journal.record('a', 1)
+        journal.record('a', 2)
+    with Journal(str(path)) as journal:
+        assert journal.get('a') == 2
+    assert len(path.read_text(encoding='utf-8').splitlines()) == 1
+
+
+def test_discard_removes_the_file(tmp_path):
+    path = tmp_path / 'run.journal'
+    journal = Journal(str(path))
+    journal.record('a', 1)
+    journal.discard()
+    assert not path.exists()
+
+
+PAGES = [
+    [('h1', [], 'الخطبة 1'), ('p', ['mohem'], 'الشرح والتفسير'), ('p', [], 'أول')],
+    [('p', [], 'ثان'), ('h1', [], 'الخطبة 2'), ('h3', [], 'شرح الخطبة'), ('p', [], 'ثالث')],
+    [('p', ['foot1'], 'حاشية'), ('p', [], 'رابع')],
+]
+
+
+def test_extractor_resumes_from_a_page_checkpoint():
+    whole = ExplanationExtractor()
+    for page in PAGES:
+        whole.feed(page)
+    expected = whole.close()
+    assert expected == {'الخطبة1': 'أول\n\nثان', 'الخطبة2': 'ثالث\n\nرابع'}
+
+    # Crash after the second page; the checkpoints go through JSON like the journal's
+    first = ExplanationExtractor()
+    checkpoints = []
+    for page in PAGES[:2]:
+        first.feed(page)
+        checkpoints.append(json.loads(json.dumps(first.checkpoint())))
+
+    emitted = []
+    resumed = ExplanationExtractor(on_sermon=lambda key, text: emitted.append(key))
+    for checkpoint in checkpoints:
+        resumed.restore(checkpoint)
+    resumed.feed(PAGES[2])
+    assert resumed.close() == expected
+    assert emitted == ['الخطبة1', 'الخطبة2']
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from cleaning_rules import (DELETE, GAP, Rule, RuleSet, clean_member, clean_text, clean_value, cleaned_path,
+                            save_cleaned_json)
+
+
+@pytest.mark.parametrize('text, cleaned', [
+    ('قال[1] علي ([2]) ع', 'قال علي ع'),
+    ('نص (\n\n[1]\n\n) تابع', 'نص تابع'),
+    # Removing "([1])" exposes "[2]", which goes too
+    ('أ [([1])2] ب', 'أ ب'),
+    ('  سطر\n\nسطر\t ', 'سطر سطر'),
+    ('[a] (1)', '[a] (1)'),
+])
+def test_default_rules(text, cleaned):
+    assert clean_text(text) == cleaned
+
+
+def test_values_and_keys_are_cleaned_recursively():
+    value = {'text': 'أ[1]', 'notes': ['ب ([2])', 3, None], 'مفتاح[4]': True}
+    assert clean_value(value) == {'text': 'أ', 'notes': ['ب', 3, None], 'مفتاح': True}
+    assert clean_member('الخطبة 1[1]', 'نص') == ('الخطبة 1', 'نص')
+
+
+def test_custom_gap_rule_matches_whitespace_too():
+    rules = RuleSet([Rule('dash', r'-+', GAP), Rule('star', r'\*', DELETE)])
+    assert rules.clean_text(' a -- b *c\n- d ') == 'a b c d'
+
+
+def test_unknown_action_is_refused():
+    with pytest.raises(ValueError, match='Unknown action'):
+        RuleSet([Rule('bad', 'x', 'replace')])
+
+
+def test_cleaned_twin_keeps_the_dict_rule(tmp_path):
+    path = str(tmp_path / 'out.json')
+    assert cleaned_path(path) == str(tmp_path / 'out_cleaned.json')
+    # Both keys clean to "أ": first position, last value
+    save_cleaned_json({'أ[1]': 'x', 'ب': 'y', 'أ': 'z[2]'}, cleaned_path(path))
+    with open(cleaned_path(path), encoding='utf-8') as f:
+        assert f.read() == json.dumps({'أ': 'z', 'ب': 'y'}, ensure_ascii=False, indent=2)
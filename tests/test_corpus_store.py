@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from corpus_store import CorpusStore, build_store, store_path, verify_store, zstandard
+
+CODECS = ['zlib'] + (['zstd'] if zstandard is not None else [])
+
+DATA = {f"الخطبة{number}": "نص الخطبة " * number + f"[{number}]" for number in range(1, 60)}
+DATA['nested'] = {'title': 'عنوان', 'parts': ['أ', 'ب', None, 3]}
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'explanations.json'
+    path.write_text(json.dumps(DATA, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('codec', CODECS)
+def test_round_trip_in_source_order(source, tmp_path, codec):
+    path = str(tmp_path / 'store')
+    index = build_store(source, path, codec, shard_bytes=64)
+    assert len(index['shards']) > 1
+    with CorpusStore(path) as store:
+        assert list(store) == list(DATA)
+        assert dict(store.items()) == DATA
+        assert store['الخطبة7'] == DATA['الخطبة7']
+        assert store.get('missing') is None
+        assert 'nested' in store and len(store) == len(DATA)
+    assert verify_store(path, source) == []
+
+
+def test_rebuild_replaces_the_store(source, tmp_path):
+    path = str(tmp_path / 'store')
+    build_store(source, path, 'zlib')
+    with open(source, 'w', encoding='utf-8') as f:
+        json.dump({'only': 'one'}, f)
+    build_store(source, path, 'zlib')
+    with CorpusStore(path) as store:
+        assert dict(store.items()) == {'only': 'one'}
+    assert not os.path.exists(path + '.tmp')
+
+
+def test_verify_reports_changes(source, tmp_path):
+    path = str(tmp_path / 'store')
+    build_store(source, path, 'zlib')
+    changed = dict(DATA, الخطبة3='تغير')
+    del changed['الخطبة4']
+    with open(source, 'w', encoding='utf-8') as f:
+        json.dump(changed, f, ensure_ascii=False)
+    problems = verify_store(path, source)
+    assert any('keys differ' in problem for problem in problems)
+    assert any(problem.startswith('الخطبة3') for problem in problems)
+
+
+def test_damaged_record_is_reported(source, tmp_path):
+    path = str(tmp_path / 'store')
+    build_store(source, path, 'zlib')
+    shard = os.path.join(path, 'shard-000.bin')
+    with open(shard, 'r+b') as f:
+        f.write(b'\xff' * 16)
+    assert any('cannot be read' in problem or 'differs' in problem for problem in verify_store(path, source))
+
+
+def test_store_path():
+    assert store_path('assets/scraped_output.json') == os.path.join('stores', 'scraped_output')
+
+
+def test_non_object_is_rejected(tmp_path):
+    path = tmp_path / 'list.json'
+    path.write_text('[1, 2]', encoding='utf-8')
+    with pytest.raises(ValueError):
+        build_store(str(path), str(tmp_path / 'store'))
@@ -0,0 +1,66 @@
+import pytest
+
+import letters_scraper
+import scraper
+from fast_extract import extract_content_text, extract_list_items
+
+
+def page(body):
+    return (f'<html><head><meta charset="utf-8"></head><body>'
+            f'<div class="AKD-SiraBodyTx_"><p>{body}</p></div></body></html>')
+
+
+@pytest.mark.parametrize('reference', [
+    '&#0;', '&#x0;', '&#00;', '&#xD800;', '&#57343;', '&#x110000;', '&#99999999999;',
+    '&#x10FFFF;', '&#65;', '&#x627;', '&#160;', '&amp;', '&nbsp;', '&ampx', '&notit;', '&#65',
+])
+def test_references_decode_as_the_reference_extractor_does(reference):
+    html = page(f'a{reference}b')
+    assert scraper.extract_sermon_content(html, 'lxml') == scraper.extract_sermon_content(html, 'bs4')
+
+
+@pytest.mark.parametrize('reference', ['&#0;', '&#x0;', '&#xD800;', '&#x110000;'])
+def test_unsafe_code_points_take_the_html_parser_path(reference):
+    assert extract_content_text(page(f'a{reference}b'), scraper.CONTENT_CLASSES) is None
+
+
+def test_plain_content_takes_the_fast_path():
+    assert extract_content_text(page('نص &amp; نص'), scraper.CONTENT_CLASSES) is not None
+
+
+def item(body, close=True):
+    return f'<li class="AKD-Categ_List">{body}' + ('</li>' if close else '')
+
+
+def link(number, title):
+    return f'<a class="AKD-HrefList" href="?id={number}"><span class="AKD-Li_Tx_">{title}</span></a>'
+
+
+LIST_PAGES = [
+    # A link-less header item that BeautifulSoup nests the unclosed items into
+    '<ul>' + item('<span class="AKD-Li_Tx_">header</span>', close=False)
+    + ''.join(item(f'<span class="AKD-Li_Tx_">t{n}</span><a class="AKD-HrefList" href="?id={n}">x</a>', close=False)
+              for n in (1, 2)) + '</ul>',
+    '<ul>' + item(link(1, 'a'), close=False) + item(link(2, 'b')) + '</ul>',
+    '<ul>' + item('<span class="AKD-Li_Tx_">a</span><ul><li>' + link(1, 'b') + '</li></ul>') + '</ul>',
+    '<ul>' + item('<span class="AKD-Li_Tx_">a</span><div>') + item(link(2, 'b')) + '</ul>',
+    '<ul><div>' + item('<span class="AKD-Li_Tx_">a</span></ul><a class="AKD-HrefList" href="?id=1">x</a>') + '</div>',
+    '<ul>' + item('<span class="AKD-Li_Tx_">a</span><p>' + link(1, 'b')) + item(link(2, 'c')) + '</ul>',
+]
+
+
+@pytest.mark.parametrize('html', LIST_PAGES)
+def test_lists_with_unclosed_or_nested_items_match_beautifulsoup(html):
+    html = f'<html><body>{html}</body></html>'
+    assert scraper.extract_sermon_list(html, 'lxml') == scraper.extract_sermon_list(html, 'bs4')
+    assert letters_scraper.extract_list(html, 'lxml') == letters_scraper.extract_list(html, 'bs4')
+
+
+def test_unclosed_items_take_the_beautifulsoup_path():
+    assert extract_list_items(LIST_PAGES[0], scraper.BASE_URL) is None
+
+
+def test_well_formed_list_takes_the_fast_path():
+    html = '<ul>' + ''.join(item(link(n, f'خطبة {n}')) for n in range(1, 4)) + '</ul>'
+    assert extract_list_items(html, scraper.BASE_URL) == scraper.extract_sermon_list(html, 'bs4')
+    assert len(extract_list_items(html, scraper.BASE_URL)) == 3
@@ -0,0 +1,130 @@
+import pytest
+
+import fetch_engine
+from fetch_engine import AdaptiveBucket, AdaptiveRateLimiter, HostRateLimiter, TokenBucket, adaptive_limiter, fetch_all
+from http_client import HttpClient
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fetch_engine.time, 'monotonic', clock)
+    return clock
+
+
+def test_reserve_queues_waiters_in_order(clock):
+    bucket = TokenBucket(rate=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+    # Half a second on, the next request goes after the two already waiting
+    clock.now += 0.5
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_tokens_never_exceed_the_burst(clock):
+    bucket = TokenBucket(rate=1, burst=2)
+    clock.now += 60
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, pytest.approx(1.0)]
+
+
+def test_try_acquire_takes_nothing_when_empty(clock):
+    bucket = TokenBucket(rate=4)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.25)
+    assert bucket.try_acquire() == pytest.approx(0.25)
+    clock.now += 0.25
+    assert bucket.try_acquire() == 0
+
+
+def test_set_rate_keeps_earned_tokens(clock):
+    bucket = TokenBucket(rate=1)
+    bucket.reserve()
+    clock.now += 0.5
+    bucket.set_rate(10)
+    # Half a token earned at the old rate, the other half at the new one
+    assert bucket.reserve() == pytest.approx(0.05)
+
+
+def test_one_bucket_per_host():
+    limiter = HostRateLimiter(rate=3)
+    assert limiter.bucket_for('https://a.example/1') is limiter.bucket_for('https://a.example/2')
+    assert limiter.bucket_for('https://a.example/1') is not limiter.bucket_for('https://b.example/1')
+
+
+def test_fetch_all_keeps_the_order_of_the_urls():
+    urls = [f'https://a.example/{n}' for n in range(6)]
+    results = fetch_all(urls, lambda url: url.rsplit('/', 1)[1], concurrency=3, rate=1000,
+                        parse=int, parse_workers=0)
+    assert results == list(range(6))
+
+
+def test_healthy_responses_raise_the_rate_to_the_ceiling(clock):
+    bucket = AdaptiveBucket(rate=1, ceiling=2, increase=0.5)
+    bucket.record(0.1, 200)
+    assert bucket.rate == 1.5
+    # About one second of responses per step: two at 1.5 req/s
+    bucket.record(0.1, 200)
+    assert bucket.rate == 1.5
+    for _ in range(10):
+        bucket.record(0.1, 200)
+    assert bucket.rate == 2
+
+
+@pytest.mark.parametrize('seconds, status', [(0.1, 429), (0.1, 503), (0.1, None), (5.0, 200)])
+def test_backoff_halves_the_rate(clock, seconds, status):
+    bucket = AdaptiveBucket(rate=4, ceiling=8)
+    bucket.record(0.1, 200)
+    rate = bucket.rate
+    bucket.record(seconds, status)
+    assert bucket.rate == rate / 2
+    assert bucket.decreases == 1
+
+
+def test_backoff_is_held_and_floored(clock):
+    bucket = AdaptiveBucket(rate=1, ceiling=8, floor=0.4, hold=2.0)
+    bucket.record(0.1, 503)
+    # Requests already in flight report the same congestion
+    bucket.record(0.1, 503)
+    assert bucket.rate == 0.5
+    clock.now += 2
+    bucket.record(0.1, 503)
+    assert bucket.rate == 0.4
+    assert bucket.decreases == 2
+
+
+def test_sub_second_jitter_is_not_a_spike(clock):
+    bucket = AdaptiveBucket(rate=1, ceiling=1)
+    bucket.record(0.05, 200)
+    bucket.record(0.4, 200)
+    assert bucket.decreases == 0
+
+
+def test_limiter_uses_per_host_ceilings_and_rates():
+    limiter = AdaptiveRateLimiter(rate=2, ceiling=6, ceilings={'b.example': 1}, rates={'c.example': 0.5})
+    assert limiter.rate_for('https://a.example/') == 2
+    assert limiter.rate_for('https://b.example/') == 1
+    assert limiter.rate_for('https://c.example/') == 0.5
+    limiter.observe('https://a.example/x', 0.1, 429)
+    assert limiter.rate_for('https://a.example/') == 1
+
+
+def test_a_client_feeds_one_adaptive_limiter_at_a_time():
+    client = HttpClient()
+    other = []
+    client.add_observer(lambda *args: other.append(args))
+    first = adaptive_limiter(client, rate=2, ceiling=6)
+    second = adaptive_limiter(client, rate=2, ceiling=6)
+    assert len(client.observers) == 2
+    client._observe('https://a.example/x', 0, 429)
+    assert first.rate_for('https://a.example/') == 2
+    assert second.rate_for('https://a.example/') == 1
+    assert len(other) == 1
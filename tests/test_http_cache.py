@@ -0,0 +1,53 @@
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from http_cache import ResponseCache
+
+
+def response(body, etag):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers = CaseInsensitiveDict({'ETag': etag, 'Content-Type': 'text/html', 'Set-Cookie': 'x'})
+    response._content = body
+    return response
+
+
+def test_store_and_load(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store('http://a/1', response('نص'.encode('utf-8'), '"v1"'))
+    cached = cache.load('http://a/1')
+    assert cached.content == 'نص'.encode('utf-8')
+    assert cached.headers['ETag'] == '"v1"'
+    assert 'Set-Cookie' not in cached.headers
+    assert cached.from_cache
+    assert cache.load('http://a/2') is None
+
+
+def test_entry_torn_by_a_crash_is_a_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store('http://a/1', response(b'old', '"v1"'))
+    _, meta_path, body_path = cache._paths('http://a/1')
+    with open(meta_path, 'rb') as f:
+        old_meta = f.read()
+    cache.store('http://a/1', response(b'new', '"v2"'))
+    # The body of the second store() with the validators of the first
+    with open(meta_path, 'wb') as f:
+        f.write(old_meta)
+    assert cache.load('http://a/1') is None
+
+
+def test_counters_are_exact_across_threads(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+
+    def count():
+        for _ in range(10000):
+            cache.count('hits')
+
+    threads = [threading.Thread(target=count) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.hits == 80000
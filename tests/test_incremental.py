@@ -0,0 +1,112 @@
+from collections import Counter
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import explanation_scraper
+import http_client
+from http_cache import ResponseCache
+from incremental import IncrementalState
+
+
+class FakeSite:
+    """Pages by URL, answering conditional requests like a real server"""
+
+    def __init__(self, pages):
+        self.pages = dict(pages)
+        self.versions = Counter()
+        self.requests = Counter()
+
+    def set(self, url, body):
+        self.pages[url] = body
+        self.versions[url] += 1
+
+    def get(self, url, timeout=None, headers=None):
+        self.requests[url] += 1
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        etag = f'"{self.versions[url]}"'
+        response.headers = CaseInsensitiveDict({'ETag': etag, 'Content-Type': 'text/html; charset=utf-8'})
+        if url not in self.pages:
+            response.status_code = 404
+            response._content = b''
+        elif (headers or {}).get('If-None-Match') == etag:
+            response.status_code = 304
+            response._content = b''
+        else:
+            response._content = self.pages[url].encode('utf-8')
+        return response
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    def install(site, cache=True):
+        client = http_client.configure_client(cache=ResponseCache(str(tmp_path / 'cache')) if cache else None,
+                                              retries=0)
+        monkeypatch.setattr(client.session, 'get', site.get)
+        return client
+    yield install
+    monkeypatch.setattr(http_client, '_client', None)
+
+
+@pytest.mark.parametrize('cache', [True, False])
+def test_revalidated_pages_count_as_not_modified(tmp_path, client, cache):
+    site = FakeSite({'http://a/1': 'one', 'http://a/2': 'two'})
+    client(site, cache)
+    path = str(tmp_path / 'state.json')
+    state = IncrementalState(path)
+    assert all(state.fetch_if_changed(url) is not None for url in site.pages)
+    state.save()
+
+    site.set('http://a/2', 'two, edited')
+    state = IncrementalState(path)
+    assert state.fetch_if_changed('http://a/1') is None
+    assert state.fetch_if_changed('http://a/2').content == b'two, edited'
+    assert (state.requests, state.not_modified) == (2, 1)
+
+
+def sermon_page(number, text):
+    return (f'<html><body><h1>نفحات الولاية</h1><h1>الخطبة {number}</h1>'
+            f'<p class="mohem">الشرح والتفسير</p><p>{text}</p></body></html>')
+
+
+def run_incremental(site, state_path, existing):
+    state = IncrementalState(state_path)
+    result = explanation_scraper.scrape_books_incremental([1], [1, 2, 3], existing, state, rate=1000, max_rate=1000)
+    state.save()
+    return result
+
+
+def test_changed_book_is_fetched_once_per_page(tmp_path, client):
+    urls = [explanation_scraper.page_url(1, page_num) for page_num in (1, 2, 3)]
+    site = FakeSite({url: sermon_page(n, f'شرح {n}') for n, url in enumerate(urls, 1)})
+    client(site)
+    state_path = str(tmp_path / 'state.json')
+    first = run_incremental(site, state_path, {})
+    assert first == {'الخطبة1': 'شرح 1', 'الخطبة2': 'شرح 2', 'الخطبة3': 'شرح 3'}
+
+    site.requests.clear()
+    site.set(urls[1], sermon_page(2, 'شرح جديد'))
+    second = run_incremental(site, state_path, first)
+    assert second['الخطبة2'] == 'شرح جديد'
+    assert set(site.requests.values()) == {1}
+
+
+def test_missing_page_is_removed_not_retried(tmp_path, client):
+    urls = [explanation_scraper.page_url(1, page_num) for page_num in (1, 2, 3)]
+    site = FakeSite({url: sermon_page(n, f'شرح {n}') for n, url in enumerate(urls, 1)})
+    client(site)
+    state_path = str(tmp_path / 'state.json')
+    first = run_incremental(site, state_path, {})
+
+    del site.pages[urls[2]]
+    second = run_incremental(site, state_path, first)
+    assert second == {'الخطبة1': 'شرح 1', 'الخطبة2': 'شرح 2'}
+
+    # The book is unchanged from now on, not rolled back and fetched again
+    site.requests.clear()
+    assert run_incremental(site, state_path, second) == second
+    assert set(site.requests.values()) == {1}
+    assert IncrementalState(state_path).groups['01'] == ['الخطبة1', 'الخطبة2']
@@ -0,0 +1,89 @@
+import io
+import json
+
+import pytest
+
+from json_stream import (JsonObjectWriter, NDJSONWriter, NotAnObject, finalize_ndjson, iter_ndjson,
+                         iter_object_members)
+
+DATA = {'الخطبة1': {'text': 'نص\n"مقتبس"', 'notes': []}, 'الخطبة2': {'text': '', 'notes': [1, 2]}}
+
+
+@pytest.mark.parametrize('data', [DATA, {}])
+def test_writer_matches_json_dump(data):
+    for indent in (2, None):
+        out = io.StringIO()
+        writer = JsonObjectWriter(out, indent)
+        for key, value in data.items():
+            writer.write(key, value)
+        writer.close()
+        if indent is None:
+            assert out.getvalue() == json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        else:
+            assert out.getvalue() == json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def test_finalize_orders_by_index_like_a_dict(tmp_path):
+    stream = str(tmp_path / 'out.ndjson')
+    output = str(tmp_path / 'out.json')
+    with NDJSONWriter(stream) as writer:
+        writer.write(2, 'c', 'C')
+        writer.write(0, 'a', 'A')
+        writer.write(1, 'b', 'B')
+        # A repeated key keeps its first position and its last value
+        writer.write(3, 'a', 'A2')
+    assert finalize_ndjson(stream, output) == 3
+    with open(output, encoding='utf-8') as f:
+        text = f.read()
+    expected = {'a': 'A', 'b': 'B', 'c': 'C'}
+    expected['a'] = 'A2'
+    assert text == json.dumps(expected, ensure_ascii=False, indent=2)
+
+
+def test_finalize_ignores_a_torn_last_line(tmp_path):
+    stream = tmp_path / 'out.ndjson'
+    with NDJSONWriter(str(stream)) as writer:
+        writer.write(0, 'a', 'A')
+    with open(stream, 'a', encoding='utf-8') as f:
+        f.write('{"index": 1, "key": "b", "val')
+    assert list(iter_ndjson(str(stream))) == [(0, 'a', 'A')]
+    assert finalize_ndjson(str(stream), str(tmp_path / 'out.json'), compact=True) == 1
+    assert (tmp_path / 'out.json').read_text(encoding='utf-8') == '{"a":"A"}'
+
+
+def test_finalize_writes_the_twin_in_the_same_pass(tmp_path):
+    stream = str(tmp_path / 'out.ndjson')
+    with NDJSONWriter(stream) as writer:
+        writer.write(0, 'a 1', 'x')
+        writer.write(1, 'b', 'y')
+        writer.write(2, 'a1', 'z')
+    twin = str(tmp_path / 'twin.json')
+    finalize_ndjson(stream, str(tmp_path / 'out.json'), twin_path=twin,
+                    twin_key=lambda key: key.replace(' ', ''), twin_value=str.upper)
+    raw = {'a 1': 'x', 'b': 'y', 'a1': 'z'}
+    expected = {}
+    for key, value in raw.items():
+        expected[key.replace(' ', '')] = value.upper()
+    with open(twin, encoding='utf-8') as f:
+        assert f.read() == json.dumps(expected, ensure_ascii=False, indent=2)
+
+
+@pytest.mark.parametrize('read_size', [1, 3, 1 << 16])
+def test_members_are_read_one_at_a_time(read_size):
+    text = ' {"a": 1, "long": "%s", "n": 12345,\n "a": [true, null, {"x": 1.5}], "empty": {}} ' % ('ن' * 50)
+    members = list(iter_object_members(io.StringIO(text), read_size))
+    assert [key for key, _ in members] == ['a', 'long', 'n', 'a', 'empty']
+    assert members[2] == ('n', 12345)
+    # Repeated keys are all yielded; the last one is what json.load keeps
+    assert dict(members) == json.loads(text)
+
+
+def test_members_of_an_empty_object():
+    assert list(iter_object_members(io.StringIO('{ }'))) == []
+
+
+@pytest.mark.parametrize('text, error', [('[1, 2]', NotAnObject), ('{"a": 1', json.JSONDecodeError),
+                                         ('{"a" 1}', json.JSONDecodeError), ('{1: 2}', json.JSONDecodeError)])
+def test_members_of_a_bad_document(text, error):
+    with pytest.raises(error):
+        list(iter_object_members(io.StringIO(text), read_size=2))
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from key_transform import (Blank, Delete, Merge, Rename, Shift, evaluate, key_number, plan,
+                           renumber, transform_file)
+
+KEYS = ['الخطبة1', 'الخطبة2', 'الخطبة3', 'الخطبة4']
+
+
+def apply(values, operations):
+    entries = plan(list(values), operations)
+    return {key: evaluate(expr, values) for key, expr in entries.items()}
+
+
+def write(tmp_path, text):
+    path = tmp_path / 'data.json'
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_key_numbers():
+    assert key_number('الخطبة 3: عنوان 7') == 3
+    assert key_number('مقدمة') is None
+    assert renumber('الخطبة55', 54) == 'الخطبة54'
+
+
+def test_shift_with_and_without_an_end():
+    assert list(plan(KEYS, [Shift(2, None, 1)])) == ['الخطبة1', 'الخطبة3', 'الخطبة4', 'الخطبة5']
+    assert list(plan(KEYS, [Shift(2, 2, 10)])) == ['الخطبة1', 'الخطبة12', 'الخطبة3', 'الخطبة4']
+
+
+def test_shift_onto_an_existing_key_is_refused():
+    with pytest.raises(ValueError, match='two keys would become'):
+        plan(KEYS, [Shift(2, 2, 1)])
+
+
+def test_operations_compose_in_order():
+    # Delete 2, then close the gap: 3 and 4 become 2 and 3
+    assert list(plan(KEYS, [Delete((2,)), Shift(3, None, -1)])) == ['الخطبة1', 'الخطبة2', 'الخطبة3']
+
+
+def test_rename_keeps_position():
+    assert list(plan(KEYS, [Rename(3, 'مقدمة')])) == ['الخطبة1', 'الخطبة2', 'مقدمة', 'الخطبة4']
+
+
+def test_blank_keeps_the_type():
+    values = {'a1': 'نص', 'a2': ['x'], 'a3': {'text': 'y'}}
+    assert apply(values, [Blank((1, 2, 3))]) == {'a1': '', 'a2': [], 'a3': {}}
+
+
+def test_merge_joins_in_file_order():
+    values = {'الخطبة1': 'أ', 'الخطبة2': 'ب', 'الخطبة3': 'ج'}
+    assert apply(values, [Merge((1, 3))]) == {'الخطبة1': 'أ\n\nج', 'الخطبة2': 'ب'}
+    records = {'a1': {'text': 'x', 'notes': [1]}, 'a2': {'text': 'y', 'notes': [2]}}
+    assert apply(records, [Merge((1, 2))]) == {'a1': {'text': 'x\n\ny', 'notes': [1, 2]}}
+
+
+def test_merge_of_different_types_is_refused():
+    with pytest.raises(ValueError, match='different types'):
+        apply({'a1': 'x', 'a2': ['y']}, [Merge((1, 2))])
+
+
+def test_transform_file_matches_the_in_memory_plan(tmp_path):
+    values = {f'الخطبة{n}': f'نص {n}' for n in range(1, 8)}
+    path = write(tmp_path, json.dumps(values, ensure_ascii=False))
+    # The later key is merged into an earlier one, so the first waits for it
+    operations = [Merge((2, 6)), Delete((4,)), Shift(5, None, -1), Blank((1,))]
+    assert transform_file(path, operations) == (7, 5)
+    with open(path, encoding='utf-8') as f:
+        result = json.load(f)
+    assert result == apply(values, operations)
+    assert list(result) == list(apply(values, operations))
+
+
+def test_repeated_keys_keep_the_last_value_like_json_load(tmp_path):
+    path = write(tmp_path, '{"a1": "old", "a2": "x", "a1": "new"}')
+    transform_file(path, [Rename('a2', 'b')])
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == {'a1': 'new', 'b': 'x'}
+
+
+def test_failed_plan_leaves_the_file_untouched(tmp_path):
+    text = json.dumps({'a1': 'x', 'a2': 'y'})
+    path = write(tmp_path, text)
+    with pytest.raises(ValueError):
+        transform_file(path, [Shift(1, 1, 1)])
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == text
+    assert not (tmp_path / 'data.json.tmp').exists()
+
+
+def test_dry_run_writes_nothing(tmp_path):
+    text = json.dumps({'a1': 'x'})
+    path = write(tmp_path, text)
+    assert transform_file(path, [Delete((1,))], dry_run=True) == (1, 0)
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == text
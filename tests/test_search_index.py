@@ -0,0 +1,69 @@
+from search_index import build_index, encode_postings, normalize, shard_index, stems, tokenize
+
+
+def terms_starting_with(index, query):
+    documents = set()
+    for term, postings in index.items():
+        if term.startswith(query):
+            documents.update(document for document, _ in postings)
+    return documents
+
+
+def test_normalize_follows_the_app():
+    assert normalize('صِفِّين') == 'صفين'
+    assert normalize('أإآ') == 'ااا'
+    assert normalize('مدينة على') == 'مدينه علي'
+    assert normalize('ABC') == 'abc'
+
+
+def test_tokenize_offsets_are_utf16():
+    assert list(tokenize('قال علي')) == [('قال', 0), ('علي', 4)]
+    # A character outside the BMP is two UTF-16 units
+    assert list(tokenize('\U0001F600 قال')) == [('قال', 3)]
+    # Marks stay inside the token
+    assert list(tokenize('صِفِّين.')) == [('صفين', 0)]
+
+
+def test_stems_strip_leading_clitics():
+    assert set(stems('والكتاب')) >= {'الكتاب', 'كتاب'}
+    assert 'كتاب' in stems('للكتاب')
+    assert 'كتاب' in stems('بكتاب')
+    assert stems('قال') == []
+    # Never shorter than two letters
+    assert all(len(stem) >= 2 for stem in stems('ولد'))
+
+
+def test_index_finds_words_with_clitics_as_substring_search_does():
+    texts = ['قرأ الكتاب', 'والكتاب هنا', 'للكتاب', 'كتابه', 'مكتوب']
+    index = build_index(texts)
+    query = normalize('كتاب')
+    assert terms_starting_with(index, query) == {n for n, text in enumerate(texts) if query in text}
+
+
+def test_stems_point_at_the_whole_word():
+    index = build_index(['قال والكتاب'])
+    assert index['والكتاب'] == [(0, [4])]
+    assert index['كتاب'] == [(0, [4])]
+
+
+def test_offsets_increase_across_forms_of_one_term():
+    index = build_index(['كتاب والكتاب كتاب'])
+    assert index['كتاب'] == [(0, [0, 5, 13])]
+
+
+def test_encode_postings_uses_gaps():
+    assert encode_postings([(0, [3, 10]), (2, [5])]) == [0, 2, 3, 7, 2, 1, 5]
+
+
+def test_shards_cover_every_term_once():
+    texts = [' '.join(f'كلمه{n}{m}' for m in range(40)) for n in range(20)] + ['ك']
+    index = build_index(texts)
+    shards = shard_index(index, max_bytes=256)
+    assert len(shards) > 1
+    seen = [term for shard in shards.values() for term in shard['terms']]
+    assert sorted(seen) == sorted(index)
+    for key, shard in shards.items():
+        assert shard['terms'] == sorted(shard['terms'])
+        assert all(term.startswith(key) for term in shard['terms'])
+        for term, postings in zip(shard['terms'], shard['postings']):
+            assert postings == encode_postings(index[term])